@@ -1,12 +1,24 @@
-import os, json, operator
+import os, json, time, asyncio, threading
 from typing import Annotated, List, Union, TypedDict, Optional
 
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
 from langgraph.graph import StateGraph, END
 from tools import update_routing_tool, fraud_mitigation_tool
-from utils import get_active_policies_summary
+from utils import get_policy_digest
+from log_tail import LogTailer
+from checkpointer import build_checkpointer
+from reducers import bounded_add, bounded_history
+from rate_limit import LLMLimiter
+from llm_client import LLMClient
+from instrumentation import instrumented_node, LLMMetricsHandler, PROMPT_TOKENS, SPECULATION, current_trace
+from prompt_builder import (build_within_budget, clip, cluster_severity, terse_counts, terse_history,
+                            terse_latency, REASONER_TOKEN_BUDGET, DECIDER_TOKEN_BUDGET, ASSESSOR_TOKEN_BUDGET)
+from assessment import IncidentAssessment, STRUCTURED_OUTPUT_METHOD
+from rules import RuleEngine
+from llm_cache import ResultCache, metrics_fingerprint, decision_fingerprint
+from snapshot import ObserverSnapshotService, LineWindow
+from metrics_window import parse_time_windows
+import config_cache
 
 from dotenv import load_dotenv
 
@@ -17,12 +29,28 @@ api_key = os.getenv("GROQ_API_KEY")
 if api_key:
     os.environ["GROQ_API_KEY"] = api_key.strip()
 
-llm = ChatOpenAI(
-    model="meta-llama/llama-4-maverick-17b-128e-instruct", 
-    api_key=os.getenv("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1", 
-    temperature=0.5
-)
+# Groq by default; LLM_PROVIDERS_FILE adds fallback / hedge providers (see llm_client.py)
+llm = LLMClient.from_env(callbacks=[LLMMetricsHandler()])  # LLM latency + token counts for /metrics
+
+# Caps for the append-only channels. Each checkpoint copies these lists, so
+# unbounded growth on a long-lived thread_id makes every cycle slower.
+# The decider only ever looks at the last 5 actions.
+REASONING_LOG_CAP = int(os.getenv("REASONING_LOG_CAP", "200"))
+ACTION_HISTORY_CAP = int(os.getenv("ACTION_HISTORY_CAP", "50"))
+ACTION_HISTORY_ROLLUP = os.getenv("ACTION_HISTORY_ROLLUP", "1") == "1"
+
+# "two_call": reasoner (free text) -> decider (tool binding), two LLM round-trips.
+# "single_call": one assessor call returns a validated IncidentAssessment
+# (hypothesis, confidence, anomaly flag, tool call); falls back to the
+# two-call path for a cycle whose structured output fails validation.
+AGENT_GRAPH_MODE = os.getenv("AGENT_GRAPH_MODE", "two_call")
+if AGENT_GRAPH_MODE not in ("two_call", "single_call"):
+    raise ValueError(f"AGENT_GRAPH_MODE must be 'two_call' or 'single_call', not {AGENT_GRAPH_MODE!r}")
+
+# AGENT_SPECULATIVE=1 replaces the rule_engine -> LLM hand-off with one
+# "speculate" node: the rule check runs first and, if no rule fires, the
+# LLM call starts with the decider prefetch running alongside it.
+AGENT_SPECULATIVE = os.getenv("AGENT_SPECULATIVE", "0") == "1"
 
 
 class PaymentAgentState(TypedDict):
@@ -32,137 +60,207 @@ class PaymentAgentState(TypedDict):
     is_anomaly_detected: bool
     next_action: Optional[str]
     decision_args: Optional[str]
-    reasoning_log: Annotated[List[str], operator.add]
+    reasoning_log: Annotated[List[str], bounded_add(REASONING_LOG_CAP)]
     
-    # ADD THIS: Long-term memory of executed actions
-    action_history: Annotated[List[str], operator.add]
+    # ADD THIS: Long-term memory of executed actions (evicted ones are rolled up)
+    action_history: Annotated[List[str], bounded_history(ACTION_HISTORY_CAP, rollup=ACTION_HISTORY_ROLLUP)]
+
+    # Name of the rule that short-circuited the LLM this cycle (None = LLM path)
+    fast_path: Optional[str]
+
+    # Version of the shared observer snapshot this thread last consumed
+    observer_version: Optional[int]
 
 # 2. The Checkpointer (The 'Pause' Button Logic)
-# MemorySaver allows the graph to 'freeze' and wait for human input
-# without losing its place in the loop.
-checkpointer = MemorySaver()
+# Lets the graph 'freeze' and wait for human input without losing its place
+# in the loop. Backed by SQLite so a pending approval survives a restart.
+checkpointer = build_checkpointer()
 
 # 3. File System Defaults
-ROUTING_CONFIG_FILE = "routing_config.json"
-DEFAULT_CONFIG = {
-    "US": "stripe",
-    "UK": "stripe",
-    "IN": "stripe",
-    "EU": "adyen",
-    "global_default": "stripe"
-}
+ROUTING_CONFIG_FILE = config_cache.ROUTING_CONFIG_FILE
+DEFAULT_CONFIG = config_cache.DEFAULT_ROUTING_CONFIG
+
+# Ensure baseline config exists (written atomically, under the store's lock)
+config_cache.routing_store.get()
+
+# 4. Observer State
+# The tailer remembers its offset between cycles, so each pass only parses
+# newly appended bytes. The sliding window folds each transaction in once,
+# so OBSERVER_WINDOW can grow without making the cycle slower.
+# One snapshot service per process: every thread (scheduler, server, demo)
+# reads the same versioned snapshot instead of re-reading the log itself.
+LOG_FILE = "transactions.log"
+OBSERVER_WINDOW = int(os.getenv("OBSERVER_WINDOW", "100"))
+LATEST_LOGS_SIZE = 100
+OBSERVER_MIN_INTERVAL = float(os.getenv("OBSERVER_MIN_INTERVAL", "0.5"))
+# Optional time windows next to the count window, e.g. "10s,1m,5m". Reported
+# on observer_service.current().metrics["windows"] only (nothing in the graph
+# reads them), so they are off unless a dashboard asks for them.
+OBSERVER_TIME_WINDOWS = parse_time_windows(os.getenv("OBSERVER_TIME_WINDOWS", ""))
+
+# TRANSACTION_LOG_FORMAT=binary reads the columnar log written by
+# `looger.py --rate N --format binary` (see txlog.py) instead.
+LOG_FORMAT = os.getenv("TRANSACTION_LOG_FORMAT", "json")
+BINARY_LOG_FILE = "transactions.bin"
+
+# Windows this large are aggregated in batches with NumPy (categorical
+# codes + bincount) instead of folding lines in one at a time.
+OBSERVER_VECTOR_MIN_WINDOW = int(os.getenv("OBSERVER_VECTOR_MIN_WINDOW", "50000"))
+
+def build_observer_window():
+    if LOG_FORMAT == "binary":
+        from txlog import ColumnarLogReader, ColumnarWindow
+        return ColumnarWindow(ColumnarLogReader(BINARY_LOG_FILE), OBSERVER_WINDOW, LATEST_LOGS_SIZE, OBSERVER_TIME_WINDOWS)
+    tailer = LogTailer(LOG_FILE, backfill_lines=OBSERVER_WINDOW)
+    if OBSERVER_WINDOW >= OBSERVER_VECTOR_MIN_WINDOW:
+        from txlog import ColumnarWindow, LineBlockReader
+        return ColumnarWindow(LineBlockReader(tailer), OBSERVER_WINDOW, LATEST_LOGS_SIZE, OBSERVER_TIME_WINDOWS)
+    return LineWindow(tailer, OBSERVER_WINDOW, LATEST_LOGS_SIZE, OBSERVER_TIME_WINDOWS)
+
+observer_service = ObserverSnapshotService(build_observer_window(), min_interval=OBSERVER_MIN_INTERVAL)
+
+def attach_log_source(source, clock=time.time):
+    """
+    Points the observer at a different line source (anything with
+    read_new_lines(), e.g. replay.ReplaySource) and clock, starting from
+    an empty window. Every observer call then reads the source directly.
+    """
+    observer_service.attach(LineWindow(source, OBSERVER_WINDOW, LATEST_LOGS_SIZE, OBSERVER_TIME_WINDOWS), clock=clock)
+
+# 5. LLM Result Caches
+# run_agent_demo.py cycles every 5s; most cycles see the same picture as the
+# last one, so reuse the previous answer instead of paying for a Groq call.
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "60"))
+reasoner_cache = ResultCache(maxsize=128, ttl=LLM_CACHE_TTL)
+decider_cache = ResultCache(maxsize=128, ttl=LLM_CACHE_TTL)
+assessor_cache = ResultCache(maxsize=128, ttl=LLM_CACHE_TTL)
 
-# Ensure baseline config exists
-if not os.path.exists(ROUTING_CONFIG_FILE):
-    with open(ROUTING_CONFIG_FILE, "w") as f:
-        json.dump(DEFAULT_CONFIG, f, indent=4)
+# Shared by every async cycle in the process (server + scheduler): caps
+# concurrent LLM calls, paces them under the provider's rate limit and
+# backs off on 429s. Tune with LLM_MAX_CONCURRENCY / LLM_REQUESTS_PER_MINUTE.
+llm_limiter = LLMLimiter.from_env()
 
-# 4. Graph Export Helper (For the Mermaid live map in Streamlit)
+# 6. Rule Engine (deterministic fast path for known failure signatures)
+rule_engine = RuleEngine.from_file()
+
+# 7. Graph Export Helper (For the Mermaid live map in Streamlit)
 def get_graph_diagram(compiled_graph):
     """Returns a Mermaid-compatible string to render the graph in UI."""
     return compiled_graph.get_graph().draw_mermaid()
 
+def snapshot_update(state: PaymentAgentState, snapshot):
+    # Threads that already saw this version keep their checkpointed metrics
+    if snapshot.version and snapshot.version == state.get("observer_version"):
+        return {"reasoning_log": [f"Observer: No new transactions since last cycle (snapshot v{snapshot.version})."]}
+    return snapshot.update
+
 def observer_node(state: PaymentAgentState):
-    log_file = "transactions.log"
-    recent_txs = []
-    
-    # Initialize the return dictionary with defaults to prevent KeyErrors
-    output = {
-        "latest_logs": [],
-        "metrics": {"global_success_rate": 1.0, "failure_clusters": {}, "total_count": 0,"security_alerts": {}},
-        "reasoning_log": [],
-        "current_hypothesis": "Monitoring..."
-    }
+    return snapshot_update(state, observer_service.get())
 
-    if os.path.exists(log_file):
-        with open(log_file, "r") as f:
-            lines = f.readlines()[-100:]
-            for line in lines:
-                if not line.strip(): continue # Skip empty lines
-                try:
-                    # Robust split: Find the first '{' and take everything from there
-                    json_start = line.find('{')
-                    if json_start != -1:
-                        json_str = line[json_start:]
-                        recent_txs.append(json.loads(json_str))
-                except Exception as e:
-                    continue
-
-    if not recent_txs:
-        output["reasoning_log"] = ["Observer: No valid JSON transactions found in log yet."]
-        return output
-
-    # --- Calculation Logic ---
-    total = len(recent_txs)
-    successes = len([t for t in recent_txs if t['status'] == 'SUCCESS'])
-    
-    failure_map = {}
-    security_map = {}
-    for t in recent_txs:
-        status = t.get('status', 'UNK')
-        error_code = str(t.get('error_code', '00'))
-        
-        # 1. Track standard FAILED transactions (Outages/Auth issues)
-        if status == 'FAILED':
-            key = f"{t.get('region','UNK')}_{t.get('gateway','UNK')}_{error_code}"
-            failure_map[key] = failure_map.get(key, 0) + 1
-        
-        # 2. Track REJECTED transactions (Spam/Carding Attacks)
-        elif status == 'REJECTED' or error_code == '429':
-            key = f"SPAM_ATTACK_{t.get('region','UNK')}"
-            security_map[key] = security_map.get(key, 0) + 1
-        
-
-    output["latest_logs"] = recent_txs
-    output["metrics"] = {
-        "global_success_rate": successes / total,
-        "failure_clusters": failure_map,
-        "security_alerts": security_map,
-        "total_count": total
+async def aobserver_node(state: PaymentAgentState):
+    """Async twin of observer_node: a stale snapshot is refreshed off the event loop."""
+    if observer_service.stale():
+        return snapshot_update(state, await asyncio.to_thread(observer_service.refresh))
+    return snapshot_update(state, observer_service.current())
+
+def rule_engine_node(state: PaymentAgentState):
+    """
+    Node 1.5: Matches clear-cut signatures (spam bursts, issuer outages)
+    against declarative rules and proposes a tool call directly, skipping
+    the LLM. Ambiguous cycles fall through to the reasoner.
+    """
+    started = time.perf_counter()
+    match = rule_engine.evaluate(state.get("metrics", {}))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if match is None:
+        return {"fast_path": None, "reasoning_log": ["RuleEngine: No clear-cut signature. Deferring to LLM reasoner."]}
+
+    return {
+        "fast_path": match.rule,
+        "current_hypothesis": match.hypothesis,
+        "is_anomaly_detected": True,
+        "next_action": match.tool,
+        "decision_args": json.dumps(match.args),
+        "reasoning_log": [f"RuleEngine: Rule '{match.rule}' fired in {elapsed_ms:.2f}ms. Proposed {match.tool} with {match.args}"]
     }
-    log_msg = f"Observer: Parsed {total} txs."
-    if security_map:
-        log_msg += f" ALERT: Detected {sum(security_map.values())} potential spam attempts."
-    output["reasoning_log"] = [f"Observer: Successfully parsed {total} transactions."]
-    
-    return output
 
-def reasoner_node(state: PaymentAgentState):
+async def arule_engine_node(state: PaymentAgentState):
+    """Async twin of rule_engine_node (the already-applied checks read config files)."""
+    return await asyncio.to_thread(rule_engine_node, state)
+
+DIAGNOSIS_STEPS = """1. Identify if the current failures represent a "Technical Infrastructure Issue" or a "Malicious Traffic Pattern."
+   A latency spike on one gateway (p95/p99 in the thousands of ms) is a Technical Infrastructure Issue even when transactions succeed.
+2. Analyze error codes using your knowledge of fintech standards (ISO 8583, HTTP Status Codes).
+3. Determine the "blast radius" (is it one region, one gateway)."""
+
+VALID_REGIONS = ["US", "UK", "IN", "EU"]
+
+DECISION_RULES = f"""AVAILABLE TOOLS:
+1. 'update_routing_tool': Best for fixing localized technical failures by moving traffic to a healthy partner.
+2. 'fraud_mitigation_tool': Best for neutralizing malicious traffic patterns or bot attacks at the edge.
+
+VALID REGIONS: {VALID_REGIONS}
+NOTE: Do NOT use 'global_default' as a target_region for fraud_mitigation_tool.
+Apply blocks to specific affected regions only
+If the region (e.g., US) already has an active 'BLOCK_IP_RANGE', DO NOT call the tool again.
+
+MISSION:
+Choose the tool that best resolves the 'Hypothesis' provided.
+- If the issue is technical, focus on continuity (Routing).
+- If the issue is malicious, focus on protection (Mitigation).
+- Avoid redundant actions if past actions haven't had time to take effect."""
+
+def render_snapshot(metrics: dict, k: int, section_chars):
+    """The metrics section shared by the reasoner and assessor prompts."""
+    severity = cluster_severity(rule_engine.error_code_classes)
+    return f"""DATA SNAPSHOT (failure clusters region_gateway_errorcode=count, most severe first):
+{clip(terse_counts(metrics.get('failure_clusters', {}), k, severity), section_chars)}
+GLOBAL SUCCESS RATE: {metrics.get('global_success_rate', 0):.2%} of {metrics.get('total_count', 0)} tx
+SECURITY ALERTS: {clip(terse_counts(metrics.get('security_alerts', {}), k), section_chars)}
+LATENCY (ms, slowest region_gateway first):
+{clip(terse_latency(metrics.get('latency_percentiles', {}), k), section_chars)}"""
+
+def prepare_reasoner(state: PaymentAgentState):
     """
-    Node 2: The LLM analyzes clusters to form a hypothesis.
+    Shared by the sync and async reasoner. Returns (cache_key, update) where
+    update is the cached result, or (cache_key, messages) for the LLM.
     """
     metrics = state.get("metrics", {})
-    clusters = metrics.get('failure_clusters', {})
+
+    # Same (banded) metrics as a recent cycle -> reuse that diagnosis
+    cache_key = metrics_fingerprint(metrics)
+    cached = reasoner_cache.get(cache_key)
+    if cached is not None:
+        return cache_key, {
+            **cached,
+            "reasoning_log": [f"Reasoner: Cache hit ({reasoner_cache.stats()}). Hypothesis: {cached['current_hypothesis']}"]
+        }
     
-    # Construct a clear snapshot for the LLM
-    cluster_summary = json.dumps(clusters, indent=2)
-
-    # UPDATE THIS IN REASONER_NODE
-    prompt = f"""
-    SYSTEM: You are a Payment Operations Diagnostic Engine.
-    DATA SNAPSHOT:
-    {cluster_summary}
-    GLOBAL SUCCESS RATE: {metrics.get('global_success_rate', 0):.2%}
-    SECURITY ALERTS: {metrics.get('security_alerts', {})}
-
-    TASK:
-    1. Identify if the current failures represent a "Technical Infrastructure Issue" or a "Malicious Traffic Pattern."
-    2. Analyze error codes using your knowledge of fintech standards (ISO 8583, HTTP Status Codes).
-    3. Determine the "blast radius" (is it one region, one gateway).
-    4. Formulate a hypothesis that a Decider can use to pick a tool.
-
-    OUTPUT FORMAT:
-    Hypothesis: <Detailed diagnosis of root cause>
-    Confidence: <0-100%>
-    Anomaly Detected: <Yes/No>
-    """
+    # Construct a compact snapshot for the LLM: top-K clusters plus an "other"
+    # bucket, shrunk further if the prompt would exceed its token budget
+    def render(k, section_chars):
+        return f"""SYSTEM: You are a Payment Operations Diagnostic Engine.
+{render_snapshot(metrics, k, section_chars)}
 
-    # Call the LLM
-    response = llm.invoke([
+TASK:
+{DIAGNOSIS_STEPS}
+4. Formulate a hypothesis that a Decider can use to pick a tool.
+
+OUTPUT FORMAT:
+Hypothesis: <Detailed diagnosis of root cause>
+Confidence: <0-100%>
+Anomaly Detected: <Yes/No>"""
+
+    prompt, tokens = build_within_budget(render, REASONER_TOKEN_BUDGET)
+    PROMPT_TOKENS.observe(tokens, "reasoner", trace_id=current_trace.get())
+
+    return cache_key, [
         SystemMessage(content="You analyze fintech logs for patterns."),
         HumanMessage(content=prompt)
-    ])
-    
+    ]
+
+def finish_reasoner(cache_key: str, response):
     # Parse the LLM response (we can use simple string parsing for now)
     content = response.content
     is_anomaly = "Anomaly Detected: Yes" in content
@@ -173,62 +271,260 @@ def reasoner_node(state: PaymentAgentState):
         if line.startswith("Hypothesis:"):
             hypothesis = line.replace("Hypothesis:", "").strip()
 
+    result = {"current_hypothesis": hypothesis, "is_anomaly_detected": is_anomaly}
+    reasoner_cache.put(cache_key, result)
+
     return {
-        "current_hypothesis": hypothesis,
-        "is_anomaly_detected": is_anomaly,
-        "reasoning_log": [f"Reasoner: Analyzed clusters. Hypothesis: {hypothesis}"]
+        **result,
+        "reasoning_log": [f"Reasoner: Analyzed clusters ({reasoner_cache.stats()}). Hypothesis: {hypothesis}"]
     }
 
+def reasoner_node(state: PaymentAgentState):
+    """
+    Node 2: The LLM analyzes clusters to form a hypothesis.
+    """
+    cache_key, prepared = prepare_reasoner(state)
+    if isinstance(prepared, dict):
+        return prepared
+
+    # Call the LLM
+    return finish_reasoner(cache_key, llm.invoke(prepared))
+
+async def areasoner_node(state: PaymentAgentState):
+    """Async twin of reasoner_node, used by app.astream (server.py)."""
+    cache_key, prepared = prepare_reasoner(state)
+    if isinstance(prepared, dict):
+        return prepared
+    response = await llm_limiter.call(lambda: llm.ainvoke(prepared))
+    return finish_reasoner(cache_key, response)
+
+
+DECIDER_TOOLS = [update_routing_tool, fraud_mitigation_tool]
+
+# Tool-bound / structured runnables are built once per llm object instead of
+# on every call (bench.py swaps agent.llm, which rebuilds them). The
+# assessor uses include_raw: a reply that fails validation comes back as
+# parsing_error instead of raising, so the cycle can fall back to two calls.
+LLM_BINDINGS = {
+    "decider": lambda model: model.bind_tools(DECIDER_TOOLS),
+    "assessor": lambda model: model.with_structured_output(
+        IncidentAssessment, method=STRUCTURED_OUTPUT_METHOD, include_raw=True)
+}
+_bound_llms = {}
 
-def decider_node(state: PaymentAgentState):
-    """Decides to call a tool OR alert the human."""
+def bound_llm(kind: str):
+    entry = _bound_llms.get(kind)
+    if entry is None or entry[0] is not llm:
+        entry = _bound_llms[kind] = (llm, LLM_BINDINGS[kind](llm))
+    return entry[1]
+
+def prepare_decider(state: PaymentAgentState, active_securely: str):
+    """Returns (cache_key, update) when no LLM call is needed, else (cache_key, prompt)."""
     hypothesis = state['current_hypothesis']
     history = state.get('action_history', [])
-    active_securely = get_active_policies_summary()
 
     if not state['is_anomaly_detected']:
-        return {"next_action": "MONITOR", "reasoning_log": ["Decider: No action needed."]}
-    
-    valid_regions = ["US", "UK", "IN", "EU"]
-
-    # UPDATE THIS IN DECIDER_NODE
-    prompt = f"""
-    SYSTEM: You are the Autonomous Payment Ops Decision Maker.
-    INPUT HYPOTHESIS: {hypothesis}
-    ACTIVE POLICIES: {active_securely}
-    PAST ACTIONS: {json.dumps(history[-5:])}
-
-    AVAILABLE TOOLS:
-    1. 'update_routing_tool': Best for fixing localized technical failures by moving traffic to a healthy partner.
-    2. 'fraud_mitigation_tool': Best for neutralizing malicious traffic patterns or bot attacks at the edge.
-
-    VALID REGIONS: {valid_regions}
-    NOTE: Do NOT use 'global_default' as a target_region for fraud_mitigation_tool. 
-    Apply blocks to specific affected regions only
-    If the region (e.g., US) already has an active 'BLOCK_IP_RANGE', DO NOT call the tool again.
+        return None, {"next_action": "MONITOR", "reasoning_log": ["Decider: No action needed."]}
     
-    MISSION:
-    Choose the tool that best resolves the 'Hypothesis' provided. 
-    - If the issue is technical, focus on continuity (Routing).
-    - If the issue is malicious, focus on protection (Mitigation).
-    - Avoid redundant actions if past actions haven't had time to take effect.
-
-    DECISION:
-    Does this situation require an automated intervention? If so, call the most appropriate tool with precise arguments.
-    """
+    cache_key = decision_fingerprint(hypothesis, active_securely, history[-5:])
+    cached = decider_cache.get(cache_key)
+    if cached is not None:
+        return cache_key, {**cached, "reasoning_log": [f"{cached['reasoning_log'][-1]} [cache hit: {decider_cache.stats()}]"]}
 
-    llm_with_tools = llm.bind_tools([update_routing_tool, fraud_mitigation_tool])
-    response = llm_with_tools.invoke(prompt)
-    
+    def render(k, section_chars):
+        return f"""SYSTEM: You are the Autonomous Payment Ops Decision Maker.
+INPUT HYPOTHESIS: {clip(hypothesis, section_chars)}
+ACTIVE POLICIES: {clip(active_securely, section_chars)}
+PAST ACTIONS: {clip(terse_history(history, last=min(5, k)), section_chars)}
+
+{DECISION_RULES}
+
+DECISION:
+Does this situation require an automated intervention? If so, call the most appropriate tool with precise arguments."""
+
+    prompt, tokens = build_within_budget(render, DECIDER_TOKEN_BUDGET)
+    PROMPT_TOKENS.observe(tokens, "decider", trace_id=current_trace.get())
+    return cache_key, prompt
+
+def finish_decider(cache_key: str, response):
     if response.tool_calls:
         tool_call = response.tool_calls[0]
-        return {
+        result = {
             "next_action": tool_call['name'], # This will be 'fraud_mitigation_tool' or 'update_routing_tool'
             "decision_args": json.dumps(tool_call['args']),
             "reasoning_log": [f"Decider: Proposed {tool_call['name']} with {tool_call['args']}"]
         }
-    
-    return {"next_action": "ALERT_HUMAN", "reasoning_log": ["Decider: Alerting Human (No auto-fix)."]}
+    else:
+        result = {"next_action": "ALERT_HUMAN", "reasoning_log": ["Decider: Alerting Human (No auto-fix)."]}
+
+    decider_cache.put(cache_key, result)
+    return {**result, "reasoning_log": [f"{result['reasoning_log'][-1]} [cache miss: {decider_cache.stats()}]"]}
+
+def decider_node(state: PaymentAgentState):
+    """Decides to call a tool OR alert the human."""
+    cache_key, prepared = prepare_decider(state, get_policy_digest())
+    if isinstance(prepared, dict):
+        return prepared
+
+    return finish_decider(cache_key, bound_llm("decider").invoke(prepared))
+
+async def adecider_node(state: PaymentAgentState):
+    """Async twin of decider_node. The policy file is read off the event loop."""
+    active_securely = await asyncio.to_thread(get_policy_digest)
+    cache_key, prepared = prepare_decider(state, active_securely)
+    if isinstance(prepared, dict):
+        return prepared
+
+    response = await llm_limiter.call(lambda: bound_llm("decider").ainvoke(prepared))
+    return finish_decider(cache_key, response)
+
+def prepare_assessor(state: PaymentAgentState, active_securely: str):
+    """
+    Single-call mode: one prompt covering both the diagnosis and the decision.
+    Returns (cache_key, update) on a cache hit, else (cache_key, messages).
+    """
+    metrics = state.get("metrics", {})
+    history = state.get('action_history', [])
+
+    cache_key = decision_fingerprint(metrics_fingerprint(metrics), active_securely, history[-5:])
+    cached = assessor_cache.get(cache_key)
+    if cached is not None:
+        log = cached["reasoning_log"]
+        return cache_key, {**cached, "reasoning_log": log[:-1] + [f"{log[-1]} [cache hit: {assessor_cache.stats()}]"]}
+
+    def render(k, section_chars):
+        return f"""SYSTEM: You are the Payment Operations Diagnostic and Decision Engine.
+{render_snapshot(metrics, k, section_chars)}
+ACTIVE POLICIES: {clip(active_securely, section_chars)}
+PAST ACTIONS: {clip(terse_history(history, last=min(5, k)), section_chars)}
+
+TASK:
+{DIAGNOSIS_STEPS}
+4. Formulate a hypothesis and decide whether it requires an automated intervention.
+
+{DECISION_RULES}
+
+OUTPUT:
+Return the assessment: hypothesis, confidence (0-100), anomaly_detected, and the action with its
+arguments. Use action 'none' when no tool should be called."""
+
+    prompt, tokens = build_within_budget(render, ASSESSOR_TOKEN_BUDGET)
+    PROMPT_TOKENS.observe(tokens, "assessor", trace_id=current_trace.get())
+
+    return cache_key, [
+        SystemMessage(content="You analyze fintech logs for patterns and pick the remediation."),
+        HumanMessage(content=prompt)
+    ]
+
+def finish_assessor(cache_key: str, response: dict):
+    """Maps a validated IncidentAssessment onto the state keys reasoner + decider set. None if invalid."""
+    assessment = response.get("parsed")
+    if response.get("parsing_error") is not None or not isinstance(assessment, IncidentAssessment):
+        return None
+
+    args = assessment.tool_args()
+    if args is not None:
+        next_action = assessment.action
+        decision = f"Assessor: Proposed {next_action} with {args}"
+    elif assessment.anomaly_detected:
+        next_action, decision = "ALERT_HUMAN", "Assessor: Alerting Human (No auto-fix)."
+    else:
+        next_action, decision = "MONITOR", "Assessor: No action needed."
+
+    result = {
+        "current_hypothesis": assessment.hypothesis,
+        "is_anomaly_detected": assessment.anomaly_detected,
+        "next_action": next_action,
+        "decision_args": json.dumps(args) if args is not None else None,
+        "reasoning_log": [f"Assessor: Hypothesis: {assessment.hypothesis} (confidence {assessment.confidence}%)", decision]
+    }
+    assessor_cache.put(cache_key, result)
+    return {**result, "reasoning_log": result["reasoning_log"][:-1] + [f"{decision} [cache miss: {assessor_cache.stats()}]"]}
+
+def merge_fallback(response: dict, reasoned: dict, decided: dict):
+    error = response.get("parsing_error") or "no structured result"
+    return {
+        **reasoned,
+        **decided,
+        "reasoning_log": [f"Assessor: Structured output rejected ({clip(str(error), 160)}). Falling back to reasoner + decider."]
+                         + reasoned["reasoning_log"] + decided["reasoning_log"]
+    }
+
+def assessor_node(state: PaymentAgentState):
+    """Single-call mode: diagnoses the snapshot and picks the tool in one LLM call."""
+    cache_key, prepared = prepare_assessor(state, get_policy_digest())
+    if isinstance(prepared, dict):
+        return prepared
+
+    response = bound_llm("assessor").invoke(prepared)
+    update = finish_assessor(cache_key, response)
+    if update is not None:
+        return update
+
+    reasoned = reasoner_node(state)
+    return merge_fallback(response, reasoned, decider_node({**state, **reasoned}))
+
+async def aassessor_node(state: PaymentAgentState):
+    """Async twin of assessor_node."""
+    active_securely = await asyncio.to_thread(get_policy_digest)
+    cache_key, prepared = prepare_assessor(state, active_securely)
+    if isinstance(prepared, dict):
+        return prepared
+
+    response = await llm_limiter.call(lambda: bound_llm("assessor").ainvoke(prepared))
+    update = finish_assessor(cache_key, response)
+    if update is not None:
+        return update
+
+    reasoned = await areasoner_node(state)
+    return merge_fallback(response, reasoned, await adecider_node({**state, **reasoned}))
+
+def llm_entry_node(state: PaymentAgentState):
+    return assessor_node(state) if AGENT_GRAPH_MODE == "single_call" else reasoner_node(state)
+
+async def allm_entry_node(state: PaymentAgentState):
+    return await (aassessor_node(state) if AGENT_GRAPH_MODE == "single_call" else areasoner_node(state))
+
+def prefetch_decision_inputs():
+    """Warms what the decider / assessor needs next: the policy digest and the bound runnable."""
+    try:
+        get_policy_digest()
+        bound_llm("assessor" if AGENT_GRAPH_MODE == "single_call" else "decider")
+    except Exception:
+        pass  # Best effort: the real call re-reads and reports any error
+
+def merge_speculation(ruled: dict, update: dict):
+    return {**update, "fast_path": None, "reasoning_log": ruled["reasoning_log"] + update.get("reasoning_log", [])}
+
+def speculate_node(state: PaymentAgentState):
+    """Sync twin of aspeculate_node (the prefetch runs on a daemon thread)."""
+    ruled = rule_engine_node(state)
+    if ruled["fast_path"]:
+        SPECULATION.inc("rule")
+        return ruled
+    SPECULATION.inc("llm")
+    threading.Thread(target=prefetch_decision_inputs, daemon=True).start()
+    return merge_speculation(ruled, llm_entry_node(state))
+
+async def aspeculate_node(state: PaymentAgentState):
+    """
+    Node 1.5 (speculative mode): the rule check (sub-millisecond) goes first,
+    so a fired rule never starts an LLM call or takes a limiter token.
+    Otherwise the LLM call starts at once and the decider prefetch runs
+    alongside it instead of after it.
+    """
+    ruled = await arule_engine_node(state)
+    if ruled["fast_path"]:
+        SPECULATION.inc("rule")
+        return ruled
+
+    SPECULATION.inc("llm")
+    prefetch = asyncio.create_task(asyncio.to_thread(prefetch_decision_inputs))
+    try:
+        update = await allm_entry_node(state)
+    finally:
+        await prefetch
+    return merge_speculation(ruled, update)
 
 def sentry_node(state: PaymentAgentState):
     """
@@ -237,41 +533,62 @@ def sentry_node(state: PaymentAgentState):
     """
     return state
 
-def executor_node(state: PaymentAgentState):
-    """Dynamically executes the tool chosen by the Decider."""
-    tool_map = {
-        "update_routing_tool": update_routing_tool,
-        "fraud_mitigation_tool": fraud_mitigation_tool
+TOOL_MAP = {
+    "update_routing_tool": update_routing_tool,
+    "fraud_mitigation_tool": fraud_mitigation_tool
+}
+
+def finish_executor(proposed_tool: str, args: dict, result):
+    action_record = f"ACTION: {proposed_tool} | ARGS: {args} | RESULT: {result}"
+    
+    return {
+        "reasoning_log": [f"Executor: {result}"],
+        "action_history": [action_record] 
     }
 
+def executor_node(state: PaymentAgentState):
+    """Dynamically executes the tool chosen by the Decider."""
     # Extract the proposed tool name from the reasoning log or state
     # A cleaner way is to store the tool name in state['next_action']
     proposed_tool = state.get("next_action")
     args = json.loads(state['decision_args'])
 
-    if proposed_tool in tool_map:
-        result = tool_map[proposed_tool].invoke(args)
-    else:
+    if proposed_tool not in TOOL_MAP:
         # Fallback if the AI hallucinated a tool name
         return {"reasoning_log": [f"Executor Error: Tool '{proposed_tool}' not found."]}
 
-    action_record = f"ACTION: {proposed_tool} | ARGS: {args} | RESULT: {result}"
-    
-    return {
-        "reasoning_log": [f"Executor: {result}"],
-        "action_history": [action_record] 
-    }
+    return finish_executor(proposed_tool, args, TOOL_MAP[proposed_tool].invoke(args))
+
+async def aexecutor_node(state: PaymentAgentState):
+    """Async twin of executor_node. Sync tools run in LangChain's thread pool."""
+    proposed_tool = state.get("next_action")
+    args = json.loads(state['decision_args'])
+
+    if proposed_tool not in TOOL_MAP:
+        return {"reasoning_log": [f"Executor Error: Tool '{proposed_tool}' not found."]}
+
+    return finish_executor(proposed_tool, args, await TOOL_MAP[proposed_tool].ainvoke(args))
 
 workflow = StateGraph(PaymentAgentState)
-workflow.add_node("observer", observer_node)
-workflow.add_node("reasoner", reasoner_node)
-workflow.add_node("decider", decider_node)
-workflow.add_node("executor", executor_node)
-workflow.add_node("sentry", sentry_node)
+# Each node has a sync and an async implementation: app.stream (run_agent_demo.py)
+# uses the former, app.astream (server.py) the latter, so one slow LLM call
+# never blocks the event loop. Every node is timed for /metrics.
+workflow.add_node("observer", instrumented_node("observer", observer_node, aobserver_node))
+# In speculative mode the first LLM step (reasoner / assessor) runs inside "speculate"
+if AGENT_SPECULATIVE:
+    workflow.add_node("speculate", instrumented_node("speculate", speculate_node, aspeculate_node))
+else:
+    workflow.add_node("rule_engine", instrumented_node("rule_engine", rule_engine_node, arule_engine_node))
+    if AGENT_GRAPH_MODE == "single_call":
+        workflow.add_node("assessor", instrumented_node("assessor", assessor_node, aassessor_node))
+    else:
+        workflow.add_node("reasoner", instrumented_node("reasoner", reasoner_node, areasoner_node))
+if AGENT_GRAPH_MODE == "two_call":
+    workflow.add_node("decider", instrumented_node("decider", decider_node, adecider_node))
+workflow.add_node("executor", instrumented_node("executor", executor_node, aexecutor_node))
+workflow.add_node("sentry", instrumented_node("sentry", sentry_node))
 
 workflow.set_entry_point("observer")
-workflow.add_edge("observer", "reasoner")
-workflow.add_edge("reasoner", "decider")
 
 def route_decision(state):
     target = state.get("next_action")
@@ -284,19 +601,47 @@ def route_decision(state):
     
     return END
 
-workflow.add_conditional_edges(
-    "decider",
-    route_decision,
-    {
-        "executor": "executor",
-        "sentry": "sentry",
-        END: END
-    }
-)
+DECISION_ROUTES = {
+    "executor": "executor",
+    "sentry": "sentry",
+    END: END
+}
+
+if AGENT_SPECULATIVE:
+    def route_speculation(state):
+        # A fired rule (or the assessor) already chose the tool; a hypothesis still needs the decider
+        if state.get("fast_path") or AGENT_GRAPH_MODE == "single_call":
+            return route_decision(state)
+        return "decider"
+
+    workflow.add_edge("observer", "speculate")
+    workflow.add_conditional_edges(
+        "speculate",
+        route_speculation,
+        {**DECISION_ROUTES, "decider": "decider"} if AGENT_GRAPH_MODE == "two_call" else DECISION_ROUTES
+    )
+else:
+    # First LLM node after the rule engine
+    LLM_ENTRY_NODE = "assessor" if AGENT_GRAPH_MODE == "single_call" else "reasoner"
+
+    def route_fast_path(state):
+        # A fired rule already chose the tool, so skip straight to execution
+        if state.get("fast_path"):
+            return route_decision(state)
+        return LLM_ENTRY_NODE
+
+    workflow.add_edge("observer", "rule_engine")
+    workflow.add_conditional_edges("rule_engine", route_fast_path, {**DECISION_ROUTES, LLM_ENTRY_NODE: LLM_ENTRY_NODE})
+    if AGENT_GRAPH_MODE == "two_call":
+        workflow.add_edge("reasoner", "decider")
+    else:
+        workflow.add_conditional_edges("assessor", route_decision, DECISION_ROUTES)
+
+if AGENT_GRAPH_MODE == "two_call":
+    workflow.add_conditional_edges("decider", route_decision, DECISION_ROUTES)
 workflow.add_edge("sentry", "executor")
 workflow.add_edge("executor", END)
 
-checkpointer = MemorySaver()
 app = workflow.compile(checkpointer=checkpointer, interrupt_before=["sentry"])
 
 
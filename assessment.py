@@ -0,0 +1,55 @@
+"""
+Single-call incident assessment.
+
+The two-call graph asks the reasoner for free text ("Hypothesis: ...",
+"Anomaly Detected: Yes") and then hands that text to a tool-bound decider.
+IncidentAssessment lets one LLM call return both halves as a validated
+object via llm.with_structured_output(...): the diagnosis, the anomaly flag
+and, optionally, the tool call with its arguments.
+"""
+import os
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# "function_calling" works on every OpenAI-compatible provider (Groq included);
+# "json_schema" uses strict structured outputs where the model supports them.
+STRUCTURED_OUTPUT_METHOD = os.getenv("STRUCTURED_OUTPUT_METHOD", "function_calling")
+
+ROUTING_TOOL = "update_routing_tool"
+FRAUD_TOOL = "fraud_mitigation_tool"
+
+
+class IncidentAssessment(BaseModel):
+    """Diagnosis of the current metrics snapshot and the intervention (if any) to make."""
+
+    hypothesis: str = Field(description="Detailed diagnosis of the root cause, e.g. 'Technical Infrastructure Issue on stripe in UK'.")
+    confidence: int = Field(ge=0, le=100, description="Confidence in the hypothesis, 0-100.")
+    anomaly_detected: bool = Field(description="True if the snapshot shows a technical or malicious incident.")
+    action: Literal["none", "update_routing_tool", "fraud_mitigation_tool"] = Field(
+        "none", description="Tool to call, or 'none' to only monitor / alert a human.")
+    region: Optional[Literal["US", "UK", "IN", "EU", "global_default"]] = Field(
+        None, description="update_routing_tool: region to reroute.")
+    gateway: Optional[Literal["stripe", "adyen"]] = Field(
+        None, description="update_routing_tool: healthy gateway to route to.")
+    action_type: Optional[Literal["BLOCK_IP_RANGE"]] = Field(
+        None, description="fraud_mitigation_tool: security measure to deploy.")
+    target_region: Optional[Literal["US", "UK", "IN", "EU"]] = Field(
+        None, description="fraud_mitigation_tool: region to protect.")
+
+    @model_validator(mode="after")
+    def check_tool_args(self):
+        # A tool call with missing arguments is a parsing error, not an action
+        if self.action == ROUTING_TOOL and not (self.region and self.gateway):
+            raise ValueError("update_routing_tool needs region and gateway")
+        if self.action == FRAUD_TOOL and not (self.action_type and self.target_region):
+            raise ValueError("fraud_mitigation_tool needs action_type and target_region")
+        return self
+
+    def tool_args(self) -> Optional[dict]:
+        """The chosen tool's arguments, shaped like the tool's own schema (None = no action)."""
+        if not self.anomaly_detected or self.action == "none":
+            return None
+        if self.action == ROUTING_TOOL:
+            return {"region": self.region, "gateway": self.gateway}
+        return {"action_type": self.action_type, "target_region": self.target_region}
@@ -0,0 +1,324 @@
+"""
+Offline benchmark for the observer -> rule_engine -> reasoner -> decider ->
+sentry -> executor pipeline. No simulator, Groq key or server needed:
+agent.llm is swapped for ScriptedLLM, a deterministic local stand-in.
+
+    python bench.py --sizes 1000 100000 1000000 --threads 1 8 32 --llm-latency 0.05 --out bench_results.json
+
+For each synthetic log size it measures the observer's cold start, per-node
+latency and end-to-end cycle time (median/p95) while new lines keep arriving,
+peak allocations per cycle (tracemalloc) and the serialized checkpoint size.
+For each thread count it measures concurrent cycle throughput via ainvoke.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from langchain_core.messages import AIMessage
+
+from rate_limit import LLMLimiter
+
+REGIONS = ["US", "UK", "IN", "EU"]
+TOOL_NAMES = {"update_routing_tool", "fraud_mitigation_tool"}
+
+
+class ScriptedLLM:
+    """
+    Deterministic stand-in for ChatOpenAI. Implements the surface agent.py
+    uses (invoke/ainvoke/bind_tools/with_structured_output) and answers from
+    what is in the prompt, after sleeping `latency` seconds to mimic the
+    network round-trip.
+    """
+
+    def __init__(self, latency=0.0, tools=None, schema=None, include_raw=False):
+        self.latency = latency
+        self.tools = tools
+        self.schema = schema
+        self.include_raw = include_raw
+        self.calls = 0
+
+    def bind_tools(self, tools, **kwargs):
+        bound = ScriptedLLM(self.latency, tools=[getattr(t, "name", str(t)) for t in tools])
+        bound.calls = self.calls
+        return bound
+
+    def with_structured_output(self, schema, include_raw=False, **kwargs):
+        bound = ScriptedLLM(self.latency, schema=schema, include_raw=include_raw)
+        bound.calls = self.calls
+        return bound
+
+    def invoke(self, prompt, *args, **kwargs):
+        time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    def _answer(self, prompt):
+        self.calls += 1
+        text = prompt if isinstance(prompt, str) else "\n".join(getattr(m, "content", str(m)) for m in prompt)
+        if self.schema is not None:
+            return self._assess(text)
+        return self._decide(text) if self.tools else self._diagnose(text)
+
+    def _assess(self, text):
+        # Single-call mode: the same diagnosis and decision, as one schema object
+        diagnosis = self._diagnose(text).content
+        fields = dict(re.findall(r"^(Hypothesis|Confidence|Anomaly Detected): (.*)$", diagnosis, re.M))
+        answer = {
+            "hypothesis": fields["Hypothesis"],
+            "confidence": int(fields["Confidence"].rstrip("%")),
+            "anomaly_detected": fields["Anomaly Detected"] == "Yes"
+        }
+        decision = self._decide(diagnosis)
+        if answer["anomaly_detected"] and decision.tool_calls:
+            call = decision.tool_calls[0]
+            answer.update(action=call["name"], **call["args"])
+        parsed = self.schema(**answer)
+        return {"raw": AIMessage(content=""), "parsed": parsed, "parsing_error": None} if self.include_raw else parsed
+
+    @staticmethod
+    def _diagnose(text):
+        spam = re.search(r"SPAM_ATTACK_(US|UK|IN|EU)", text)
+        outage = re.search(r"\b(US|UK|IN|EU)_(stripe|adyen)_(91|401)=", text)
+        if spam:
+            body = f"Hypothesis: Malicious Traffic Pattern in {spam.group(1)}\nConfidence: 90%\nAnomaly Detected: Yes"
+        elif outage:
+            body = (f"Hypothesis: Technical Infrastructure Issue on {outage.group(2)} in {outage.group(1)}\n"
+                    f"Confidence: 85%\nAnomaly Detected: Yes")
+        else:
+            body = "Hypothesis: Normal operations\nConfidence: 95%\nAnomaly Detected: No"
+        return AIMessage(content=body)
+
+    @staticmethod
+    def _decide(text):
+        region = re.search(r"(?:in|IN) (US|UK|IN|EU)\b", text)
+        region = region.group(1) if region else "US"
+        if "Malicious" in text:
+            call = {"name": "fraud_mitigation_tool", "args": {"action_type": "BLOCK_IP_RANGE", "target_region": region}}
+        elif "Technical" in text:
+            gateway = "adyen" if "on stripe" in text else "stripe"
+            call = {"name": "update_routing_tool", "args": {"region": region, "gateway": gateway}}
+        else:
+            return AIMessage(content="No action.")
+        return AIMessage(content="", tool_calls=[{**call, "id": f"call_{random.getrandbits(32)}", "type": "tool_call"}])
+
+
+def synthetic_line(rng, ts, incident):
+    region = rng.choice(REGIONS)
+    gateway = "adyen" if region == "EU" else "stripe"
+    status, error_code, latency = "SUCCESS", "00", 150 + rng.randint(-20, 50)
+    if incident == "outage" and region == "UK" and rng.random() > 0.3:
+        status, error_code = "FAILED", "91"
+    elif incident == "spam" and rng.random() < 0.5:
+        status, error_code, latency = "REJECTED", "429", 10
+    elif rng.random() < 0.02:
+        status, error_code = "FAILED", rng.choice(["51", "05"])
+    stamp = datetime.fromtimestamp(ts, timezone.utc).isoformat() + "Z"
+    return (f'{{"timestamp": "{stamp}", "transaction_id": "tx_{rng.getrandbits(24)}", "gateway": "{gateway}", '
+            f'"region": "{region}", "status": "{status}", "error_code": "{error_code}", '
+            f'"latency_ms": {latency}, "amount": {round(rng.uniform(1.0, 500.0), 2)}}}\n')
+
+
+def write_synthetic_log(path, lines, incident="outage", seed=7, rate=1000.0):
+    """Deterministic synthetic capture: `lines` transactions at `rate` tx/s ending now."""
+    rng = random.Random(seed)
+    start = time.time() - lines / rate
+    with open(path, "w", buffering=1 << 20) as f:
+        for i in range(lines):
+            f.write(synthetic_line(rng, start + i / rate, incident))
+
+
+def append_lines(path, lines, incident, rng):
+    now = time.time()
+    with open(path, "a") as f:
+        for i in range(lines):
+            f.write(synthetic_line(rng, now, incident))
+
+
+def timed_cycle(app, config):
+    """Runs one cycle (auto-approving the sentry). Returns (per-node seconds, total seconds)."""
+    nodes = {}
+    started = last = time.perf_counter()
+    for stream_input in ({"reasoning_log": []}, None):
+        for event in app.stream(stream_input, config=config):
+            now = time.perf_counter()
+            for node in event:
+                if not node.startswith("__"):
+                    nodes[node] = nodes.get(node, 0.0) + (now - last)
+            last = now
+        snapshot = app.get_state(config)
+        if not (snapshot.next and "sentry" in snapshot.next):
+            break
+    return nodes, time.perf_counter() - started
+
+
+def checkpoint_bytes(agent, config):
+    saved = agent.checkpointer.get_tuple(config)
+    if saved is None:
+        return 0
+    return len(agent.checkpointer.serde.dumps_typed(saved.checkpoint)[1])
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def bench_log_size(agent, log_path, size, cycles, append_per_cycle, incident):
+    from log_tail import LogTailer
+
+    write_synthetic_log(log_path, size, incident)
+    agent.attach_log_source(LogTailer(log_path, backfill_lines=agent.OBSERVER_WINDOW))
+    config = {"configurable": {"thread_id": f"bench_size_{size}"}}
+
+    started = time.perf_counter()
+    agent.observer_node({})
+    cold_start = time.perf_counter() - started
+
+    rng = random.Random(size)
+    per_node, totals, peaks = {}, [], []
+    for i in range(cycles):
+        append_lines(log_path, append_per_cycle, incident, rng)
+        trace = i == cycles - 1  # tracemalloc distorts timings, so only the last cycle
+        if trace:
+            tracemalloc.start()
+        nodes, total = timed_cycle(agent.app, config)
+        if trace:
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        else:
+            totals.append(total)
+            for node, seconds in nodes.items():
+                per_node.setdefault(node, []).append(seconds)
+
+    return {
+        "log_lines": size,
+        "log_bytes": os.path.getsize(log_path),
+        "observer_cold_start_ms": round(cold_start * 1000, 3),
+        "cycle": summarize(totals or [0.0]),
+        "nodes": {node: summarize(samples) for node, samples in per_node.items()},
+        "peak_alloc_bytes": max(peaks) if peaks else None,
+        "checkpoint_bytes": checkpoint_bytes(agent, config)
+    }
+
+
+async def bench_threads(agent, threads, cycles):
+    durations = []
+
+    async def one_thread(n):
+        config = {"configurable": {"thread_id": f"bench_thread_{threads}_{n}"}}
+        for _ in range(cycles):
+            cycle_started = time.perf_counter()
+            await agent.app.ainvoke({"reasoning_log": []}, config=config)
+            snapshot = await agent.app.aget_state(config)
+            if snapshot.next and "sentry" in snapshot.next:
+                await agent.app.ainvoke(None, config=config)
+            durations.append(time.perf_counter() - cycle_started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_thread(n) for n in range(threads)))
+    elapsed = time.perf_counter() - started
+    return {
+        "threads": threads,
+        "cycles": threads * cycles,
+        "elapsed_s": round(elapsed, 3),
+        "cycles_per_s": round(threads * cycles / elapsed, 2),
+        "cycle": summarize(durations)
+    }
+
+
+def git_version():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline agent pipeline benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--append", type=int, default=500, help="New log lines between cycles")
+    parser.add_argument("--incident", choices=["none", "outage", "spam"], default="outage")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM seconds per call")
+    parser.add_argument("--checkpointer", choices=["memory", "sqlite"], default="sqlite")
+    parser.add_argument("--cache", action="store_true", help="Keep the LLM result caches enabled")
+    parser.add_argument("--llm-rpm", type=float, default=0.0,
+                        help="agent.llm_limiter requests/minute (0 = unlimited, so the pipeline is measured, not the bucket)")
+    parser.add_argument("--llm-concurrency", type=int, default=0,
+                        help="agent.llm_limiter in-flight cap (0 = unlimited)")
+    parser.add_argument("--graph-mode", choices=["two_call", "single_call"], default="two_call",
+                        help="AGENT_GRAPH_MODE: reasoner + decider, or one structured-output call")
+    parser.add_argument("--speculative", action="store_true",
+                        help="AGENT_SPECULATIVE: start the LLM call alongside the rule engine")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    version = git_version()
+    out_path = os.path.abspath(args.out)
+    workdir = tempfile.mkdtemp(prefix="agent_bench_")
+    os.environ["AGENT_CHECKPOINT_DB"] = "memory" if args.checkpointer == "memory" else os.path.join(workdir, "bench.sqlite")
+    os.environ["AGENT_GRAPH_MODE"] = args.graph_mode
+    os.environ["AGENT_SPECULATIVE"] = "1" if args.speculative else "0"
+
+    import agent  # Loads rules.json from the repo dir
+
+    agent.llm = ScriptedLLM(latency=args.llm_latency)
+    agent.llm_limiter = LLMLimiter(
+        max_concurrency=args.llm_concurrency or 10 ** 6,
+        requests_per_minute=args.llm_rpm or 1e9,
+        burst=int(os.getenv("LLM_BURST", "5")) if args.llm_rpm else 10 ** 6
+    )
+    if not args.cache:
+        agent.reasoner_cache.ttl = agent.decider_cache.ttl = agent.assessor_cache.ttl = -1
+
+    shutil.copy(agent.ROUTING_CONFIG_FILE, workdir)
+    original_cwd = os.getcwd()
+    os.chdir(workdir)  # Executed actions only touch the scratch copies
+
+    try:
+        log_path = os.path.join(workdir, "transactions.log")
+        sizes = []
+        for size in args.sizes:
+            print(f"Log size {size:,} lines...")
+            sizes.append(bench_log_size(agent, log_path, size, args.cycles, args.append, args.incident))
+
+        threads = []
+        for count in args.threads:
+            print(f"{count} concurrent threads...")
+            threads.append(asyncio.run(bench_threads(agent, count, max(1, args.cycles // 4))))
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "version": version,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "log_sizes": sizes,
+        "threads": threads
+    }
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
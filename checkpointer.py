@@ -0,0 +1,160 @@
+import asyncio
+import os
+import sqlite3
+import zlib
+from fnmatch import fnmatchcase
+from typing import Dict, Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+CHECKPOINT_DB = os.getenv("AGENT_CHECKPOINT_DB", "agent_checkpoints.sqlite")
+CHECKPOINT_RETENTION = int(os.getenv("AGENT_CHECKPOINT_RETENTION", "20"))
+
+
+def parse_retention(spec: str) -> Dict[str, int]:
+    """'replay_*=0,hackathon_demo=50' -> {thread_id pattern: checkpoints kept}."""
+    retention = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        pattern, sep, count = item.rpartition("=")
+        if not sep or not pattern.strip():
+            raise ValueError(f"bad checkpoint retention {item!r} (expected thread_id=count)")
+        retention[pattern.strip()] = int(count)
+    return retention
+
+
+# Per-thread overrides of CHECKPOINT_RETENTION: a long-lived production thread
+# may want a deep history while replay/bench threads keep a few (0 keeps all)
+CHECKPOINT_RETENTION_BY_THREAD = parse_retention(os.getenv("AGENT_CHECKPOINT_RETENTION_BY_THREAD", ""))
+
+# Channels that are cheap to rebuild and expensive to store. latest_logs is
+# up to 100 transaction dicts per checkpoint and is recomputed every cycle.
+EPHEMERAL_CHANNELS = ("latest_logs",)
+
+
+class CompressedSerializer:
+    """Wraps LangGraph's serializer and zlib-compresses every blob."""
+
+    SUFFIX = "+zlib"
+
+    def __init__(self, inner=None, level: int = 6):
+        self.inner = inner or JsonPlusSerializer()
+        self.level = level
+
+    def dumps_typed(self, obj):
+        type_, data = self.inner.dumps_typed(obj)
+        return type_ + self.SUFFIX, zlib.compress(data, self.level)
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_.endswith(self.SUFFIX):
+            return self.inner.loads_typed((type_[:-len(self.SUFFIX)], zlib.decompress(payload)))
+        return self.inner.loads_typed(data)  # Rows written before compression was enabled
+
+    def dumps(self, obj):
+        return self.inner.dumps(obj)
+
+    def loads(self, data):
+        return self.inner.loads(data)
+
+
+class CompactSqliteSaver(SqliteSaver):
+    """
+    SQLite (WAL) checkpointer that:
+    - keeps only the newest `retention` checkpoints per thread (or the
+      thread's entry in `retention_by_thread`, see retention_for),
+    - compresses checkpoint and write blobs,
+    - leaves EPHEMERAL_CHANNELS out of everything it persists.
+    A graph paused at the sentry survives a restart because its checkpoint is on disk.
+
+    SqliteSaver is sync-only, so the async methods run the sync ones in a
+    worker thread (the connection is shared and guarded by SqliteSaver's lock).
+    """
+
+    def __init__(self, conn: sqlite3.Connection, retention: int = CHECKPOINT_RETENTION,
+                 exclude_channels=EPHEMERAL_CHANNELS, retention_by_thread: Optional[Dict[str, int]] = None):
+        super().__init__(conn, serde=CompressedSerializer())
+        self.retention = retention
+        self.retention_by_thread = CHECKPOINT_RETENTION_BY_THREAD if retention_by_thread is None else retention_by_thread
+        self.exclude_channels = set(exclude_channels)
+
+    @classmethod
+    def from_path(cls, path: str = CHECKPOINT_DB, **kwargs) -> "CompactSqliteSaver":
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return cls(conn, **kwargs)
+
+    # --- Sync API ---
+    def put(self, config, checkpoint, metadata, new_versions):
+        values = checkpoint.get("channel_values", {})
+        if self.exclude_channels & values.keys():
+            checkpoint = {
+                **checkpoint,
+                "channel_values": {k: v for k, v in values.items() if k not in self.exclude_channels}
+            }
+        # Older LangGraph versions copy every node's output into metadata["writes"]
+        writes = metadata.get("writes")
+        if isinstance(writes, dict):
+            metadata = {**metadata, "writes": {
+                node: ({k: v for k, v in update.items() if k not in self.exclude_channels}
+                       if isinstance(update, dict) else update)
+                for node, update in writes.items()
+            }}
+
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self.prune(config["configurable"]["thread_id"])
+        return next_config
+
+    def put_writes(self, config, writes, task_id, *args, **kwargs):
+        writes = [(channel, value) for channel, value in writes if channel not in self.exclude_channels]
+        return super().put_writes(config, writes, task_id, *args, **kwargs)
+
+    def retention_for(self, thread_id: str) -> int:
+        """The thread's own entry, else the first matching pattern, else `retention`."""
+        if thread_id in self.retention_by_thread:
+            return self.retention_by_thread[thread_id]
+        for pattern, retention in self.retention_by_thread.items():
+            if fnmatchcase(thread_id, pattern):
+                return retention
+        return self.retention
+
+    def prune(self, thread_id: str):
+        """Drops all but the thread's newest retention_for() checkpoints (and their writes)."""
+        retention = self.retention_for(thread_id)
+        if retention <= 0:
+            return
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                (thread_id, retention - 1)
+            )
+            row = cur.fetchone()
+            if row is None:
+                return
+            oldest_kept = row[0]
+            cur.execute("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, oldest_kept))
+            cur.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id < ?", (thread_id, oldest_kept))
+
+    # --- Async API (server.py uses app.astream) ---
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, **kwargs):
+        for item in await asyncio.to_thread(lambda: list(self.list(config, **kwargs))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, *args, **kwargs):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, *args, **kwargs)
+
+
+def build_checkpointer(path: str = CHECKPOINT_DB):
+    """AGENT_CHECKPOINT_DB=memory keeps the old in-process MemorySaver."""
+    if path == "memory":
+        return MemorySaver()
+    return CompactSqliteSaver.from_path(path)
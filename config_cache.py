@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers in one process still serialize on the thread lock
+    fcntl = None
+
+ROUTING_CONFIG_FILE = "routing_config.json"
+SECURITY_POLICY_FILE = "security_policy.json"
+DEFAULT_ROUTING_CONFIG = {
+    "US": "stripe",
+    "UK": "stripe",
+    "IN": "stripe",
+    "EU": "adyen",
+    "global_default": "stripe"
+}
+
+
+class CachedJsonFile:
+    """
+    Serves a parsed JSON file from memory and only re-parses it when the
+    file changes. Each get() costs one os.stat; the (mtime_ns, size, inode)
+    signature catches in-place writes as well as atomic replaces, so a change
+    made by the agent is picked up on the very next call.
+
+    Writes go through update(): an fcntl lock on `<path>.lock` serializes
+    read-modify-write across processes, and the new content is written to a
+    temp file and os.replace()d in, so readers never block and never see a
+    torn file. `generation` bumps whenever the content this process sees
+    changes; derive() caches anything computed from it until then.
+
+    `transform` is applied once per reload (e.g. to build a lookup set), so
+    hot-path callers get the derived structure for free. Callers must treat
+    the returned object as read-only.
+    """
+
+    def __init__(self, path: str, default: Any = None, create: bool = False,
+                 transform: Optional[Callable[[Any], Any]] = None, indent: Optional[int] = 4):
+        self.path = path
+        self.default = default
+        self.create = create
+        self.transform = transform
+        self.indent = indent
+        self.reloads = 0
+        self.generation = 0
+
+        self._lock = threading.RLock()
+        self._signature = None
+        self._data = default
+        self._value = self._apply(default)
+        self._derived = {}
+
+    def _apply(self, data):
+        return self.transform(data) if self.transform else data
+
+    def _publish(self, data, signature):
+        self._data = data
+        self._value = self._apply(data)
+        self._signature = signature
+        self._derived = {}
+        self.generation += 1
+
+    def get(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self.create and self.default is not None:
+                self.update(lambda data: data)
+                return self._value
+            if self._signature is not None:
+                with self._lock:
+                    self._publish(self.default, None)
+            return self._value
+
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if signature != self._signature:
+            with self._lock:
+                if signature == self._signature:
+                    return self._value
+                try:
+                    with open(self.path, "r") as f:
+                        data = json.load(f)
+                except json.JSONDecodeError:
+                    # A file written in place by something other than update():
+                    # keep serving the last good copy and retry on the next call.
+                    return self._value
+                self._publish(data, signature)
+                self.reloads += 1
+        return self._value
+
+    def derive(self, func: Callable[[Any], Any]):
+        """func(raw data), recomputed only when the generation changes."""
+        self.get()
+        with self._lock:
+            key = (func, self.generation)
+            if key not in self._derived:
+                self._derived[key] = func(self._data)
+            return self._derived[key]
+
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def update(self, mutator: Callable[[Any], Any]):
+        """
+        Locked read-modify-write. `mutator` gets a private copy of the current
+        content and either mutates it or returns a replacement. Returns the
+        content that was written.
+        """
+        with self._file_lock():
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                data = json.loads(json.dumps(self.default))
+            result = mutator(data)
+            data = data if result is None else result
+            self._write(data)
+            st = os.stat(self.path)
+            self._publish(data, (st.st_mtime_ns, st.st_size, st.st_ino))
+            return data
+
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(self.path)}.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=self.indent)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+# Shared by the agent, its tools and the simulators (paths are relative to
+# the working directory, like everywhere else in the repo)
+routing_store = CachedJsonFile(ROUTING_CONFIG_FILE, default=DEFAULT_ROUTING_CONFIG, create=True)
+policy_store = CachedJsonFile(SECURITY_POLICY_FILE, default=[])
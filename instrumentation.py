@@ -0,0 +1,228 @@
+import bisect
+import contextvars
+import inspect
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import RunnableLambda
+
+# Seconds. Spans an in-memory node (~ms) up to a slow LLM call (~10s+).
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# The graph node currently running in this context (propagates into
+# asyncio tasks and asyncio.to_thread), so LLM callbacks can be attributed.
+current_node: contextvars.ContextVar[str] = contextvars.ContextVar("current_node", default="unknown")
+current_trace: contextvars.ContextVar[str] = contextvars.ContextVar("current_trace", default="")
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], kind: str):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self.lock = threading.Lock()
+
+    def _labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames, "counter")
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self, openmetrics: bool):
+        # OpenMetrics names the family without _total; samples keep it
+        family = self.name[:-len("_total")] if openmetrics and self.name.endswith("_total") else self.name
+        lines = [f"# HELP {family} {self.help}", f"# TYPE {family} counter"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{self._labels(labels)} {_num(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram. Remembers one exemplar (trace id) per bucket."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames, "histogram")
+        self.buckets = tuple(buckets)
+        self.series: Dict[LabelValues, list] = {}  # labels -> [bucket counts, sum, count, exemplars]
+
+    def observe(self, value: float, *labels: str, trace_id: str = ""):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                size = len(self.buckets) + 1
+                series = self.series[labels] = [[0] * size, 0.0, 0, [None] * size]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            if trace_id:
+                series[3][index] = (trace_id, value, time.time())
+
+    def render(self, openmetrics: bool):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, (counts, total, count, exemplars) in sorted(self.series.items()):
+                cumulative = 0
+                for i, bound in enumerate(self.buckets + (float("inf"),)):
+                    cumulative += counts[i]
+                    le = "+Inf" if bound == float("inf") else _num(bound)
+                    le_label = 'le="' + le + '"'
+                    line = f"{self.name}_bucket{self._labels(labels, le_label)} {cumulative}"
+                    if openmetrics and exemplars[i]:
+                        trace_id, value, ts = exemplars[i]
+                        line += f' # {{trace_id="{_escape(trace_id)}"}} {_num(value)} {ts:.3f}'
+                    lines.append(line)
+                lines.append(f"{self.name}_sum{self._labels(labels)} {_num(total)}")
+                lines.append(f"{self.name}_count{self._labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, openmetrics: bool = False) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+registry = Registry()
+
+NODE_RUNS = registry.counter("agent_node_runs_total", "Graph node executions.", ["node", "outcome"])
+NODE_WALL = registry.histogram("agent_node_wall_seconds", "Wall-clock time per graph node.", ["node"])
+NODE_CPU = registry.histogram(
+    "agent_node_cpu_seconds", "CPU time per graph node on the calling thread (the event loop for async runs).", ["node"])
+LLM_LATENCY = registry.histogram("agent_llm_latency_seconds", "LLM round-trip latency.", ["node"])
+LLM_TOKENS = registry.counter("agent_llm_tokens_total", "LLM tokens used.", ["node", "kind"])
+LOG_BYTES = registry.counter("agent_observer_log_bytes_total", "Bytes read from the transaction log.")
+LLM_PROVIDER_CALLS = registry.counter(
+    "agent_llm_provider_calls_total", "LLM calls per provider (ok, error, rate_limited, cancelled hedge loser, skipped by open breaker).",
+    ["provider", "outcome"])
+LLM_HEDGES = registry.counter("agent_llm_hedged_total", "Hedge requests sent after the p90 delay, by provider.", ["provider"])
+SPECULATION = registry.counter(
+    "agent_speculation_total", "Speculative cycles by winner (rule = no LLM call made, llm = LLM result used).", ["winner"])
+PROMPT_TOKENS = registry.histogram(
+    "agent_llm_prompt_tokens", "Estimated prompt size per LLM call (prompt_builder.estimate_tokens).", ["node"],
+    buckets=(64, 128, 256, 512, 768, 1024, 1536, 2048, 4096, 8192))
+
+
+def _thread_id(config: Optional[dict]) -> str:
+    return str(((config or {}).get("configurable") or {}).get("thread_id", "unknown"))
+
+
+def _record(name: str, thread_id: str, wall_start: float, cpu_start: float, outcome: str):
+    NODE_WALL.observe(time.perf_counter() - wall_start, name, trace_id=thread_id)
+    NODE_CPU.observe(time.thread_time() - cpu_start, name, trace_id=thread_id)
+    NODE_RUNS.inc(name, outcome)
+
+
+def instrumented_node(name: str, func, afunc=None) -> RunnableLambda:
+    """
+    Wraps a node's sync (and async) implementation so every run records wall
+    time, CPU time and outcome, labelled by node, with the thread_id as the
+    trace id. Costs a few microseconds per node run. Implementations that
+    take a `config` argument receive the run's config.
+    """
+    if "config" in inspect.signature(func).parameters:
+        call = func
+    else:
+        call = lambda state, config: func(state)
+    if afunc is not None and "config" in inspect.signature(afunc).parameters:
+        acall = afunc
+    else:
+        acall = lambda state, config: afunc(state)
+
+    def run(state, config=None):
+        node_token, trace_token = current_node.set(name), current_trace.set(_thread_id(config))
+        wall_start, cpu_start, outcome = time.perf_counter(), time.thread_time(), "error"
+        try:
+            result = call(state, config)
+            outcome = "ok"
+            return result
+        finally:
+            _record(name, current_trace.get(), wall_start, cpu_start, outcome)
+            current_node.reset(node_token)
+            current_trace.reset(trace_token)
+
+    async def arun(state, config=None):
+        node_token, trace_token = current_node.set(name), current_trace.set(_thread_id(config))
+        wall_start, cpu_start, outcome = time.perf_counter(), time.thread_time(), "error"
+        try:
+            result = await acall(state, config)
+            outcome = "ok"
+            return result
+        finally:
+            _record(name, current_trace.get(), wall_start, cpu_start, outcome)
+            current_node.reset(node_token)
+            current_trace.reset(trace_token)
+
+    return RunnableLambda(run, afunc=arun if afunc else None, name=name)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """LangChain callback: LLM latency and token usage, attributed to the running node."""
+
+    def __init__(self):
+        self._started: Dict[object, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        node = current_node.get()
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            LLM_LATENCY.observe(time.perf_counter() - started, node, trace_id=current_trace.get())
+
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage and response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+            meta = getattr(message, "usage_metadata", None) or {}
+            usage = {"prompt_tokens": meta.get("input_tokens", 0), "completion_tokens": meta.get("output_tokens", 0)}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(node, kind.replace("_tokens", ""), amount=usage[kind])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
@@ -0,0 +1,107 @@
+import math
+from typing import Dict, Optional
+
+# DDSketch-style log-bucketed histogram. Every value in a bin is within
+# RELATIVE_ACCURACY of the bin's representative value, and the number of
+# bins is capped, so memory stays fixed no matter how much traffic we see.
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+MAX_BINS = 2048
+ZERO_BIN = None  # Values <= 0 (e.g. a malformed latency) are counted separately
+
+DEFAULT_QUANTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+def bin_index(value: float) -> Optional[int]:
+    """Maps a value to its bin. Compute once per transaction and reuse it
+    across every sketch that uses the same accuracy."""
+    if value <= 0:
+        return ZERO_BIN
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def bin_value(index: Optional[int]) -> float:
+    if index is ZERO_BIN:
+        return 0.0
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class LatencySketch:
+    """
+    Mergeable quantile sketch. Supports removal (the bins are plain counts),
+    so it can back a sliding window as well as a cumulative view.
+    """
+    __slots__ = ("bins", "zero_count", "count", "max_bins")
+
+    def __init__(self, max_bins: int = MAX_BINS):
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.max_bins = max_bins
+
+    def add(self, value: float):
+        self.add_bin(bin_index(value))
+
+    def add_bin(self, index: Optional[int], count: int = 1):
+        self.count += count
+        if index is ZERO_BIN:
+            self.zero_count += count
+            return
+        if index not in self.bins and len(self.bins) >= self.max_bins:
+            index = self._collapse(index)
+        self.bins[index] = self.bins.get(index, 0) + count
+
+    def remove_bin(self, index: Optional[int], count: int = 1):
+        self.count -= count
+        if index is ZERO_BIN:
+            self.zero_count -= count
+            return
+        if index not in self.bins:
+            # The bin was folded into the lowest bin by a collapse
+            index = min(self.bins)
+        remaining = self.bins[index] - count
+        if remaining > 0:
+            self.bins[index] = remaining
+        else:
+            del self.bins[index]
+
+    def merge(self, other: "LatencySketch"):
+        self.zero_count += other.zero_count
+        self.count += other.zero_count
+        for index, count in other.bins.items():
+            self.add_bin(index, count)
+
+    def subtract(self, other: "LatencySketch"):
+        self.zero_count -= other.zero_count
+        self.count -= other.zero_count
+        for index, count in other.bins.items():
+            self.remove_bin(index, count)
+
+    def _collapse(self, incoming: int) -> int:
+        # Sacrifice accuracy at the low end, where latency matters least
+        lowest = min(self.bins)
+        if incoming < lowest:
+            return lowest
+        merged = self.bins.pop(lowest)
+        successor = min(self.bins)
+        self.bins[successor] += merged
+        return max(incoming, successor)
+
+    def quantile(self, q: float) -> float:
+        if self.count <= 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return bin_value(index)
+        return bin_value(max(self.bins))
+
+    def percentiles(self, quantiles: Dict[str, float] = DEFAULT_QUANTILES) -> dict:
+        summary = {label: round(self.quantile(q), 1) for label, q in quantiles.items()}
+        summary["count"] = self.count
+        return summary
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+class ResultCache:
+    """
+    Small LRU cache with a TTL, used to skip LLM round-trips when the input
+    the LLM would see hasn't meaningfully changed since the last cycle.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}"
+
+
+def _digest(payload) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def metrics_fingerprint(metrics: dict, rate_band: float = 0.02, count_band: int = 5) -> str:
+    """
+    Normalized fingerprint of what the reasoner sees. Counts and the success
+    rate are quantized into bands so jitter between cycles still hits.
+    Latency is bucketed by doubling of p95.
+    """
+    latency = {
+        key: int(math.log2(max(p.get("p95", 0), 1)))
+        for key, p in metrics.get("latency_percentiles", {}).items()
+    }
+    return _digest({
+        "rate": round(metrics.get("global_success_rate", 1.0) / rate_band),
+        "clusters": {k: v // count_band for k, v in metrics.get("failure_clusters", {}).items()},
+        "alerts": {k: v // count_band for k, v in metrics.get("security_alerts", {}).items()},
+        "latency": latency
+    })
+
+
+def decision_fingerprint(hypothesis: str, policies_summary: str, history: list) -> str:
+    """Fingerprint of everything the decider's prompt depends on."""
+    return _digest({
+        "hypothesis": hypothesis.strip(),
+        "policies": policies_summary,
+        "history": history
+    })
@@ -0,0 +1,403 @@
+"""
+Multi-provider LLM client.
+
+LLMClient looks like a ChatOpenAI to agent.py (invoke / ainvoke /
+bind_tools / with_structured_output) but runs each call against an ordered
+list of OpenAI-compatible providers:
+- all providers share one pooled httpx client (one per event loop for async
+  calls), so calls reuse keep-alive connections instead of reconnecting,
+- bind_tools / with_structured_output runnables are built once per provider,
+- a provider that errors or hits its own timeout falls back to the next one,
+- consecutive failures open that provider's circuit breaker for a cooldown
+  (429s don't count: LLMLimiter backs off and retries those),
+- hedging: if the provider in flight hasn't answered within its recent p90
+  latency, the same request also goes to the next provider; the first
+  answer wins and the other request is cancelled.
+
+Providers come from LLM_PROVIDERS_FILE (default llm_providers.json), a JSON list:
+
+    [{"name": "groq", "base_url": "https://api.groq.com/openai/v1",
+      "model": "meta-llama/llama-4-maverick-17b-128e-instruct", "api_key_env": "GROQ_API_KEY", "timeout": 20},
+     {"name": "local", "base_url": "http://127.0.0.1:8088/v1", "model": "stub", "timeout": 5}]
+
+Without the file, the single Groq provider the agent has always used.
+`python llm_stub.py --port 8088` serves a local OpenAI-compatible endpoint
+to point a provider at.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from instrumentation import LLM_PROVIDER_CALLS, LLM_HEDGES
+from latency_sketch import LatencySketch, bin_index
+from rate_limit import is_rate_limited
+
+LLM_PROVIDERS_FILE = os.getenv("LLM_PROVIDERS_FILE", "llm_providers.json")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1") == "1"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.9"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0"))  # Until enough samples
+
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+DEFAULT_PROVIDERS = [{
+    "name": "groq",
+    "base_url": "https://api.groq.com/openai/v1",
+    "model": "meta-llama/llama-4-maverick-17b-128e-instruct",
+    "api_key_env": "GROQ_API_KEY"
+}]
+
+
+class LLMUnavailableError(RuntimeError):
+    """Every provider's circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures. Once `cooldown` seconds
+    have passed it lets a single trial call through (half-open): success
+    closes it, failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN,
+                 clock: Callable[[], float] = time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self._trial or self.clock() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._trial or self.clock() - self.opened_at < self.cooldown:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures, self.opened_at, self._trial = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+    def release(self):
+        """A call that was cancelled (lost a hedge) says nothing about health."""
+        with self._lock:
+            self._trial = False
+
+
+class LatencyTracker:
+    """Quantiles of a provider's last `size` successful calls (a sketch over a ring of bins)."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20, default: float = LLM_HEDGE_DEFAULT_DELAY):
+        self.min_samples = min_samples
+        self.default = default
+        self.sketch = LatencySketch()
+        self.recent = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bin_index(seconds)
+        with self._lock:
+            if len(self.recent) == self.recent.maxlen:
+                self.sketch.remove_bin(self.recent[0])
+            self.recent.append(index)
+            self.sketch.add_bin(index)
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            if self.sketch.count < self.min_samples:
+                return self.default
+            return self.sketch.quantile(q)
+
+
+# One connection pool for every provider. httpx.AsyncClient belongs to the
+# event loop it was first used on, so it is (re)created per running loop.
+_limits = httpx.Limits(max_connections=LLM_POOL_SIZE, max_keepalive_connections=LLM_POOL_SIZE)
+_http_client = httpx.Client(limits=_limits)
+_async_client = (None, None, None)  # (loop, client, holder)
+
+
+async def _loop_client():
+    # Held open by an async generator the loop knows about, so the client is
+    # closed on its own loop: by shutdown_asyncgens() when asyncio.run ends,
+    # or by the loop's finalizer if the holder is dropped while the loop lives
+    client = httpx.AsyncClient(limits=_limits)
+    try:
+        yield client
+    finally:
+        await client.aclose()
+
+
+def async_http_client(loop: asyncio.AbstractEventLoop) -> httpx.AsyncClient:
+    """The running loop's client (call from a coroutine on `loop`)."""
+    global _async_client
+    if _async_client[0] is not loop:
+        holder = _loop_client()
+        try:
+            holder.asend(None).send(None)  # Runs to the yield without suspending, registering with the loop
+        except StopIteration as started:
+            _async_client = (loop, started.value, holder)
+    return _async_client[1]
+
+
+class Provider:
+    """One OpenAI-compatible endpoint, with its own timeout, breaker and latency stats."""
+
+    def __init__(self, name: str, base_url: str, model: str, api_key_env: Optional[str] = None,
+                 timeout: float = LLM_TIMEOUT, temperature: float = 0.5, callbacks: Optional[list] = None):
+        self.name = name
+        self.base_url = base_url
+        self.model = model
+        self.api_key_env = api_key_env
+        self.timeout = timeout
+        self.temperature = temperature
+        self.callbacks = callbacks or []
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._runnables: Dict[Any, Any] = {}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _chat_model(self, loop) -> ChatOpenAI:
+        # Local stub servers don't check the key, but the SDK insists on one
+        api_key = (os.getenv(self.api_key_env) or "").strip() if self.api_key_env else "unused"
+        return ChatOpenAI(
+            model=self.model,
+            api_key=api_key or None,
+            base_url=self.base_url,
+            temperature=self.temperature,
+            timeout=self.timeout,
+            max_retries=0,  # Failover (and the LLMLimiter's 429 backoff) replace SDK retries
+            http_client=_http_client,
+            http_async_client=async_http_client(loop) if loop is not None else None,
+            callbacks=self.callbacks
+        )
+
+    def runnable(self, key, bind: Optional[Callable], loop=None):
+        """The chat model (or its tool-bound / structured form), built once per binding."""
+        with self._lock:
+            if loop is not None and loop is not self._loop:
+                # A new event loop: drop runnables tied to the old loop's client
+                self._runnables = {k: v for k, v in self._runnables.items() if not k[0]}
+                self._loop = loop
+            cache_key = (loop is not None, key)
+            runnable = self._runnables.get(cache_key)
+            if runnable is None:
+                model = self._chat_model(loop)
+                runnable = self._runnables[cache_key] = bind(model) if bind else model
+            return runnable
+
+    def call(self, key, bind, call: Callable[[Any], Any]):
+        started = time.perf_counter()
+        try:
+            result = call(self.runnable(key, bind))
+        except Exception as e:
+            self._failed(e)
+            raise
+        self.latency.observe(time.perf_counter() - started)
+        self.breaker.success()
+        LLM_PROVIDER_CALLS.inc(self.name, "ok")
+        return result
+
+    def _failed(self, error: Exception):
+        if is_rate_limited(error):
+            # A 429 means "slow down", not "unhealthy": LLMLimiter backs off and retries
+            # it, which an open breaker (LLMUnavailableError) would prevent
+            self.breaker.release()
+            LLM_PROVIDER_CALLS.inc(self.name, "rate_limited")
+        else:
+            self.breaker.failure()
+            LLM_PROVIDER_CALLS.inc(self.name, "error")
+
+    async def acall(self, key, bind, call: Callable[[Any], Any]):
+        started = time.perf_counter()
+        try:
+            result = await call(self.runnable(key, bind, asyncio.get_running_loop()))
+        except asyncio.CancelledError:
+            # Record the hedge loser's wait too, or p90 would only see the fast calls and keep shrinking
+            self.latency.observe(time.perf_counter() - started)
+            self.breaker.release()
+            LLM_PROVIDER_CALLS.inc(self.name, "cancelled")
+            raise
+        except Exception as e:
+            self._failed(e)
+            raise
+        self.latency.observe(time.perf_counter() - started)
+        self.breaker.success()
+        LLM_PROVIDER_CALLS.inc(self.name, "ok")
+        return result
+
+
+# Sync hedged calls run on worker threads
+_pool = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm")
+_NO_RESULT = object()
+
+
+class LLMClient:
+    """
+    Drop-in for a ChatOpenAI across several providers. bind_tools() and
+    with_structured_output() return cached views that share the providers
+    (and so their breakers and latency stats).
+    """
+
+    def __init__(self, providers: List[Provider], hedge: bool = LLM_HEDGE, key: Any = None,
+                 bind: Optional[Callable] = None, views: Optional[dict] = None):
+        if not providers:
+            raise ValueError("LLMClient needs at least one provider")
+        self.providers = providers
+        self.hedge = hedge and len(providers) > 1
+        self.key = key
+        self.bind = bind
+        self._views = {} if views is None else views
+
+    @classmethod
+    def from_env(cls, callbacks: Optional[list] = None) -> "LLMClient":
+        specs = DEFAULT_PROVIDERS
+        if os.path.exists(LLM_PROVIDERS_FILE):
+            with open(LLM_PROVIDERS_FILE, "r") as f:
+                specs = json.load(f)
+        return cls([Provider(callbacks=callbacks, **spec) for spec in specs])
+
+    def _view(self, key, bind: Callable) -> "LLMClient":
+        view = self._views.get(key)
+        if view is None:
+            view = self._views[key] = LLMClient(self.providers, self.hedge, key, bind, self._views)
+        return view
+
+    def bind_tools(self, tools, **kwargs) -> "LLMClient":
+        names = tuple(getattr(tool, "name", str(tool)) for tool in tools)
+        return self._view(("tools", names, repr(sorted(kwargs.items()))),
+                          lambda model: model.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, schema, **kwargs) -> "LLMClient":
+        return self._view(("structured", schema, repr(sorted(kwargs.items()))),
+                          lambda model: model.with_structured_output(schema, **kwargs))
+
+    def _hedge_delay(self, provider: Provider) -> float:
+        return provider.latency.quantile(LLM_HEDGE_QUANTILE)
+
+    def invoke(self, input, config=None, **kwargs):
+        call = lambda runnable: runnable.invoke(input, config, **kwargs)
+        if not self.hedge:
+            return self._invoke_in_order(call)
+        candidates, pending, errors = iter(self.providers), {}, []
+        hedge = True
+
+        def start_next() -> bool:
+            for provider in candidates:
+                if provider.breaker.allow():
+                    # copy_context: LLM callbacks still see the running node
+                    future = _pool.submit(contextvars.copy_context().run, provider.call, self.key, self.bind, call)
+                    pending[future] = provider
+                    return True
+                LLM_PROVIDER_CALLS.inc(provider.name, "skipped")
+            return False
+
+        if not start_next():
+            raise LLMUnavailableError("all LLM providers have an open circuit breaker")
+        while pending:
+            timeout = self._hedge_delay(next(iter(pending.values()))) if hedge else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Slow answer: ask the next provider too (a thread can't be
+                # cancelled, so the loser runs to completion and is ignored)
+                hedge = False
+                if start_next():
+                    LLM_HEDGES.inc(pending[list(pending)[-1]].name)
+                continue
+            result = self._first_result(done, pending, errors)
+            if result is not _NO_RESULT:
+                return result
+            if not pending:
+                start_next()
+        raise errors[-1]
+
+    def _invoke_in_order(self, call):
+        # No hedging: plain fallback on the calling thread
+        errors = []
+        for provider in self.providers:
+            if not provider.breaker.allow():
+                LLM_PROVIDER_CALLS.inc(provider.name, "skipped")
+                continue
+            try:
+                return provider.call(self.key, self.bind, call)
+            except Exception as e:
+                errors.append(e)
+        if not errors:
+            raise LLMUnavailableError("all LLM providers have an open circuit breaker")
+        raise errors[-1]
+
+    @staticmethod
+    def _first_result(done, pending: dict, errors: list):
+        # Every finished call's error is collected (and so retrieved) even when another one won
+        result = _NO_RESULT
+        for finished in done:
+            pending.pop(finished)
+            error = finished.exception()
+            if error is not None:
+                errors.append(error)
+            elif result is _NO_RESULT:
+                result = finished.result()
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        call = lambda runnable: runnable.ainvoke(input, config, **kwargs)
+        candidates, pending, errors = iter(self.providers), {}, []
+        hedge = self.hedge
+
+        def start_next() -> bool:
+            for provider in candidates:
+                if provider.breaker.allow():
+                    pending[asyncio.create_task(provider.acall(self.key, self.bind, call))] = provider
+                    return True
+                LLM_PROVIDER_CALLS.inc(provider.name, "skipped")
+            return False
+
+        if not start_next():
+            raise LLMUnavailableError("all LLM providers have an open circuit breaker")
+        try:
+            while pending:
+                timeout = self._hedge_delay(next(iter(pending.values()))) if hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedge = False
+                    if start_next():
+                        LLM_HEDGES.inc(pending[list(pending)[-1]].name)
+                    continue
+                result = self._first_result(done, pending, errors)
+                if result is not _NO_RESULT:
+                    return result
+                if not pending:
+                    start_next()
+        finally:
+            for task in pending:
+                task.cancel()  # The hedge loser
+        raise errors[-1]
@@ -0,0 +1,113 @@
+"""
+Local OpenAI-compatible chat completions server for exercising llm_client.py
+(fallback, hedging, circuit breakers) without a Groq key:
+
+    python llm_stub.py --port 8088 --latency 0.2 --jitter 0.3 --fail-rate 0.1
+
+Answers come from bench.ScriptedLLM, so the agent behaves as it does in the
+benchmark: plain prompts get a "Hypothesis: ..." diagnosis, tool-bound
+prompts a tool call, structured-output requests an IncidentAssessment.
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench import ScriptedLLM, TOOL_NAMES
+
+
+def completion_message(body: dict) -> dict:
+    text = "\n".join(str(m.get("content") or "") for m in body.get("messages", []))
+    tools = [t["function"]["name"] for t in body.get("tools", []) if "function" in t]
+
+    if tools and set(tools) & TOOL_NAMES:
+        answer = ScriptedLLM._decide(text)
+        calls = [(call["name"], call["args"]) for call in answer.tool_calls]
+        return _message(answer.content, calls)
+
+    if tools or body.get("response_format", {}).get("type") == "json_schema":
+        # with_structured_output: function_calling forces the schema's tool, json_schema wants JSON content
+        assessment = ScriptedLLM(schema=dict)._assess(text)
+        assessment.setdefault("action", "none")
+        if tools:
+            return _message("", [(tools[0], assessment)])
+        return _message(json.dumps(assessment), [])
+
+    return _message(ScriptedLLM._diagnose(text).content, [])
+
+
+def _message(content: str, calls: list) -> dict:
+    message = {"role": "assistant", "content": content or None}
+    if calls:
+        message["tool_calls"] = [
+            {"id": f"call_{random.getrandbits(32):08x}", "type": "function",
+             "function": {"name": name, "arguments": json.dumps(args)}}
+            for name, args in calls
+        ]
+    return message
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so the client's connection pool is exercised
+
+    # Set from the command line in main()
+    latency = 0.0
+    jitter = 0.0
+    fail_rate = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+        if random.random() < self.fail_rate:
+            return self._reply(500, {"error": {"message": "stub: injected failure", "type": "server_error"}})
+
+        message = completion_message(body)
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 4
+        self._reply(200, {
+            "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if message.get("tool_calls") else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 20, "total_tokens": prompt_tokens + 20}
+        })
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # One line per request drowns the agent's own output
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # The default backlog of 5 stalls bursts of new connections for ~1s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub LLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before every answer")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds, uniform in [0, jitter]")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    StubHandler.latency, StubHandler.jitter, StubHandler.fail_rate = args.latency, args.jitter, args.fail_rate
+    server = StubServer((args.host, args.port), StubHandler)
+    print(f"Stub LLM on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
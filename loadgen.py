@@ -0,0 +1,216 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Same universe as looger.generate_transaction, as index tables
+REGIONS = ["US", "UK", "IN", "EU"]
+GATEWAYS = ["stripe", "adyen"]
+AVG_LATENCY = np.array([150, 310])  # Indexed like GATEWAYS (see GATEWAY_PROFILES)
+SCENARIOS = ["normal", "uk_bank_outage", "adyen_latency_spike", "india_auth_bug", "retry_storm"]
+STORM_BURST = 50
+
+# status/error_code pairs the scenarios can produce
+OUTCOMES = [("SUCCESS", "00"), ("FAILED", "91"), ("FAILED", "401"), ("REJECTED", "429")]
+SUCCESS, OUTAGE, AUTH_BUG, SPAM = range(len(OUTCOMES))
+
+LINE_TEMPLATE = (
+    '{{"timestamp": "{ts}", "transaction_id": "tx_{txid}", "gateway": "{gateway}", '
+    '"region": "{region}", "status": "{status}", "error_code": "{error_code}", '
+    '"latency_ms": {latency}, "amount": {amount}}}\n'
+)
+
+
+class BatchGenerator:
+    """
+    Vectorized twin of looger.generate_transaction: draws a whole batch of
+    regions, outcomes, latencies and amounts with NumPy, applying the same
+    scenario rules, then serializes the batch in one pass.
+    """
+
+    def __init__(self, get_routing_config, get_blocked_regions, weights, seed=None):
+        self.get_routing_config = get_routing_config
+        self.get_blocked_regions = get_blocked_regions
+        self.weights = np.asarray(weights, dtype=float) / np.sum(weights)
+        self.rng = np.random.default_rng(seed)
+        self._second_prefix = {}
+
+    def scenario_per_row(self, n):
+        # One scenario draw per simulator loop; a retry_storm loop emits a burst
+        draws = self.rng.choice(len(SCENARIOS), size=n, p=self.weights)
+        repeats = np.where(draws == SCENARIOS.index("retry_storm"), STORM_BURST, 1)
+        return np.repeat(draws, repeats)[:n]
+
+    def generate(self, n, start_ts, rate):
+        rng = self.rng
+        config = self.get_routing_config()
+        blocked = self.get_blocked_regions()
+
+        # Routing is per region, so resolve it once into a lookup table
+        route = np.array([
+            GATEWAYS.index(config.get(r, config.get("global_default", "stripe"))) for r in REGIONS
+        ])
+        scenario = self.scenario_per_row(n)
+        region = rng.integers(0, len(REGIONS), n)
+        gateway = route[region]
+        latency = AVG_LATENCY[gateway] + rng.integers(-20, 51, n)
+        outcome = np.full(n, SUCCESS)
+
+        storm = scenario == SCENARIOS.index("retry_storm")
+        outage = (scenario == SCENARIOS.index("uk_bank_outage")) & (region == REGIONS.index("UK")) \
+            & (gateway == GATEWAYS.index("stripe")) & (rng.random(n) > 0.3)
+        spike = (scenario == SCENARIOS.index("adyen_latency_spike")) & (gateway == GATEWAYS.index("adyen"))
+        auth_bug = (scenario == SCENARIOS.index("india_auth_bug")) & (region == REGIONS.index("IN")) \
+            & (gateway == GATEWAYS.index("stripe"))
+
+        outcome[outage] = OUTAGE
+        outcome[auth_bug] = AUTH_BUG
+        outcome[storm] = SPAM
+        latency[spike] = rng.integers(5000, 9001, int(spike.sum()))
+        latency[storm] = 10
+
+        # Spam against a blocked region is dropped at the edge
+        keep = np.ones(n, dtype=bool)
+        if "global_default" in blocked:
+            keep &= ~storm
+        for r in blocked:
+            if r in REGIONS:
+                keep &= ~(storm & (region == REGIONS.index(r)))
+
+        amount = np.round(rng.uniform(1.0, 10.0, n), 2)
+        txid = rng.integers(0, 2 ** 24, n)
+        ts = start_ts + np.arange(n) / rate
+
+        return self.serialize(ts[keep], txid[keep], gateway[keep], region[keep],
+                              outcome[keep], latency[keep], amount[keep])
+
+    def serialize(self, ts, txid, gateway, region, outcome, latency, amount):
+        timestamps = [self._format_ts(t) for t in ts.tolist()]
+        lines = [
+            LINE_TEMPLATE.format(
+                ts=t, txid=i, gateway=GATEWAYS[g], region=REGIONS[r],
+                status=OUTCOMES[o][0], error_code=OUTCOMES[o][1], latency=l, amount=a
+            )
+            for t, i, g, r, o, l, a in zip(
+                timestamps, txid.tolist(), gateway.tolist(), region.tolist(),
+                outcome.tolist(), latency.tolist(), amount.tolist()
+            )
+        ]
+        return "".join(lines).encode(), len(lines)
+
+    def _format_ts(self, ts):
+        # Same shape as datetime.now(timezone.utc).isoformat() + "Z",
+        # with the seconds part formatted once per second instead of per row
+        second = int(ts)
+        prefix = self._second_prefix.get(second)
+        if prefix is None:
+            if len(self._second_prefix) > 64:
+                self._second_prefix.clear()
+            prefix = datetime.fromtimestamp(second, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            self._second_prefix[second] = prefix
+        return f"{prefix}.{int((ts - second) * 1e6):06d}+00:00Z"
+
+
+class ColumnarBatchGenerator(BatchGenerator):
+    """Same draws as BatchGenerator, emitted as one columnar block (txlog.py) instead of JSON lines."""
+
+    def serialize(self, ts, txid, gateway, region, outcome, latency, amount):
+        block = {
+            "ts": ts, "latency_ms": latency, "amount": amount, "txid": txid,
+            "categorical": {
+                "region": (REGIONS, region),
+                "gateway": (GATEWAYS, gateway),
+                "status": ([status for status, _ in OUTCOMES], outcome),
+                "error_code": ([code for _, code in OUTCOMES], outcome)
+            }
+        }
+        return block, len(ts)
+
+
+class LogWriter(threading.Thread):
+    """
+    Dedicated writer thread: takes serialized batches off a bounded queue and
+    appends them with large buffered writes. Rotates like RotatingFileHandler
+    (path -> path.1) so LogTailer keeps working.
+    """
+
+    def __init__(self, path, max_bytes, buffer_size=1 << 20, max_pending=8):
+        super().__init__(daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.buffer_size = buffer_size
+        self.pending = queue.Queue(maxsize=max_pending)
+
+    def run(self):
+        f = open(self.path, "ab", buffering=self.buffer_size)
+        size = f.tell()
+        try:
+            while True:
+                chunk = self.pending.get()
+                if chunk is None:
+                    break
+                if self.max_bytes and size and size + len(chunk) > self.max_bytes:
+                    f.close()
+                    os.replace(self.path, f"{self.path}.1")
+                    f = open(self.path, "ab", buffering=self.buffer_size)
+                    size = 0
+                f.write(chunk)
+                size += len(chunk)
+        finally:
+            f.close()
+
+    def write(self, chunk):
+        self.pending.put(chunk)  # Blocks when the disk can't keep up
+
+    def close(self):
+        self.pending.put(None)
+        self.join()
+
+
+def run_load(generator, writer, rate, duration, batch_size=None):
+    """
+    Generates `rate` tx/s for `duration` seconds in batches (default: 1/20 s
+    worth each), pacing against the wall clock. Returns (transactions, elapsed).
+    """
+    batch_size = batch_size or max(1, int(rate / 20))
+    writer.start()
+    started = time.time()
+    deadline = started + duration
+    scheduled = 0
+    written = 0
+
+    try:
+        while time.time() < deadline:
+            chunk, count = generator.generate(batch_size, started + scheduled / rate, rate)
+            writer.write(chunk)
+            scheduled += batch_size
+            written += count
+
+            # Sleep only if we are ahead of schedule
+            ahead = started + scheduled / rate - time.time()
+            if ahead > 0:
+                time.sleep(ahead)
+    finally:
+        writer.close()
+
+    return written, time.time() - started
+
+
+class ColumnarWriterThread(LogWriter):
+    """LogWriter for ColumnarBatchGenerator blocks; txlog.ColumnarLogWriter handles rotation."""
+
+    def run(self):
+        from txlog import ColumnarLogWriter as BlockWriter
+
+        writer = BlockWriter(self.path, self.max_bytes)
+        try:
+            while True:
+                block = self.pending.get()
+                if block is None:
+                    break
+                writer.write_block(**block)
+        finally:
+            writer.close()
@@ -0,0 +1,124 @@
+import os
+from typing import List, Optional
+
+
+class LogTailer:
+    """
+    Incremental reader for an append-only log that is rotated by
+    RotatingFileHandler (transactions.log -> transactions.log.1).
+
+    Remembers the byte offset and inode between calls, so each call only
+    reads the bytes appended since the last one. On the first call it seeks
+    backwards from EOF in blocks to recover the last `backfill_lines` lines
+    instead of reading the whole file.
+    """
+
+    def __init__(self, path: str, backfill_lines: int = 100, block_size: int = 64 * 1024):
+        self.path = path
+        self.backfill_lines = backfill_lines
+        self.block_size = block_size
+        self.bytes_read = 0  # Running total, handy for instrumentation
+
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._partial = b""  # Trailing bytes of a line that is still being written
+
+    def reset(self):
+        """Forget the current position. The next read starts cold again."""
+        self._inode = None
+        self._offset = 0
+        self._partial = b""
+
+    def read_new_lines(self) -> List[str]:
+        """Returns the complete lines appended since the previous call."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+
+        with f:
+            st = os.fstat(f.fileno())
+
+            # 1. Cold start: only grab the tail of the file
+            if self._inode is None:
+                return self._backfill(f, st)
+
+            lines = []
+
+            # 2. Rotation: finish the old file (now .1) before starting on the new one
+            if st.st_ino != self._inode:
+                lines.extend(self._drain_rotated())
+                self._offset = 0
+            # 3. Truncated in place (copytruncate style rotation)
+            elif st.st_size < self._offset:
+                self._offset = 0
+                self._partial = b""
+
+            f.seek(self._offset)
+            data = f.read()
+            self._offset += len(data)
+            self._inode = st.st_ino
+            self.bytes_read += len(data)
+            lines.extend(self._split(data))
+
+        return lines
+
+    def _backfill(self, f, st) -> List[str]:
+        end = st.st_size
+        pos = end
+        buf = b""
+        newlines = 0
+
+        # Walk backwards block by block until we have enough complete lines
+        while pos > 0 and newlines <= self.backfill_lines:
+            step = min(self.block_size, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            newlines += block.count(b"\n")
+            buf = block + buf
+
+        self._inode = st.st_ino
+        self._offset = end
+        self.bytes_read += len(buf)
+
+        lines = buf.split(b"\n")
+        self._partial = lines.pop()
+        if pos > 0:
+            lines = lines[1:]  # The first chunk starts mid-line
+        return self._decode(lines[-self.backfill_lines:])
+
+    def _drain_rotated(self) -> List[str]:
+        rotated = f"{self.path}.1"
+        try:
+            f = open(rotated, "rb")
+        except FileNotFoundError:
+            self._partial = b""
+            return []
+
+        with f:
+            # If the file we were reading is not the .1 file, it has rotated
+            # more than once since the last call and is gone; .1 is all new.
+            if os.fstat(f.fileno()).st_ino == self._inode:
+                f.seek(self._offset)
+            else:
+                self._partial = b""
+            data = f.read()
+
+        self.bytes_read += len(data)
+        lines = self._split(data)
+        if self._partial.strip():
+            lines.append(self._partial.decode("utf-8", "replace"))
+        self._partial = b""
+        return lines
+
+    def _split(self, data: bytes) -> List[str]:
+        if not data:
+            return []
+        chunks = (self._partial + data).split(b"\n")
+        self._partial = chunks.pop()
+        return self._decode(chunks)
+
+    @staticmethod
+    def _decode(chunks) -> List[str]:
+        return [c.decode("utf-8", "replace") for c in chunks if c.strip()]
@@ -1,14 +1,14 @@
 import time
 import random
-import json
 import logging
-import os
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, timezone
+from config_cache import routing_store, ROUTING_CONFIG_FILE
+from transaction import encode_transaction
 
 # --- CONFIGURATION ---
 LOG_FILE = "transactions.log"
-CONFIG_FILE = "routing_config.json"
+CONFIG_FILE = ROUTING_CONFIG_FILE
 MAX_BYTES = 5 * 1024 * 1024  # 5MB limit
 BACKUP_COUNT = 1
 
@@ -18,29 +18,17 @@ logger.setLevel(logging.INFO)
 handler = RotatingFileHandler(LOG_FILE, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT)
 logger.addHandler(handler)
 
-# Initial/Default Routing Configuration
-DEFAULT_CONFIG = {
-    "US": "stripe",
-    "UK": "stripe",
-    "IN": "stripe",
-    "EU": "adyen",
-    "global_default": "stripe"
-}
-
 # --- UNTOUCHED GATEWAY PROFILES ---
 GATEWAY_PROFILES = {
     "stripe": {"avg_latency": 150},
     "adyen": {"avg_latency": 310}
 }
 
+# Shared store (config_cache.py): parsed once and re-read only when the
+# file changes, so agent edits still take effect on the next transaction
 def get_routing_config():
     """Reads the current routing setup. If file doesn't exist, creates it."""
-    if not os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(DEFAULT_CONFIG, f)
-        return DEFAULT_CONFIG
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
+    return routing_store.get()
 
 def generate_transaction(scenario="normal"):
     # Load current configuration to see where traffic is being routed
@@ -101,7 +89,7 @@ def main():
             tx = generate_transaction(scenario=current_mode)
             
             # Log the JSON for the LangGraph Agent
-            logger.info(json.dumps(tx))
+            logger.info(encode_transaction(tx))
 
             # Visual Feedback
             status_color = "\033[92m" if tx["status"] == "SUCCESS" else "\033[91m"
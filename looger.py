@@ -1,14 +1,17 @@
+import argparse
 import time
 import random
-import json
 import logging
-import os
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, timezone
+from config_cache import routing_store, ROUTING_CONFIG_FILE
+import security_policies
+from transaction import encode_transaction
 
 # --- CONFIGURATION ---
 LOG_FILE = "transactions.log"
-CONFIG_FILE = "routing_config.json"
+BINARY_LOG_FILE = "transactions.bin"
+CONFIG_FILE = ROUTING_CONFIG_FILE
 MAX_BYTES = 10 * 1024 * 1024  # Increased to 10MB to handle spam bursts
 BACKUP_COUNT = 1
 
@@ -18,23 +21,20 @@ logger.setLevel(logging.INFO)
 handler = RotatingFileHandler(LOG_FILE, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT)
 logger.addHandler(handler)
 
-DEFAULT_CONFIG = {
-    "US": "stripe", "UK": "stripe", "IN": "stripe", "EU": "adyen", "global_default": "stripe"
-}
-
 GATEWAY_PROFILES = {
     "stripe": {"avg_latency": 150},
     "adyen": {"avg_latency": 310}
 }
 
+# Shared store (config_cache.py): parsed once and re-read only when the
+# file changes, so agent edits still take effect on the next transaction
 def get_routing_config():
     """Reads the current routing setup. If file doesn't exist, creates it."""
-    if not os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(DEFAULT_CONFIG, f)
-        return DEFAULT_CONFIG
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
+    return routing_store.get()
+
+def get_blocked_regions():
+    """Regions under an active BLOCK_IP_RANGE policy (an O(1)-maintained set)."""
+    return security_policies.blocked_regions()
 
 def generate_transaction(scenario="normal"):
 
@@ -43,18 +43,10 @@ def generate_transaction(scenario="normal"):
     gateway = config.get(region, config.get("global_default", "stripe"))
     profile = GATEWAY_PROFILES[gateway]
     
-    if os.path.exists("security_policy.json"):
-        with open("security_policy.json", "r") as f:
-            try:
-                policies = json.load(f)
-                # Ensure we handle both a single dict or a list of dicts
-                if isinstance(policies, dict): policies = [policies]
-                
-                for p in policies:
-                    if scenario == "retry_storm" and (p["region"] == region or p["region"] == "global_default"):
-                        return None
-            except json.JSONDecodeError:
-                pass
+    if scenario == "retry_storm":
+        blocked = get_blocked_regions()
+        if region in blocked or "global_default" in blocked:
+            return None
 
     status = "SUCCESS"
     error_code = "00"
@@ -91,16 +83,53 @@ def generate_transaction(scenario="normal"):
         "amount": round(random.uniform(1.0, 10.0), 2) # Spam usually uses small amounts
     }
 
+SCENARIOS = ["normal", "uk_bank_outage", "adyen_latency_spike", "india_auth_bug", "retry_storm"]
+# Picking scenarios. Weighting RETRY_STORM at 0.1 for a quick burst
+SCENARIO_WEIGHTS = [0.05, 0.95, 0, 0, 0]
+
+def run_load_mode(rate, duration, batch_size=None, log_format="json"):
+    """
+    High-throughput mode (--rate/--duration): vectorized batches, bulk
+    serialization and a dedicated buffered writer thread. Same scenario
+    rules as generate_transaction. --format binary writes the columnar log
+    (see txlog.py) to BINARY_LOG_FILE instead.
+    """
+    from loadgen import BatchGenerator, ColumnarBatchGenerator, ColumnarWriterThread, LogWriter, run_load
+
+    if log_format == "binary":
+        path = BINARY_LOG_FILE
+        generator = ColumnarBatchGenerator(get_routing_config, get_blocked_regions, SCENARIO_WEIGHTS)
+        writer = ColumnarWriterThread(path, MAX_BYTES)
+    else:
+        path = LOG_FILE
+        generator = BatchGenerator(get_routing_config, get_blocked_regions, SCENARIO_WEIGHTS)
+        writer = LogWriter(path, MAX_BYTES)
+
+    print(f"📡 Load mode: {rate:,.0f} tx/s for {duration}s -> {path}")
+    written, elapsed = run_load(generator, writer, rate, duration, batch_size)
+    print(f"Wrote {written:,} transactions in {elapsed:.1f}s ({written / elapsed:,.0f} tx/s)")
+
 def main():
+    parser = argparse.ArgumentParser(description="Payment transaction simulator")
+    parser.add_argument("--rate", type=float, help="Load mode: target transactions per second")
+    parser.add_argument("--duration", type=float, default=60, help="Load mode: seconds to run")
+    parser.add_argument("--batch", type=int, help="Load mode: transactions per batch")
+    parser.add_argument("--format", choices=["json", "binary"], default="json",
+                        help="Load mode: JSON lines or the columnar binary log")
+    args = parser.parse_args()
+
+    if args.rate:
+        run_load_mode(args.rate, args.duration, args.batch, args.format)
+        return
+
     print(f"📡 Simulator started. Scenarios: UK_OUTAGE, ADYEN_LATENCY, INDIA_AUTH, RETRY_STORM")
-    scenarios = ["normal", "uk_bank_outage", "adyen_latency_spike", "india_auth_bug", "retry_storm"]
+    scenarios = SCENARIOS
 
     try:
         while True:
-            # Picking scenarios. Weighting RETRY_STORM at 0.1 for a quick burst
             current_mode = random.choices(
                 scenarios, 
-                weights=[0.05, 0.95, 0, 0, 0],
+                weights=SCENARIO_WEIGHTS,
                 k=1
             )[0]
 
@@ -113,7 +142,7 @@ def main():
                     # Optional: Print a 'Blocked' message so you see the tool working!
                     print("\033[94m[SECURITY] Blocked incoming spam attempt...\033[0m")
                     continue
-                logger.info(json.dumps(tx))
+                logger.info(encode_transaction(tx))
 
                 # Visual Feedback
                 color = "\033[95m" if tx["status"] == "REJECTED" else "\033[92m" # Magenta for Spam
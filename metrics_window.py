@@ -0,0 +1,354 @@
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from latency_sketch import LatencySketch, bin_index
+
+# (is_success, failure_cluster_key, security_alert_key, latency_group, latency_bin)
+Entry = Tuple[bool, Optional[str], Optional[str], Optional[str], Optional[int]]
+
+# The usual set when time windows are switched on (OBSERVER_TIME_WINDOWS=10s,1m,5m)
+DEFAULT_TIME_WINDOWS = {"10s": 10, "1m": 60, "5m": 300}
+BUCKET_SECONDS = 1.0
+_UNITS = {"s": 1, "m": 60, "h": 3600}
+
+
+def parse_time_windows(spec: str) -> Dict[str, float]:
+    """'10s,1m,5m' -> {'10s': 10, '1m': 60, '5m': 300}. Empty = no time windows."""
+    windows = {}
+    for label in filter(None, (part.strip() for part in spec.split(","))):
+        if label[-1] not in _UNITS or not label[:-1].isdigit():
+            raise ValueError(f"time window must look like 10s, 1m or 1h, not {label!r}")
+        windows[label] = int(label[:-1]) * _UNITS[label[-1]]
+    return windows
+
+
+# Counter keys are built once per distinct combination and shared by every
+# entry, so a large window holds references rather than fresh strings
+_key_cache: Dict[tuple, str] = {}
+
+
+def _key(*parts) -> str:
+    key = _key_cache.get(parts)
+    if key is None:
+        key = _key_cache[parts] = "_".join(map(str, parts))
+    return key
+
+
+def classify(tx) -> Entry:
+    """Maps a transaction.Transaction to the counters it contributes to."""
+    return classify_fields(tx.region, tx.gateway, tx.status, tx.error_code, tx.latency_ms)
+
+
+# (region, gateway, status, error_code) -> (entry without latency, entry prefix with the latency group)
+_head_cache: Dict[tuple, Tuple[Entry, tuple]] = {}
+
+
+def _head(region, gateway, status, error_code) -> Tuple[Entry, tuple]:
+    # 1. Track standard FAILED transactions (Outages/Auth issues)
+    if status == 'FAILED':
+        head = (False, _key(region, gateway, error_code), None)
+    # 2. Track REJECTED transactions (Spam/Carding Attacks)
+    elif status == 'REJECTED' or error_code == '429':
+        head = (False, None, _key("SPAM_ATTACK", region))
+    else:
+        head = (status == 'SUCCESS', None, None)
+    return head + (None, None), head + (_key(region, gateway),)
+
+
+_entry_cache: Dict[tuple, Entry] = {}
+
+
+def classify_row(row: tuple) -> Entry:
+    """classify_fields(*row), cached: most rows repeat (integer latencies, a handful of labels)."""
+    entry = _entry_cache.get(row)
+    if entry is None:
+        if len(_entry_cache) >= 65536:
+            _entry_cache.clear()
+        entry = _entry_cache[row] = classify_fields(*row)
+    return entry
+
+
+def classify_fields(region, gateway, status, error_code, latency_ms) -> Entry:
+    """classify() for the fields transaction.decode_fields() returns."""
+    heads = _head_cache.get((region, gateway, status, error_code))
+    if heads is None:
+        heads = _head_cache[(region, gateway, status, error_code)] = _head(region, gateway, status, error_code)
+    if latency_ms is None:
+        return heads[0]
+    # Latency per region_gateway (bin computed once, shared by every window)
+    return heads[1] + (bin_index(latency_ms),)
+
+
+_second_cache: Dict[str, float] = {}
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """
+    Parses the simulator's timestamp into epoch seconds. The simulators
+    append a 'Z' after an explicit offset ("...+00:00Z"), so handle both.
+    """
+    if not isinstance(value, str):
+        return None
+    # Fast path for the simulators' own format ("2024-01-01T12:00:00.123456+00:00Z"):
+    # consecutive transactions share the whole-second prefix, so parse it once
+    if len(value) == 33 and value[19] == "." and value.endswith("+00:00Z"):
+        second = _second_cache.get(value[:19])
+        if second is None:
+            if len(_second_cache) >= 4096:
+                _second_cache.clear()
+            try:
+                second = _second_cache[value[:19]] = datetime.fromisoformat(value[:19] + "+00:00").timestamp()
+            except ValueError:
+                return None
+        return second + int(value[20:26]) / 1e6
+    if value.endswith("Z"):
+        value = value[:-1] if "+" in value[10:] else value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+class WindowCounters:
+    """Running totals for one window (or one time bucket)."""
+    __slots__ = ("total", "successes", "failure_clusters", "security_alerts", "latency")
+
+    def __init__(self):
+        self.total = 0
+        self.successes = 0
+        self.failure_clusters: Dict[str, int] = {}
+        self.security_alerts: Dict[str, int] = {}
+        self.latency: Dict[str, LatencySketch] = {}
+
+    def add(self, entry: Entry, count: int = 1):
+        is_success, failure_key, security_key, latency_group, latency_bin = entry
+        self.total += count
+        if is_success:
+            self.successes += count
+        if failure_key:
+            self.failure_clusters[failure_key] = self.failure_clusters.get(failure_key, 0) + count
+        if security_key:
+            self.security_alerts[security_key] = self.security_alerts.get(security_key, 0) + count
+        if latency_group:
+            sketch = self.latency.get(latency_group)
+            if sketch is None:
+                sketch = self.latency[latency_group] = LatencySketch()
+            sketch.add_bin(latency_bin, count)
+
+    def remove(self, entry: Entry, count: int = 1):
+        is_success, failure_key, security_key, latency_group, latency_bin = entry
+        self.total -= count
+        if is_success:
+            self.successes -= count
+        if failure_key:
+            _decrement(self.failure_clusters, failure_key, count)
+        if security_key:
+            _decrement(self.security_alerts, security_key, count)
+        if latency_group:
+            sketch = self.latency[latency_group]
+            sketch.remove_bin(latency_bin, count)
+            if not sketch.count:
+                del self.latency[latency_group]
+
+    def merge(self, other: "WindowCounters"):
+        self.total += other.total
+        self.successes += other.successes
+        for key, count in other.failure_clusters.items():
+            self.failure_clusters[key] = self.failure_clusters.get(key, 0) + count
+        for key, count in other.security_alerts.items():
+            self.security_alerts[key] = self.security_alerts.get(key, 0) + count
+        for key, other_sketch in other.latency.items():
+            sketch = self.latency.get(key)
+            if sketch is None:
+                sketch = self.latency[key] = LatencySketch()
+            sketch.merge(other_sketch)
+
+    def subtract(self, other: "WindowCounters"):
+        self.total -= other.total
+        self.successes -= other.successes
+        for key, count in other.failure_clusters.items():
+            _decrement(self.failure_clusters, key, count)
+        for key, count in other.security_alerts.items():
+            _decrement(self.security_alerts, key, count)
+        for key, other_sketch in other.latency.items():
+            sketch = self.latency[key]
+            sketch.subtract(other_sketch)
+            if not sketch.count:
+                del self.latency[key]
+
+    def to_metrics(self) -> dict:
+        return {
+            "global_success_rate": self.successes / self.total if self.total else 1.0,
+            "failure_clusters": dict(self.failure_clusters),
+            "security_alerts": dict(self.security_alerts),
+            "latency_percentiles": {key: sketch.percentiles() for key, sketch in sorted(self.latency.items())},
+            "total_count": self.total
+        }
+
+
+def _decrement(counts: Dict[str, int], key: str, amount: int):
+    remaining = counts.get(key, 0) - amount
+    if remaining > 0:
+        counts[key] = remaining
+    else:
+        counts.pop(key, None)
+
+
+class CountWindow:
+    """
+    The last `size` transactions. Each add evicts at most one entry.
+    Entries live in a list with a moving head (compacted now and then), so
+    a batch is evicted with one slice instead of a popleft per entry.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = []
+        self.head = 0  # entries[head:] are in the window
+        self.counters = WindowCounters()
+
+    def __len__(self) -> int:
+        return len(self.entries) - self.head
+
+    def add(self, entry: Entry):
+        self.entries.append(entry)
+        self.counters.add(entry)
+        if len(self) > self.size:
+            self.counters.remove(self.entries[self.head])
+            self.head += 1
+            self._compact()
+
+    def add_fields(self, rows: list):
+        """
+        add() for a batch of transaction.decode_fields() tuples. Each distinct
+        row is classified and counted once (Counter runs in C), and a batch
+        at least as large as the window simply replaces it.
+        """
+        if len(rows) >= self.size:
+            self.entries, self.head = [], 0
+            self.counters = WindowCounters()
+            rows = rows[len(rows) - self.size:] if self.size else []
+        counts = Counter(rows)
+        entry_of = {row: classify_row(row) for row in counts}
+        for row, count in counts.items():
+            self.counters.add(entry_of[row], count)
+        self.entries.extend(map(entry_of.__getitem__, rows))
+
+        overflow = len(self) - self.size
+        if overflow > 0:
+            evicted = Counter(self.entries[self.head:self.head + overflow])
+            for entry, count in evicted.items():
+                self.counters.remove(entry, count)
+            self.head += overflow
+            self._compact()
+
+    def _compact(self):
+        # Drop the evicted prefix once it outweighs the window (amortized O(1) per entry)
+        if self.head > 1024 and self.head > len(self.entries) // 2:
+            del self.entries[:self.head]
+            self.head = 0
+
+
+class TimeWindow:
+    """
+    Transactions from the last `seconds`, as a run of sealed 1-second
+    buckets. Buckets are shared with the other time windows (read-only once
+    sealed); expiring one subtracts its counters in one go, so the cost is
+    amortized O(1) per transaction regardless of the window length.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.buckets = deque()  # (bucket_start, WindowCounters)
+        self.counters = WindowCounters()
+
+    def add_bucket(self, start: float, counters: WindowCounters):
+        self.buckets.append((start, counters))
+        self.counters.merge(counters)
+
+    def expire(self, now: float) -> bool:
+        """Drops buckets older than the window. Returns True if any were dropped."""
+        cutoff = now - self.seconds
+        expired = False
+        while self.buckets and self.buckets[0][0] + BUCKET_SECONDS <= cutoff:
+            self.counters.subtract(self.buckets.popleft()[1])
+            expired = True
+        return expired
+
+
+class SlidingWindowMetrics:
+    """
+    Streaming replacement for rebuilding failure/security maps every cycle.
+    Transactions are folded in once as they arrive; snapshot() only copies
+    the current counters.
+
+    The count-based window provides the headline `metrics` the reasoner has
+    always seen. Time-based windows (e.g. DEFAULT_TIME_WINDOWS) are opt-in
+    and reported alongside under "windows"; without them a transaction only
+    touches the count window.
+
+    With time windows, each transaction also touches the open time bucket.
+    The open bucket is sealed into every time window when the next second
+    starts or when the windows are read, so the per-line cost does not grow
+    with the number of time windows.
+    """
+
+    def __init__(self, count_window: int = 100, time_windows: Optional[Dict[str, float]] = None):
+        self.count_window = CountWindow(count_window)
+        self.time_windows = {
+            label: TimeWindow(seconds)
+            for label, seconds in (time_windows or {}).items()
+        }
+        self._open_start = float("-inf")
+        self._open = None  # WindowCounters of the newest, not yet sealed bucket
+
+    def add(self, tx):
+        """`tx` is a transaction.Transaction (see transaction.decode_line)."""
+        entry = classify(tx)
+        self.count_window.add(entry)
+        if not self.time_windows:
+            return
+
+        ts = tx.ts
+        if ts is None:
+            ts = time.time()
+        start = ts - (ts % BUCKET_SECONDS)
+        # Late (out-of-order) transactions land in the newest bucket
+        if start > self._open_start:
+            self._seal()
+            self._open_start = start
+        if self._open is None:
+            self._open = WindowCounters()
+        self._open.add(entry)
+
+    def add_fields(self, rows: list):
+        """
+        Folds a batch of transaction.decode_fields() tuples into the count
+        window. Only valid without time windows (the tuples carry no timestamp).
+        """
+        self.count_window.add_fields(rows)
+
+    def _seal(self):
+        if self._open is not None:
+            for window in self.time_windows.values():
+                window.add_bucket(self._open_start, self._open)
+            self._open = None
+
+    def expire(self, now: Optional[float] = None) -> bool:
+        """Seals the open bucket and expires the time windows. Returns True if any were expired."""
+        now = time.time() if now is None else now
+        self._seal()
+        expired = False
+        for window in self.time_windows.values():
+            expired |= window.expire(now)
+        return expired
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        """`now` defaults to wall-clock time; replays pass their own clock."""
+        self.expire(now)
+        metrics = self.count_window.counters.to_metrics()
+        if self.time_windows:
+            metrics["windows"] = {label: window.counters.to_metrics() for label, window in self.time_windows.items()}
+        return metrics
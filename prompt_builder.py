@@ -0,0 +1,131 @@
+"""
+Compact, token-budgeted prompt sections for the reasoner and decider.
+
+Large incidents produce many distinct clusters, latency groups and policies;
+dumping them all (json.dumps(..., indent=2)) makes the prompt, and so the
+LLM call, slowest exactly when speed matters most. Instead each section is
+ranked, cut to the top K plus an "other" bucket and encoded as terse
+`key=value` lists. build_within_budget() then shrinks K (and, as a last
+resort, clips sections) until the whole prompt fits the token budget.
+"""
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import rules
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+PROMPT_TOP_K = int(os.getenv("PROMPT_TOP_K", "8"))
+REASONER_TOKEN_BUDGET = int(os.getenv("REASONER_TOKEN_BUDGET", "900"))
+DECIDER_TOKEN_BUDGET = int(os.getenv("DECIDER_TOKEN_BUDGET", "700"))
+ASSESSOR_TOKEN_BUDGET = int(os.getenv("ASSESSOR_TOKEN_BUDGET", "1200"))  # Single-call mode (reasoner + decider)
+
+# Customer-side declines are background noise; rank them below real outages
+NOISE_WEIGHT = 0.25
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """tiktoken's cl100k count when available, else the usual ~4 chars/token estimate."""
+    global _encoding, tiktoken
+    if tiktoken is not None and _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            tiktoken = None  # Encoding files unavailable (e.g. offline): estimate instead
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def top_k(counts: Dict[str, float], k: int, score: Optional[Callable[[str, float], float]] = None) -> Tuple[List[Tuple[str, float]], int, float]:
+    """The k highest-scoring items, plus how many items and how much count were left over."""
+    score = score or (lambda key, value: value)
+    ranked = sorted(counts.items(), key=lambda item: (-score(*item), item[0]))
+    rest = ranked[k:]
+    return ranked[:k], len(rest), sum(value for _, value in rest)
+
+
+def terse_counts(counts: Dict[str, float], k: int, score=None) -> str:
+    """{'UK_stripe_91': 45, ...} -> 'UK_stripe_91=45, US_stripe_05=3, other(4)=7'"""
+    if not counts:
+        return "none"
+    kept, other_items, other_total = top_k(counts, k, score)
+    parts = [f"{key}={value:g}" for key, value in kept]
+    if other_items:
+        parts.append(f"other({other_items})={other_total:g}")
+    return ", ".join(parts)
+
+
+def cluster_severity(error_classes: Dict[str, str]) -> Callable[[str, float], float]:
+    """Ranks failure clusters by count, discounting customer-side declines."""
+    def score(key: str, count: float) -> float:
+        error_class = error_classes.get(key.rsplit("_", 1)[-1], "unknown")
+        return count * (NOISE_WEIGHT if error_class in rules.NOISE_CLASSES else 1.0)
+    return score
+
+
+def terse_latency(percentiles: Dict[str, dict], k: int) -> str:
+    """Slowest k region_gateway groups (by p99): 'EU_adyen p50/p95/p99=320/7800/8900 n=40'."""
+    if not percentiles:
+        return "none"
+    ranked = sorted(percentiles.items(), key=lambda item: (-item[1].get("p99", 0), item[0]))
+    lines = [
+        f"{key} p50/p95/p99={p['p50']:.0f}/{p['p95']:.0f}/{p['p99']:.0f} n={p['count']}"
+        for key, p in ranked[:k]
+    ]
+    if len(ranked) > k:
+        lines.append(f"other({len(ranked) - k} groups) n={sum(p['count'] for _, p in ranked[k:])}")
+    return "; ".join(lines)
+
+
+def terse_policies(policies: Iterable[dict]) -> str:
+    """Active policies collapsed per action: 'BLOCK_IP_RANGE: IN, US'."""
+    by_action: Dict[str, set] = {}
+    for policy in policies:
+        by_action.setdefault(str(policy.get("action")), set()).add(str(policy.get("region")))
+    if not by_action:
+        return "none"
+    return "; ".join(f"{action}: {', '.join(sorted(regions))}" for action, regions in sorted(by_action.items()))
+
+
+def terse_history(history: List[str], last: int = 5, width: int = 160) -> str:
+    """The last few actions (plus the rollup entry, if any), one per line and clipped."""
+    entries = history[-last:]
+    if len(history) > last and history[0].startswith("ROLLUP:"):
+        entries = [history[0]] + entries
+    if not entries:
+        return "none"
+    return " / ".join(clip(entry, width) for entry in entries)
+
+
+def clip(text: str, limit: Optional[int]) -> str:
+    if limit is None or len(text) <= limit:
+        return text
+    return text[:max(0, limit - 3)] + "..."
+
+
+def build_within_budget(render: Callable[[int, Optional[int]], str], budget: int,
+                        k: int = PROMPT_TOP_K) -> Tuple[str, int]:
+    """
+    render(k, section_chars) builds the prompt with at most k items per
+    section and each section clipped to section_chars (None = unclipped).
+    K is halved first, then sections are clipped, until the estimate fits
+    `budget`. Returns (prompt, estimated tokens).
+    """
+    section_chars = None
+    while True:
+        prompt = render(k, section_chars)
+        tokens = estimate_tokens(prompt)
+        if tokens <= budget:
+            return prompt, tokens
+        if k > 1:
+            k //= 2
+        elif section_chars is None or section_chars > 40:
+            section_chars = 400 if section_chars is None else section_chars // 2
+        else:
+            return prompt, tokens  # The fixed instructions alone exceed the budget
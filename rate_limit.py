@@ -0,0 +1,83 @@
+import asyncio
+import os
+import random
+import time
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for a provider 429 (openai.RateLimitError or anything carrying status 429)."""
+    if type(error).__name__ == "RateLimitError":
+        return True
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429
+
+
+class LLMLimiter:
+    """
+    Gate for async LLM calls shared by every thread in the process:
+    - a semaphore caps concurrent in-flight calls,
+    - a token bucket caps the request rate (Groq enforces per-minute limits),
+    - 429s are retried with full-jitter exponential backoff.
+
+    asyncio primitives belong to one event loop, so they are (re)created
+    lazily for whichever loop is running.
+    """
+
+    def __init__(self, max_concurrency: int = 4, requests_per_minute: float = 30, burst: int = 5,
+                 max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.rate = requests_per_minute / 60.0
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0  # 429s seen, for logs/metrics
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._loop = None
+        self._semaphore = None
+        self._bucket_lock = None
+
+    @classmethod
+    def from_env(cls) -> "LLMLimiter":
+        return cls(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+            requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30")),
+            burst=int(os.getenv("LLM_BURST", "5"))
+        )
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket_lock = asyncio.Lock()
+
+    async def _take_token(self):
+        async with self._bucket_lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, make_call):
+        """`make_call` returns a fresh awaitable per attempt, e.g. lambda: llm.ainvoke(prompt)."""
+        self._bind_loop()
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._take_token()
+                try:
+                    return await make_call()
+                except Exception as e:
+                    if not is_rate_limited(e) or attempt == self.max_retries:
+                        raise
+                    self.throttled += 1
+                    await asyncio.sleep(self.backoff(attempt))
@@ -0,0 +1,67 @@
+from collections import Counter
+from typing import Callable, List, Optional
+
+ROLLUP_PREFIX = "ROLLUP:"
+
+
+def bounded_add(cap: int) -> Callable[[Optional[List], Optional[List]], List]:
+    """
+    Drop-in replacement for operator.add on list channels, with ring-buffer
+    semantics: only the newest `cap` entries are kept.
+    """
+    def reducer(left, right):
+        merged = (left or []) + (right or [])
+        return merged[-cap:] if len(merged) > cap else merged
+    return reducer
+
+
+def bounded_history(cap: int, rollup: bool = True) -> Callable[[Optional[List], Optional[List]], List]:
+    """
+    Bounded reducer for action_history. With `rollup`, evicted actions are
+    folded into a single summary entry at the head of the list instead of
+    being forgotten, e.g.
+        "ROLLUP: 12 earlier actions | fraud_mitigation_tool=4, update_routing_tool=8"
+    """
+    if not rollup:
+        return bounded_add(cap)
+
+    def reducer(left, right):
+        merged = (left or []) + (right or [])
+        if len(merged) <= cap:
+            return merged
+
+        counts = Counter()
+        entries = []
+        for entry in merged:
+            if entry.startswith(ROLLUP_PREFIX):
+                counts.update(parse_rollup(entry))
+            else:
+                entries.append(entry)
+
+        keep = max(cap - 1, 0)  # One slot goes to the summary
+        evicted, kept = entries[:len(entries) - keep], entries[len(entries) - keep:]
+        counts.update(action_name(entry) for entry in evicted)
+        return [format_rollup(counts)] + kept
+
+    return reducer
+
+
+def action_name(entry: str) -> str:
+    """'ACTION: update_routing_tool | ARGS: ...' -> 'update_routing_tool'"""
+    head = entry.split("|", 1)[0]
+    return head.replace("ACTION:", "").strip() or "unknown"
+
+
+def format_rollup(counts: Counter) -> str:
+    breakdown = ", ".join(f"{name}={count}" for name, count in sorted(counts.items()))
+    return f"{ROLLUP_PREFIX} {sum(counts.values())} earlier actions | {breakdown}"
+
+
+def parse_rollup(entry: str) -> Counter:
+    counts = Counter()
+    _, _, breakdown = entry.partition("|")
+    for item in breakdown.split(","):
+        name, _, count = item.strip().partition("=")
+        if name and count.isdigit():
+            counts[name] += int(count)
+    return counts
@@ -0,0 +1,307 @@
+"""
+Replay a captured transactions.log through the full agent graph.
+
+    python replay.py captures/incident.log --speed 20 --cycle 5 --report replay_report.json
+
+Transactions are released to the observer according to their embedded
+`timestamp`, at `--speed`x wall-clock (0 = as fast as possible). The graph
+runs every `--cycle` seconds of capture time. For every incident found in
+the capture, the report gives time-to-detection (first cycle whose
+hypothesis names the incident's region/gateway), time-to-proposal and
+time-to-action (a tool aimed at that incident was proposed / executed), all
+in capture seconds since the incident's first transaction.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from metrics_window import parse_timestamp
+from rules import NOISE_CLASSES
+from transaction import decode_object
+
+# Replays don't need (or want) to touch the persistent checkpoint store
+os.environ.setdefault("AGENT_CHECKPOINT_DB", "memory")
+
+RULES_FILE = "rules.json"
+LATENCY_INCIDENT_MS = 1000
+
+
+def capture_files(path):
+    """RotatingFileHandler keeps the older segment in .1, so it goes first."""
+    rotated = f"{path}.1"
+    return [p for p in (rotated, path) if os.path.exists(p)]
+
+
+def iter_capture(paths):
+    """Streams (timestamp, raw_line, tx) tuples; never holds more than one line."""
+    for path in paths:
+        with open(path, "r", errors="replace") as f:
+            for line in f:
+                tx = decode_object(line)
+                if tx is None:
+                    continue
+                ts = parse_timestamp(tx.get("timestamp"))
+                if ts is not None:
+                    yield ts, line, tx
+
+
+class ReplayClock:
+    """Capture-time clock. speed > 0 follows the wall clock, speed == 0 is stepped."""
+
+    def __init__(self, start, speed):
+        self.start = start
+        self.speed = speed
+        self._wall_start = time.monotonic()
+        self._stepped = start
+
+    def now(self):
+        if self.speed > 0:
+            return self.start + (time.monotonic() - self._wall_start) * self.speed
+        return self._stepped
+
+    def wait_until(self, ts):
+        if self.speed > 0:
+            delay = (ts - self.now()) / self.speed
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            self._stepped = max(self._stepped, ts)
+
+
+class IncidentTracker:
+    """
+    Ground truth from the capture itself. An incident is a run of anomalous
+    transactions sharing a key (failure cluster, SPAM_ATTACK_<region> or
+    LATENCY_<region>_<gateway>) with no gap longer than `gap` seconds.
+    Runs shorter than `min_events` are ignored as blips.
+    """
+
+    def __init__(self, error_code_classes, gap=30.0, min_events=5):
+        self.error_code_classes = error_code_classes
+        self.gap = gap
+        self.min_events = min_events
+        self.open = {}
+        self.closed = []
+
+    def incident_key(self, tx):
+        region, gateway = tx.get("region", "UNK"), tx.get("gateway", "UNK")
+        error_code = str(tx.get("error_code", "00"))
+        if tx.get("status") == "REJECTED" or error_code == "429":
+            return f"SPAM_ATTACK_{region}"
+        if tx.get("status") == "FAILED" and self.error_code_classes.get(error_code, "unknown") not in NOISE_CLASSES:
+            return f"{region}_{gateway}_{error_code}"
+        latency = tx.get("latency_ms")
+        if isinstance(latency, (int, float)) and latency >= LATENCY_INCIDENT_MS:
+            return f"LATENCY_{region}_{gateway}"
+        return None
+
+    def observe(self, ts, tx):
+        key = self.incident_key(tx)
+        if key is None:
+            return
+        incident = self.open.get(key)
+        if incident is None or ts - incident["last_ts"] > self.gap:
+            if incident is not None:
+                self.closed.append(incident)
+            incident = self.open[key] = {
+                "key": key, "start_ts": ts, "last_ts": ts, "events": 0,
+                "detected_ts": None, "proposed_ts": None, "acted_ts": None, "action": None
+            }
+        incident["last_ts"] = ts
+        incident["events"] += 1
+
+    def active(self, now):
+        return [i for i in self.open.values()
+                if i["events"] >= self.min_events and now - i["last_ts"] <= self.gap]
+
+    @staticmethod
+    def split_key(key):
+        """SPAM_ATTACK_US -> ("spam", "US", None), LATENCY_EU_adyen / UK_stripe_91 -> (kind, region, gateway)."""
+        parts = key.split("_")
+        if key.startswith("SPAM_ATTACK_"):
+            return "spam", parts[2], None
+        if key.startswith("LATENCY_"):
+            return "latency", parts[1], parts[2]
+        return "failure", parts[0], parts[1]
+
+    def matches(self, key, hypothesis="", tool=None, args=None):
+        """
+        True if the agent's output is about this incident. A proposal must
+        target its region (and, for reroutes, move traffic off its gateway);
+        a diagnosis must name its region (and gateway, if it has one).
+        """
+        kind, region, gateway = self.split_key(key)
+        if tool is not None:
+            args = args or {}
+            if tool == "fraud_mitigation_tool":
+                return kind == "spam" and args.get("target_region") == region
+            if tool == "update_routing_tool":
+                return (kind != "spam" and args.get("region") in (region, "global_default")
+                        and args.get("gateway") != gateway)
+            return False
+        if not re.search(rf"\b{re.escape(region)}\b", hypothesis or ""):
+            return False
+        return gateway is None or gateway.lower() in hypothesis.lower()
+
+    def mark(self, now, field, hypothesis="", action=None, args=None):
+        """Stamps `field` on the active incidents the hypothesis (or proposed action) is about."""
+        for incident in self.active(now):
+            if incident[field] is None and self.matches(incident["key"], hypothesis, action, args):
+                incident[field] = now
+                if action:
+                    incident["action"] = action
+
+    def report(self):
+        incidents = sorted(self.closed + list(self.open.values()), key=lambda i: i["start_ts"])
+        rows = []
+        for i in incidents:
+            if i["events"] < self.min_events:
+                continue
+            since = lambda ts: None if ts is None else round(ts - i["start_ts"], 3)
+            rows.append({
+                "key": i["key"],
+                "start": i["start_ts"],
+                "duration_s": round(i["last_ts"] - i["start_ts"], 3),
+                "events": i["events"],
+                "time_to_detection_s": since(i["detected_ts"]),
+                "time_to_proposal_s": since(i["proposed_ts"]),
+                "time_to_action_s": since(i["acted_ts"]),
+                "action": i["action"]
+            })
+        return rows
+
+
+class ReplaySource:
+    """Stands in for LogTailer: returns the lines whose timestamp has been reached."""
+
+    def __init__(self, lines, clock, tracker):
+        self._lines = lines
+        self._pending = next(self._lines, None)
+        self.clock = clock
+        self.tracker = tracker
+        self.released = 0
+
+    @property
+    def exhausted(self):
+        return self._pending is None
+
+    def read_new_lines(self):
+        now = self.clock.now()
+        out = []
+        while self._pending is not None and self._pending[0] <= now:
+            ts, line, tx = self._pending
+            self.tracker.observe(ts, tx)
+            out.append(line)
+            self._pending = next(self._lines, None)
+        self.released += len(out)
+        return out
+
+
+def run_cycle(app, config, auto_approve):
+    """One observer -> ... cycle. Returns (anomaly, hypothesis, proposed_tool, tool_args, executed)."""
+    executed = False
+    for event in app.stream({"reasoning_log": []}, config=config):
+        executed |= "executor" in event
+
+    snapshot = app.get_state(config)
+    values = snapshot.values
+    proposed = values.get("next_action") if values.get("next_action") not in (None, "MONITOR", "ALERT_HUMAN") else None
+    args = json.loads(values.get("decision_args") or "{}") if proposed else None
+
+    if snapshot.next and "sentry" in snapshot.next:
+        if auto_approve:
+            for event in app.stream(None, config=config):
+                executed |= "executor" in event
+        else:
+            app.update_state(config, {"next_action": "MONITOR"})
+
+    return values.get("is_anomaly_detected", False), values.get("current_hypothesis", ""), proposed, args, executed
+
+
+def replay(log_path, speed=10.0, cycle_seconds=5.0, auto_approve=True, gap=30.0, min_events=5):
+    # Import the agent from the real working dir (it loads rules.json on import) ...
+    import agent
+
+    with open(RULES_FILE, "r") as f:
+        error_code_classes = json.load(f).get("error_code_classes", {})
+
+    lines = iter_capture(capture_files(log_path))
+    first = next(lines, None)
+    if first is None:
+        raise SystemExit(f"No timestamped transactions in {log_path}")
+
+    tracker = IncidentTracker(error_code_classes, gap=gap, min_events=min_events)
+    clock = ReplayClock(first[0], speed)
+    source = ReplaySource(_chain(first, lines), clock, tracker)
+    agent.attach_log_source(source, clock=clock.now)
+    config = {"configurable": {"thread_id": f"replay_{int(time.time())}"}}
+
+    # ... but run it in a scratch dir so executed actions don't change live routing
+    workdir = tempfile.mkdtemp(prefix="replay_")
+    shutil.copy(agent.ROUTING_CONFIG_FILE, workdir)
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+
+    cycles = 0
+    try:
+        next_cycle = first[0] + cycle_seconds
+        while not source.exhausted:
+            clock.wait_until(next_cycle)
+            anomaly, hypothesis, proposed, args, executed = run_cycle(agent.app, config, auto_approve)
+            now = clock.now()
+            cycles += 1
+            if anomaly:
+                tracker.mark(now, "detected_ts", hypothesis=hypothesis)
+            if proposed:
+                tracker.mark(now, "proposed_ts", action=proposed, args=args)
+            if executed:
+                tracker.mark(now, "acted_ts", action=proposed, args=args)
+            next_cycle = max(next_cycle + cycle_seconds, now)
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "capture": log_path,
+        "speed": speed,
+        "cycle_seconds": cycle_seconds,
+        "cycles": cycles,
+        "transactions": source.released,
+        "incidents": tracker.report()
+    }
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured transactions.log through the agent")
+    parser.add_argument("log", nargs="?", default="transactions.log")
+    parser.add_argument("--speed", type=float, default=10.0, help="Multiple of real time (0 = as fast as possible)")
+    parser.add_argument("--cycle", type=float, default=5.0, help="Capture seconds between agent cycles")
+    parser.add_argument("--no-approve", action="store_true", help="Reject sentry proposals instead of approving")
+    parser.add_argument("--gap", type=float, default=30.0, help="Quiet seconds that close an incident")
+    parser.add_argument("--min-events", type=int, default=5, help="Smallest run counted as an incident")
+    parser.add_argument("--report", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    result = replay(args.log, args.speed, args.cycle, not args.no_approve, args.gap, args.min_events)
+
+    print(f"Replayed {result['transactions']:,} transactions in {result['cycles']} cycles")
+    for i in result["incidents"]:
+        print(f"  {i['key']:<28} events={i['events']:<6} detect={i['time_to_detection_s']}s "
+              f"propose={i['time_to_proposal_s']}s act={i['time_to_action_s']}s ({i['action']})")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import json
+import re
+from typing import List, Optional
+
+import utils
+
+RULES_FILE = "rules.json"
+
+# Customer-side declines (ISO 8583 05/51) and approvals: background noise the
+# simulators always emit, not incidents. Classes as in rules.json's error_code_classes.
+NOISE_CLASSES = frozenset({"approved", "do_not_honor", "insufficient_funds"})
+
+
+class RuleMatch:
+    """A fired rule: the diagnosis plus the tool call it proposes."""
+    __slots__ = ("rule", "hypothesis", "tool", "args")
+
+    def __init__(self, rule: str, hypothesis: str, tool: str, args: dict):
+        self.rule = rule
+        self.hypothesis = hypothesis
+        self.tool = tool
+        self.args = args
+
+
+class RuleEngine:
+    """
+    Deterministic fast path for clear-cut failure signatures. Rules are
+    declarative (see rules.json): a regex over a metrics key, count/share
+    thresholds, optional error-code classes (ISO 8583 / HTTP), a hypothesis
+    template and a tool call template.
+
+    evaluate() only returns a match when exactly one distinct action is
+    proposed. Anything ambiguous is left to the LLM reasoner.
+    """
+
+    def __init__(self, config: dict):
+        self.gateways = config.get("gateways", ["stripe", "adyen"])
+        self.error_code_classes = config.get("error_code_classes", {})
+        self.rules = []
+        for rule in config.get("rules", []):
+            self.rules.append({**rule, "regex": re.compile(rule["pattern"])})
+
+    @classmethod
+    def from_file(cls, path: str = RULES_FILE) -> "RuleEngine":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def evaluate(self, metrics: dict) -> Optional[RuleMatch]:
+        total = metrics.get("total_count", 0)
+        if not total:
+            return None
+
+        matches: List[RuleMatch] = []
+        for rule in self.rules:
+            for key, count in metrics.get(rule["source"], {}).items():
+                match = self._match(rule, key, count, total)
+                if match and not self._already_applied(match):
+                    matches.append(match)
+
+        distinct_actions = {(m.tool, json.dumps(m.args, sort_keys=True)) for m in matches}
+        if len(distinct_actions) != 1:
+            return None
+        # The same action can be backed by several clusters; report the first
+        return matches[0]
+
+    def _match(self, rule: dict, key: str, count: int, total: int) -> Optional[RuleMatch]:
+        found = rule["regex"].match(key)
+        if not found:
+            return None
+        if count < rule.get("min_count", 0) or count / total < rule.get("min_share", 0.0):
+            return None
+
+        fields = {"count": count, "share": count / total, **found.groupdict()}
+        if "error_code" in fields:
+            fields["error_class"] = self.error_code_classes.get(fields["error_code"], "unknown")
+            if "error_classes" in rule and fields["error_class"] not in rule["error_classes"]:
+                return None
+        if "gateway" in fields:
+            alternates = [g for g in self.gateways if g != fields["gateway"]]
+            if not alternates:
+                return None
+            fields["alternate_gateway"] = alternates[0]
+
+        action = rule["action"]
+        args = {name: str(value).format(**fields) for name, value in action["args"].items()}
+        return RuleMatch(rule["name"], rule["hypothesis"].format(**fields), action["tool"], args)
+
+    @staticmethod
+    def _already_applied(match: RuleMatch) -> bool:
+        """Skip actions that are already in effect (mirrors the decider's prompt rules)."""
+        if match.tool == "fraud_mitigation_tool":
+            return utils.is_region_blocked(match.args.get("target_region"))
+        if match.tool == "update_routing_tool":
+            return utils.get_routed_gateway(match.args.get("region")) == match.args.get("gateway")
+        return False
@@ -0,0 +1,120 @@
+"""
+Drives many agent threads (one per merchant / region cluster) from one process.
+
+    python scheduler.py merchant_a:5 merchant_b:10 eu_cluster:30
+
+Each thread_id runs a cycle every `interval` seconds (with a little jitter so
+threads registered together don't stampede). The log is parsed once per
+tick into agent.observer_service's shared snapshot, which every due thread
+then reads. LLM calls are capped and paced by agent.llm_limiter.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable, Dict, Optional
+
+import agent
+
+
+class ThreadSchedule:
+    __slots__ = ("thread_id", "interval", "next_run", "running", "cycles", "errors")
+
+    def __init__(self, thread_id: str, interval: float, first_run: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.next_run = first_run
+        self.running = False
+        self.cycles = 0
+        self.errors = 0
+
+
+class AgentScheduler:
+    def __init__(self, app=None, tick: float = 0.25, jitter: float = 0.1, auto_approve: bool = False,
+                 on_log: Optional[Callable[[str, str], None]] = None):
+        self.app = app or agent.app
+        self.tick = tick
+        self.jitter = jitter
+        self.auto_approve = auto_approve
+        self.on_log = on_log or (lambda thread_id, entry: print(f"[{thread_id}] {entry}"))
+        self.threads: Dict[str, ThreadSchedule] = {}
+        self._tasks = set()
+        self._stopped = False
+
+    def add_thread(self, thread_id: str, interval: float = 5.0):
+        # Spread first runs over one interval so a bulk registration doesn't burst
+        first_run = time.monotonic() + random.uniform(0, interval)
+        self.threads[thread_id] = ThreadSchedule(thread_id, interval, first_run)
+
+    def remove_thread(self, thread_id: str):
+        self.threads.pop(thread_id, None)
+
+    def stop(self):
+        self._stopped = True
+
+    async def run(self):
+        while not self._stopped:
+            now = time.monotonic()
+            due = [s for s in self.threads.values() if s.next_run <= now and not s.running]
+            if due:
+                # One observer pass for everyone due on this tick
+                await asyncio.to_thread(agent.observer_service.refresh)
+                for schedule in due:
+                    schedule.running = True
+                    schedule.next_run = now + schedule.interval * (1 + random.uniform(-self.jitter, self.jitter))
+                    task = asyncio.create_task(self._run_cycle(schedule))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            await asyncio.sleep(self.tick)
+
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run_cycle(self, schedule: ThreadSchedule):
+        config = {"configurable": {"thread_id": schedule.thread_id}}
+        try:
+            snapshot = await self.app.aget_state(config)
+            if snapshot.next and "sentry" in snapshot.next:
+                if not self.auto_approve:
+                    return  # Still waiting for a human via /approve_action
+                await self._stream(schedule, None, config)
+                return
+
+            await self._stream(schedule, {"reasoning_log": []}, config)
+            schedule.cycles += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            schedule.errors += 1
+            self.on_log(schedule.thread_id, f"Cycle failed: {e}")
+        finally:
+            schedule.running = False
+
+    async def _stream(self, schedule: ThreadSchedule, stream_input, config):
+        async for event in self.app.astream(stream_input, config=config):
+            for node, update in event.items():
+                if update and "reasoning_log" in update:
+                    self.on_log(schedule.thread_id, f"[{node.upper()}] {update['reasoning_log'][-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many agent threads on intervals")
+    parser.add_argument("threads", nargs="+", help="thread_id[:interval_seconds]")
+    parser.add_argument("--auto-approve", action="store_true", help="Approve sentry proposals automatically")
+    args = parser.parse_args()
+
+    scheduler = AgentScheduler(auto_approve=args.auto_approve)
+    for spec in args.threads:
+        thread_id, _, interval = spec.partition(":")
+        scheduler.add_thread(thread_id, float(interval or 5))
+
+    print(f"🤖 Scheduling {len(scheduler.threads)} agent threads. Ctrl+C to stop.")
+    try:
+        asyncio.run(scheduler.run())
+    except KeyboardInterrupt:
+        print("\nScheduler stopped.")
+
+
+if __name__ == "__main__":
+    main()
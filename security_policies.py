@@ -0,0 +1,135 @@
+"""
+Indexed, expiring view of security_policy.json.
+
+The file stays a JSON list of policy dicts (so the simulators and older
+tooling can still read it), but every policy now carries an `expires_at`
+(epoch seconds) and identical active rules are merged instead of appended.
+Reads go through a PolicyIndex that is rebuilt only when the store's
+generation changes, so "is this region blocked?" is a dict lookup and the
+prompt digest is formatted once per change.
+"""
+import os
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config_cache import policy_store
+import prompt_builder
+
+POLICY_TTL = float(os.getenv("SECURITY_POLICY_TTL", "3600"))
+BLOCK_ACTION = "BLOCK_IP_RANGE"
+
+
+def policy_list(policies) -> List[dict]:
+    """The file's policies (handles a single dict, a list, or junk)."""
+    if isinstance(policies, dict): policies = [policies]
+    if not isinstance(policies, list): return []
+    return [p for p in policies if isinstance(p, dict)]
+
+
+def expires_at(policy: dict, ttl: float = POLICY_TTL) -> float:
+    """Policies written before expiry existed run for `ttl` from their timestamp."""
+    value = policy.get("expires_at")
+    if isinstance(value, (int, float)):
+        return float(value)
+    if policy.get("active") is False:
+        return float("-inf")
+    try:
+        return datetime.fromisoformat(policy.get("timestamp")).timestamp() + ttl
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+class PolicyIndex:
+    """Active policies keyed by (region, action), built once per store generation."""
+
+    def __init__(self, policies):
+        self.by_key: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+        for policy in policy_list(policies):
+            key = (policy.get("region"), policy.get("action"))
+            expiry = expires_at(policy)
+            if key not in self.by_key or expiry > self.by_key[key][0]:
+                self.by_key[key] = (expiry, policy)
+        # region -> latest BLOCK_IP_RANGE expiry, for O(1) is_blocked()
+        self.blocks = {region: expiry for (region, action), (expiry, _) in self.by_key.items() if action == BLOCK_ACTION}
+        self._texts: Dict[str, Tuple[str, float]] = {}
+        self._blocked: frozenset = frozenset()
+        self._blocked_until = float("-inf")
+
+    def active(self, now: float) -> List[dict]:
+        return [policy for expiry, policy in self.by_key.values() if expiry > now]
+
+    def next_expiry(self, now: float) -> float:
+        return min((expiry for expiry, _ in self.by_key.values() if expiry > now), default=float("inf"))
+
+    def is_blocked(self, region: str, now: float) -> bool:
+        return self.blocks.get(region, float("-inf")) > now or self.blocks.get("global_default", float("-inf")) > now
+
+    def blocked_regions(self, now: float) -> frozenset:
+        # Cached until the next policy expires
+        if now >= self._blocked_until:
+            self._blocked = frozenset(region for region, expiry in self.blocks.items() if expiry > now)
+            self._blocked_until = self.next_expiry(now)
+        return self._blocked
+
+    def _cached(self, name: str, now: float, build: Callable[[List[dict]], str]) -> str:
+        # Text views change only when the file does (new index) or a policy expires
+        text, until = self._texts.get(name, (None, float("-inf")))
+        if now >= until:
+            text = build(self.active(now))
+            self._texts[name] = (text, self.next_expiry(now))
+        return text
+
+    def digest(self, now: float) -> str:
+        """Active policies collapsed per action, e.g. 'BLOCK_IP_RANGE: IN, US' (for prompts)."""
+        return self._cached("digest", now, prompt_builder.terse_policies)
+
+
+def index() -> PolicyIndex:
+    return policy_store.derive(PolicyIndex)
+
+
+def is_region_blocked(region: str, now: Optional[float] = None) -> bool:
+    return index().is_blocked(region, time.time() if now is None else now)
+
+
+def blocked_regions(now: Optional[float] = None) -> frozenset:
+    return index().blocked_regions(time.time() if now is None else now)
+
+
+def digest(now: Optional[float] = None) -> str:
+    return index().digest(time.time() if now is None else now)
+
+
+def add_policy(action: str, region: str, ttl: float = POLICY_TTL) -> Tuple[dict, bool, int]:
+    """
+    Adds (or, if an identical rule is already active, extends) a policy and
+    drops expired ones, in one locked write. Returns (policy, created, active_count).
+    """
+    now = time.time()
+    result = {}
+
+    def apply(policies):
+        active = [p for p in policy_list(policies) if expires_at(p) > now]
+        existing = next((p for p in active if p.get("action") == action and p.get("region") == region), None)
+        if existing is not None:
+            expiry = expires_at(existing)
+            existing["expires_at"] = expiry if now + ttl < expiry < float("inf") else now + ttl
+            result.update(policy=existing, created=False)
+        else:
+            policy = {
+                "id": f"rule_{random.getrandbits(16)}",
+                "action": action,
+                "region": region,
+                "active": True,
+                "timestamp": datetime.now().isoformat(),
+                "expires_at": now + ttl
+            }
+            active.append(policy)
+            result.update(policy=policy, created=True)
+        result["count"] = len(active)
+        return active
+
+    policy_store.update(apply)
+    return result["policy"], result["created"], result["count"]
@@ -1,12 +1,16 @@
+import asyncio
+import json
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
 # Import your LangGraph app
 # Make sure agent_graph.py is in the same directory
 from agent import app 
+from instrumentation import registry
 
 # --- SETUP ---
 api = FastAPI(title="Payment Agent Backend")
@@ -33,23 +37,49 @@ class ApprovalRequest(BaseModel):
 def get_config(thread_id: str):
     return {"configurable": {"thread_id": thread_id}}
 
-def parse_logs(event_stream) -> List[str]:
-    """Helper to extract clean strings from LangGraph events"""
+def format_event(event) -> List[str]:
+    """Extracts clean strings from one LangGraph event"""
     logs = []
-    for event in event_stream:
-        for node, update in event.items():
-            if "reasoning_log" in update:
-                # Format: "[NODE_NAME] The log message"
-                entry = f"[{node.upper()}] {update['reasoning_log'][-1]}"
-                logs.append(entry)
+    for node, update in event.items():
+        if update and "reasoning_log" in update:
+            # Format: "[NODE_NAME] The log message"
+            logs.append(f"[{node.upper()}] {update['reasoning_log'][-1]}")
     return logs
 
+async def parse_logs(event_stream) -> List[str]:
+    """Helper to extract clean strings from an async LangGraph event stream"""
+    logs = []
+    async for event in event_stream:
+        logs.extend(format_event(event))
+    return logs
+
+def sse(event: str, data) -> str:
+    """Formats one Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Small on purpose: if the client reads slowly the queue fills up and the
+# graph run waits on put(), instead of buffering the whole trace in memory.
+STREAM_QUEUE_SIZE = 16
+HEARTBEAT_SECONDS = 5.0
+
 # --- ENDPOINTS ---
 
 @api.get("/")
 def health_check():
     return {"status": "Agent is online"}
 
+@api.get("/metrics")
+def metrics(request: Request):
+    """
+    Per-node wall/CPU time, LLM latency and tokens, and log bytes read, in
+    Prometheus text format. Scrapers that accept OpenMetrics also get the
+    thread_id of a recent run as an exemplar on each histogram bucket.
+    """
+    if "application/openmetrics-text" in request.headers.get("accept", ""):
+        return Response(registry.render(openmetrics=True),
+                        media_type="application/openmetrics-text; version=1.0.0; charset=utf-8")
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @api.post("/run_cycle")
 async def run_cycle(req: AgentRequest):
     """
@@ -61,16 +91,80 @@ async def run_cycle(req: AgentRequest):
     # Run the graph (it will stop automatically if it hits 'interrupt')
     # We pass an empty reasoning_log to kickstart the state if it's new
     try:
-        iterator = app.stream({"reasoning_log": []}, config=config)
-        logs = parse_logs(iterator)
+        # astream runs the async node variants, so the LLM calls and file
+        # reads don't block other requests on this worker
+        iterator = app.astream({"reasoning_log": []}, config=config)
+        logs = await parse_logs(iterator)
         return {"logs": logs}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api.get("/run_cycle/stream")
+async def run_cycle_stream(request: Request, thread_id: str = "demo_session_1", tokens: bool = False):
+    """
+    Same cycle as /run_cycle, but pushed as Server-Sent Events while it runs:
+    - event 'log':      one per node, the node's reasoning_log entry
+    - event 'token':    LLM token deltas (only with ?tokens=true)
+    - event 'approval': the graph paused at the sentry and needs a human
+    - event 'done' / 'error'
+    If the client disconnects, the in-flight graph run (and its LLM call) is cancelled.
+    """
+    config = get_config(thread_id)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stream_mode = ["updates", "messages"] if tokens else ["updates"]
+
+    async def produce():
+        try:
+            async for mode, chunk in app.astream({"reasoning_log": []}, config=config, stream_mode=stream_mode):
+                if mode == "updates":
+                    for entry in format_event(chunk):
+                        await queue.put(("log", entry))
+                else:
+                    message, metadata = chunk
+                    if message.content:
+                        await queue.put(("token", {"node": metadata.get("langgraph_node"), "delta": message.content}))
+
+            snapshot = await app.aget_state(config)
+            if snapshot.next and "sentry" in snapshot.next:
+                await queue.put(("approval", {
+                    "proposal": snapshot.values.get("decision_args"),
+                    "tool": snapshot.values.get("next_action")
+                }))
+            await queue.put(("done", {"thread_id": thread_id}))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(("error", {"detail": str(e)}))
+
+    async def events():
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                try:
+                    kind, payload = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+
+                yield sse(kind, payload)
+                if kind in ("done", "error") or await request.is_disconnected():
+                    break
+        finally:
+            # Covers normal completion, disconnects and server shutdown alike
+            producer.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api.get("/agent_state")
 async def get_agent_state(thread_id: str = "demo_session_1"):
     config = get_config(thread_id)
-    snapshot = app.get_state(config)
+    snapshot = await app.aget_state(config)
     
     # NEW: Check for 'sentry' instead of 'executor'
     if snapshot.next and "sentry" in snapshot.next:
@@ -96,12 +190,12 @@ async def approve_action(req: ApprovalRequest):
     
     if req.approved:
         # RESUME: Pass None to continue from the pause point
-        iterator = app.stream(None, config=config)
-        logs = parse_logs(iterator)
+        iterator = app.astream(None, config=config)
+        logs = await parse_logs(iterator)
         return {"status": "EXECUTED", "logs": logs}
     else:
         # REJECT: Modify state to cancel the action so the graph doesn't get stuck
-        app.update_state(config, {"next_action": "MONITOR"}) 
+        await app.aupdate_state(config, {"next_action": "MONITOR"}) 
         return {"status": "REJECTED", "logs": ["User rejected the proposal. Action cancelled."]}
 
 # --- RUNNER ---
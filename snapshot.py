@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from metrics_window import SlidingWindowMetrics
+from instrumentation import LOG_BYTES
+from transaction import decode_line, decode_rows
+
+# What the rule engine, the prompts and the LLM cache fingerprints read. The
+# opt-in time windows ("windows", one more copy of these per window) stay on
+# ObserverSnapshot.metrics and out of graph state, so they aren't written
+# into every checkpoint, and the version only bumps when these fields change.
+STATE_METRICS = ("global_success_rate", "failure_clusters", "security_alerts", "latency_percentiles", "total_count")
+
+
+class ObserverSnapshot:
+    """
+    Immutable (by convention) result of one observer pass. `update` is the
+    ready-made state update observer_node returns, shared by every thread
+    that reads this version, so callers must not mutate it.
+    """
+    __slots__ = ("version", "metrics", "total", "created_at", "update")
+
+    def __init__(self, version: int, metrics: dict, latest_logs: list, created_at: float):
+        self.version = version
+        self.metrics = metrics
+        self.total = metrics["total_count"]
+        self.created_at = created_at
+
+        # Initialize the return dictionary with defaults to prevent KeyErrors
+        self.update = {
+            "latest_logs": latest_logs,
+            "metrics": {key: metrics[key] for key in STATE_METRICS if key in metrics},
+            "current_hypothesis": "Monitoring...",
+            "observer_version": version,
+            "reasoning_log": [f"Observer: Successfully parsed {self.total} transactions."]
+            if self.total else ["Observer: No valid JSON transactions found in log yet."]
+        }
+
+
+class LineWindow:
+    """
+    JSON-lines source (LogTailer, replay.ReplaySource) folded into
+    SlidingWindowMetrics. txlog.ColumnarWindow is the binary-log equivalent.
+
+    Without time windows each batch of lines is reduced to the five counted
+    fields (transaction.decode_rows) and folded in at once; the raw lines
+    of the newest transactions are kept and only decoded in full for
+    latest_logs(). Time windows need every timestamp, so they take the
+    per-transaction path.
+    """
+
+    def __init__(self, source, window_size: int, latest_logs_size: int = 100,
+                 time_windows: Optional[Dict[str, float]] = None):
+        self.source = source
+        self.window = SlidingWindowMetrics(count_window=window_size, time_windows=time_windows)
+        self.recent = deque(maxlen=latest_logs_size)  # Raw lines
+
+    @property
+    def bytes_read(self) -> int:
+        return getattr(self.source, "bytes_read", 0)
+
+    def update(self) -> int:
+        lines = self.source.read_new_lines()
+        if self.window.time_windows:
+            return self._update_each(lines)
+
+        rows, kept = decode_rows(lines)
+        self.window.add_fields(rows)
+        self.recent.extend(kept)
+        return len(rows)
+
+    def _update_each(self, lines) -> int:
+        parsed = 0
+        for line in lines:
+            tx = decode_line(line)
+            if tx is not None:
+                self.window.add(tx)
+                self.recent.append(line)
+                parsed += 1
+        return parsed
+
+    def expire(self, now: float) -> bool:
+        return self.window.expire(now)
+
+    def snapshot(self, now: float) -> dict:
+        return self.window.snapshot(now=now)
+
+    def latest_logs(self) -> list:
+        return [decode_line(line).to_dict() for line in self.recent]
+
+
+class ObserverSnapshotService:
+    """
+    Process-wide observer. Each new chunk of the log is parsed exactly once,
+    however many threads or dashboards are polling, and published as a
+    versioned ObserverSnapshot.
+
+    get() returns the current snapshot in O(1) and only refreshes it when it
+    is older than `min_interval` seconds. The version bumps only when the
+    STATE_METRICS the graph reads change, so a thread can tell it has
+    already seen a snapshot (idle time-window expiry doesn't count).
+    """
+
+    def __init__(self, window, clock=time.time, min_interval: float = 0.5):
+        self._lock = threading.Lock()
+        self._reset(window, clock, min_interval)
+
+    def _reset(self, window, clock, min_interval):
+        self.window = window
+        self.clock = clock
+        self.min_interval = min_interval
+        self._refreshed_at = float("-inf")
+        self._snapshot = ObserverSnapshot(0, window.snapshot(now=clock()), [], clock())
+
+    def attach(self, window, clock=time.time, min_interval: float = 0.0):
+        """Switches to another window (e.g. over a replay source), starting empty."""
+        with self._lock:
+            self._reset(window, clock, min_interval)
+
+    def current(self) -> ObserverSnapshot:
+        return self._snapshot
+
+    def stale(self) -> bool:
+        return time.monotonic() - self._refreshed_at >= self.min_interval
+
+    def get(self) -> ObserverSnapshot:
+        return self.refresh() if self.stale() else self._snapshot
+
+    def refresh(self) -> ObserverSnapshot:
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if not self.stale():
+                return self._snapshot
+
+            bytes_before = self.window.bytes_read
+            parsed = self.window.update()
+            LOG_BYTES.inc(amount=self.window.bytes_read - bytes_before)
+
+            now = self.clock()
+            expired = self.window.expire(now)
+            if parsed or expired:
+                metrics = self.window.snapshot(now=now)
+                previous = self._snapshot.update["metrics"]
+                changed = any(metrics.get(key) != previous.get(key) for key in STATE_METRICS)
+                self._snapshot = ObserverSnapshot(
+                    self._snapshot.version + changed, metrics, self.window.latest_logs(), now
+                )
+            self._refreshed_at = time.monotonic()
+            return self._snapshot
@@ -0,0 +1,58 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# The modules live flat in the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# agent.py builds its checkpointer and LLM client at import time; keep both offline
+os.environ.setdefault("AGENT_CHECKPOINT_DB", "memory")
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """Config and policy files are relative to the working directory: give every test its own."""
+    for name in ("rules.json", "routing_config.json"):
+        shutil.copy(os.path.join(ROOT, name), tmp_path)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def agent(workdir, monkeypatch):
+    """agent.py with the scripted LLM, no rate limit and no result caches, reading workdir/transactions.log."""
+    import agent
+    from bench import ScriptedLLM
+    from log_tail import LogTailer
+    from rate_limit import LLMLimiter
+
+    monkeypatch.setattr(agent, "llm", ScriptedLLM())
+    monkeypatch.setattr(agent, "llm_limiter", LLMLimiter(max_concurrency=10 ** 6, requests_per_minute=1e9, burst=10 ** 6))
+    for cache in (agent.reasoner_cache, agent.decider_cache, agent.assessor_cache):
+        monkeypatch.setattr(cache, "ttl", -1)
+    log_path = workdir / "transactions.log"
+    log_path.touch()
+    agent.attach_log_source(LogTailer(str(log_path), backfill_lines=agent.OBSERVER_WINDOW))
+    return agent
+
+
+@pytest.fixture
+def write_log(workdir):
+    """write_log(lines, incident) appends a synthetic capture (see bench.synthetic_line) ending now."""
+    import random
+    import time
+
+    from bench import synthetic_line
+
+    def write(lines=200, incident="outage", seed=7):
+        rng = random.Random(seed)
+        start = time.time() - lines / 1000
+        with open(workdir / "transactions.log", "a") as f:
+            for i in range(lines):
+                f.write(synthetic_line(rng, start + i / 1000, incident))
+
+    return write
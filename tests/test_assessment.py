@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from pydantic import ValidationError
+
+from assessment import IncidentAssessment
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OUTAGE = {"failure_clusters": {"UK_stripe_91": 45}, "security_alerts": {}, "latency_percentiles": {},
+          "global_success_rate": 0.6, "total_count": 120}
+QUIET = {"failure_clusters": {"US_stripe_05": 2}, "security_alerts": {}, "latency_percentiles": {},
+         "global_success_rate": 0.98, "total_count": 120}
+
+
+def assessment(**fields):
+    return IncidentAssessment(**{"hypothesis": "h", "confidence": 80, "anomaly_detected": True, **fields})
+
+
+def test_tool_calls_need_their_arguments():
+    with pytest.raises(ValidationError):
+        assessment(action="update_routing_tool", region="UK")
+    with pytest.raises(ValidationError):
+        assessment(action="fraud_mitigation_tool", action_type="BLOCK_IP_RANGE")
+    with pytest.raises(ValidationError):
+        assessment(action="update_routing_tool", region="UK", gateway="paypal")
+    with pytest.raises(ValidationError):
+        assessment(confidence=120)
+
+
+def test_tool_args_match_the_tool_schemas():
+    assert assessment(action="update_routing_tool", region="UK", gateway="adyen").tool_args() == \
+        {"region": "UK", "gateway": "adyen"}
+    assert assessment(action="fraud_mitigation_tool", action_type="BLOCK_IP_RANGE", target_region="IN").tool_args() == \
+        {"action_type": "BLOCK_IP_RANGE", "target_region": "IN"}
+    assert assessment().tool_args() is None
+    # No anomaly means no action, whatever the model filled in
+    assert assessment(anomaly_detected=False, action="update_routing_tool", region="UK", gateway="adyen").tool_args() is None
+
+
+def test_assessor_diagnoses_and_decides_in_one_call(agent):
+    update = agent.assessor_node({"metrics": OUTAGE, "action_history": []})
+    assert update["next_action"] == "update_routing_tool"
+    assert json.loads(update["decision_args"]) == {"region": "UK", "gateway": "adyen"}
+    assert update["is_anomaly_detected"] and "stripe in UK" in update["current_hypothesis"]
+    assert update["reasoning_log"][-1].endswith("[cache miss: " + agent.assessor_cache.stats() + "]")
+
+    quiet = asyncio.run(agent.aassessor_node({"metrics": QUIET, "action_history": []}))
+    assert quiet["next_action"] == "MONITOR" and quiet["decision_args"] is None
+
+
+class Unparseable:
+    def invoke(self, prompt):
+        return {"raw": None, "parsed": None, "parsing_error": ValueError("update_routing_tool needs region and gateway")}
+
+    async def ainvoke(self, prompt):
+        return self.invoke(prompt)
+
+
+def test_invalid_assessment_falls_back_to_reasoner_and_decider(agent, monkeypatch):
+    real = agent.bound_llm
+    monkeypatch.setattr(agent, "bound_llm", lambda kind: Unparseable() if kind == "assessor" else real(kind))
+
+    for update in (agent.assessor_node({"metrics": OUTAGE, "action_history": []}),
+                   asyncio.run(agent.aassessor_node({"metrics": OUTAGE, "action_history": []}))):
+        assert update["reasoning_log"][0].startswith("Assessor: Structured output rejected (update_routing_tool needs")
+        assert update["next_action"] == "update_routing_tool"
+        assert "stripe in UK" in update["current_hypothesis"]
+
+
+def test_bench_single_call_graph(workdir):
+    out = workdir / "results.json"
+    subprocess.run([sys.executable, os.path.join(ROOT, "bench.py"), "--sizes", "300", "--threads", "1",
+                    "--cycles", "2", "--incident", "none", "--graph-mode", "single_call", "--out", str(out)],
+                   check=True, cwd=workdir, capture_output=True, timeout=120)
+    nodes = set(json.loads(out.read_text())["log_sizes"][0]["nodes"])
+    assert nodes == {"observer", "rule_engine", "assessor"}  # No rule fires, so the one LLM call decides
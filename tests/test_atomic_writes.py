@@ -0,0 +1,104 @@
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from config_cache import CachedJsonFile
+
+UPDATES = 50
+
+
+def _increment(path, n):
+    store = CachedJsonFile(path, default={"count": 0})
+    for _ in range(n):
+        store.update(lambda data: {"count": data["count"] + 1})
+
+
+def _leftovers(workdir):
+    return [name for name in os.listdir(workdir) if name.startswith(".counter.json.")]
+
+
+def test_concurrent_threads_lose_no_updates(workdir):
+    path = str(workdir / "counter.json")
+    threads = [threading.Thread(target=_increment, args=(path, UPDATES)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert CachedJsonFile(path).get() == {"count": 4 * UPDATES}
+    assert _leftovers(workdir) == []
+
+
+def test_concurrent_processes_lose_no_updates_and_readers_never_see_a_torn_file(workdir):
+    path = str(workdir / "counter.json")
+    CachedJsonFile(path, default={"count": 0}).update(lambda data: data)
+    ctx = multiprocessing.get_context("fork")
+    writers = [ctx.Process(target=_increment, args=(path, UPDATES)) for _ in range(4)]
+    for p in writers:
+        p.start()
+
+    # 1. Raw reads while the writers run: every read must parse
+    seen = []
+    while any(p.is_alive() for p in writers):
+        with open(path) as f:
+            seen.append(json.load(f)["count"])
+    for p in writers:
+        p.join()
+        assert p.exitcode == 0
+
+    # 2. No lost update, and the counter only ever went up
+    with open(path) as f:
+        assert json.load(f) == {"count": 4 * UPDATES}
+    assert seen == sorted(seen)
+    assert _leftovers(workdir) == []
+
+
+def test_update_accepts_mutation_or_replacement_and_bumps_the_generation(workdir):
+    path = str(workdir / "routing.json")
+    store = CachedJsonFile(path, default={"global_default": "stripe"})
+    generation = store.generation
+
+    written = store.update(lambda data: data.update({"UK": "adyen"}))  # Mutates, returns None
+    assert written == {"global_default": "stripe", "UK": "adyen"}
+    assert store.update(lambda data: {"US": "stripe"}) == {"US": "stripe"}
+    assert store.generation == generation + 2
+    assert store.get() == {"US": "stripe"} and store.reloads == 0  # Published without a re-parse
+
+    other = CachedJsonFile(path)
+    assert other.get() == {"US": "stripe"}
+
+
+def test_default_is_copied_not_shared(workdir):
+    default = {"policies": []}
+    store = CachedJsonFile(str(workdir / "p.json"), default=default)
+    store.update(lambda data: data["policies"].append("x"))
+    assert default == {"policies": []}
+
+
+def test_failed_write_leaves_the_old_file_and_no_temp_file(workdir, monkeypatch):
+    path = str(workdir / "counter.json")
+    store = CachedJsonFile(path, default={"count": 0})
+    store.update(lambda data: {"count": 1})
+
+    def broken_replace(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        store.update(lambda data: {"count": 2})
+    monkeypatch.undo()
+
+    with open(path) as f:
+        assert json.load(f) == {"count": 1}
+    assert _leftovers(workdir) == []
+
+
+def test_mutator_error_writes_nothing(workdir):
+    path = str(workdir / "counter.json")
+    store = CachedJsonFile(path, default={"count": 0})
+    store.update(lambda data: {"count": 1})
+    with pytest.raises(KeyError):
+        store.update(lambda data: data["missing"])
+    assert CachedJsonFile(path).get() == {"count": 1}
+    assert _leftovers(workdir) == []
@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+from langchain_core.messages import HumanMessage
+
+from assessment import IncidentAssessment
+from bench import ScriptedLLM, summarize, synthetic_line
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_scripted_llm_diagnoses_from_the_prompt():
+    llm = ScriptedLLM()
+    assert "Technical Infrastructure Issue on stripe in UK" in llm.invoke("UK_stripe_91=40").content
+    assert "Malicious Traffic Pattern in IN" in llm.invoke([HumanMessage("SPAM_ATTACK_IN=30")]).content
+    assert "Normal operations" in llm.invoke("US_stripe_05=2").content
+    assert llm.calls == 3
+
+
+def test_scripted_llm_decides_with_tools():
+    decider = ScriptedLLM().bind_tools(["update_routing_tool", "fraud_mitigation_tool"])
+    call = decider.invoke("Hypothesis: Technical Infrastructure Issue on stripe in UK").tool_calls[0]
+    assert (call["name"], call["args"]) == ("update_routing_tool", {"region": "UK", "gateway": "adyen"})
+    assert decider.invoke("Hypothesis: Normal operations").tool_calls == []
+
+
+def test_scripted_llm_structured_output():
+    assessor = ScriptedLLM().with_structured_output(IncidentAssessment, include_raw=True)
+    answer = assessor.invoke("SPAM_ATTACK_EU=50")
+    assert answer["parsing_error"] is None
+    assert answer["parsed"].tool_args() == {"action_type": "BLOCK_IP_RANGE", "target_region": "EU"}
+
+
+def test_synthetic_lines_are_deterministic():
+    import random
+    first = [synthetic_line(random.Random(3), 0.0, "outage") for _ in range(5)]
+    assert first == [synthetic_line(random.Random(3), 0.0, "outage") for _ in range(5)]
+
+
+def test_summarize():
+    assert summarize([0.001, 0.002, 0.003]) == {"median_ms": 2.0, "p95_ms": 3.0, "max_ms": 3.0}
+
+
+def test_bench_runs_end_to_end(workdir):
+    out = workdir / "results.json"
+    subprocess.run([sys.executable, os.path.join(ROOT, "bench.py"), "--sizes", "300", "--threads", "2",
+                    "--cycles", "4", "--append", "50", "--checkpointer", "sqlite", "--out", str(out)],
+                   check=True, cwd=workdir, capture_output=True, timeout=120)
+    results = json.loads(out.read_text())
+    assert results["config"]["llm_rpm"] == 0
+    size = results["log_sizes"][0]
+    assert size["log_lines"] == 300
+    assert {"observer", "rule_engine", "executor"} <= set(size["nodes"])
+    assert size["checkpoint_bytes"] > 0
+    assert results["threads"][0]["cycles"] == 2 * 1
@@ -0,0 +1,129 @@
+import operator
+import sqlite3
+
+import pytest
+from typing import Annotated, List, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from checkpointer import CompactSqliteSaver, CompressedSerializer, build_checkpointer, parse_retention
+
+
+class State(TypedDict, total=False):
+    latest_logs: list
+    metrics: dict
+    reasoning_log: Annotated[List[str], operator.add]
+
+
+def observe(state):
+    return {"latest_logs": [{"tx": i} for i in range(100)], "metrics": {"total_count": 100},
+            "reasoning_log": ["observed"]}
+
+
+def act(state):
+    return {"reasoning_log": ["acted"]}
+
+
+def graph(saver):
+    workflow = StateGraph(State)
+    workflow.add_node("observe", observe)
+    workflow.add_node("act", act)
+    workflow.add_edge(START, "observe")
+    workflow.add_edge("observe", "act")
+    workflow.add_edge("act", END)
+    return workflow.compile(checkpointer=saver, interrupt_before=["act"])
+
+
+def config(thread):
+    return {"configurable": {"thread_id": thread}}
+
+
+def test_memory_is_still_available():
+    from langgraph.checkpoint.memory import MemorySaver
+    assert isinstance(build_checkpointer("memory"), MemorySaver)
+
+
+def test_serializer_round_trips_and_reads_uncompressed_rows():
+    serde = CompressedSerializer()
+    payload = {"metrics": {"failure_clusters": {"UK_stripe_91": 30}}, "log": ["x" * 50] * 20}
+    type_, data = serde.dumps_typed(payload)
+    assert type_.endswith(CompressedSerializer.SUFFIX)
+    assert serde.loads_typed((type_, data)) == payload
+    assert serde.loads_typed(serde.inner.dumps_typed(payload)) == payload
+
+
+def test_ephemeral_channels_are_not_persisted(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    app = graph(CompactSqliteSaver.from_path(path))
+    app.invoke({"reasoning_log": []}, config=config("t1"))
+
+    # A fresh process sees everything except latest_logs
+    values = graph(CompactSqliteSaver.from_path(path)).get_state(config("t1")).values
+    assert values["metrics"] == {"total_count": 100}
+    assert values["reasoning_log"] == ["observed"]
+    assert "latest_logs" not in values
+
+
+def test_interrupted_run_survives_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    graph(CompactSqliteSaver.from_path(path)).invoke({"reasoning_log": []}, config=config("paused"))
+
+    restarted = graph(CompactSqliteSaver.from_path(path))
+    assert restarted.get_state(config("paused")).next == ("act",)
+    restarted.invoke(None, config=config("paused"))
+    assert restarted.get_state(config("paused")).values["reasoning_log"] == ["observed", "acted"]
+
+
+def test_old_checkpoints_are_pruned_per_thread(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    app = graph(CompactSqliteSaver.from_path(path, retention=5))
+    for _ in range(5):
+        app.invoke({"reasoning_log": []}, config=config("busy"))
+        app.invoke(None, config=config("busy"))
+    app.invoke({"reasoning_log": []}, config=config("quiet"))
+
+    conn = sqlite3.connect(path)
+    counts = dict(conn.execute("SELECT thread_id, COUNT(*) FROM checkpoints GROUP BY thread_id"))
+    assert counts["busy"] == 5
+    assert counts["quiet"] == 3  # input, start, observe: under the cap
+    oldest = conn.execute("SELECT MIN(checkpoint_id) FROM checkpoints WHERE thread_id = 'busy'").fetchone()[0]
+    assert conn.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 'busy' AND checkpoint_id < ?",
+                        (oldest,)).fetchone()[0] == 0
+    assert app.get_state(config("busy")).values["reasoning_log"][-1] == "acted"
+
+
+def test_retention_can_be_set_per_thread(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    saver = CompactSqliteSaver.from_path(path, retention=5, retention_by_thread={"audit": 0, "replay_*": 2})
+    assert saver.retention_for("audit") == 0
+    assert saver.retention_for("replay_1760000000") == 2
+    assert saver.retention_for("busy") == 5
+
+    app = graph(saver)
+    for thread in ("audit", "replay_1", "busy"):
+        for _ in range(3):
+            app.invoke({"reasoning_log": []}, config=config(thread))
+            app.invoke(None, config=config(thread))
+
+    conn = sqlite3.connect(path)
+    counts = dict(conn.execute("SELECT thread_id, COUNT(*) FROM checkpoints GROUP BY thread_id"))
+    assert counts == {"audit": 12, "replay_1": 2, "busy": 5}  # 0 keeps all 4 per cycle
+
+
+def test_parse_retention():
+    assert parse_retention("") == {}
+    assert parse_retention("replay_*=0, hackathon_demo=50") == {"replay_*": 0, "hackathon_demo": 50}
+    with pytest.raises(ValueError):
+        parse_retention("replay_*")
+
+
+def test_async_api(tmp_path):
+    import asyncio
+
+    app = graph(CompactSqliteSaver.from_path(str(tmp_path / "checkpoints.sqlite")))
+
+    async def run():
+        await app.ainvoke({"reasoning_log": []}, config=config("async"))
+        return await app.aget_state(config("async"))
+
+    assert asyncio.run(run()).next == ("act",)
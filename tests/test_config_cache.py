@@ -0,0 +1,99 @@
+import json
+import os
+
+from config_cache import CachedJsonFile
+
+
+def write(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+
+def _replacement(workdir, data):
+    tmp = str(workdir / "replacement.json")
+    write(tmp, data)
+    return tmp
+
+
+def test_parses_once_until_the_file_changes(workdir):
+    path = str(workdir / "config.json")
+    write(path, {"UK": "stripe"})
+    store = CachedJsonFile(path)
+    assert store.get() == {"UK": "stripe"}
+    assert store.get() is store.get()
+    assert store.reloads == 1
+
+    write(path, {"UK": "adyen", "US": "stripe"})  # In place: size changes
+    assert store.get() == {"UK": "adyen", "US": "stripe"}
+
+    os.replace(_replacement(workdir, {"UK": "stripe", "US": "stripe"}), path)  # Atomic: new inode
+    assert store.get() == {"UK": "stripe", "US": "stripe"}
+    assert store.reloads == 3
+
+
+def test_torn_write_keeps_serving_the_last_good_copy(workdir):
+    path = str(workdir / "config.json")
+    write(path, {"UK": "stripe"})
+    store = CachedJsonFile(path)
+    store.get()
+
+    with open(path, "w") as f:
+        f.write('{"UK": "ad')
+    assert store.get() == {"UK": "stripe"}
+
+    write(path, {"UK": "adyen"})
+    assert store.get() == {"UK": "adyen"}
+
+
+def test_missing_file_serves_the_default(workdir):
+    path = str(workdir / "missing.json")
+    store = CachedJsonFile(path, default=[])
+    assert store.get() == []
+    assert not os.path.exists(path)
+
+    created = CachedJsonFile(path, default={"global_default": "stripe"}, create=True)
+    assert created.get() == {"global_default": "stripe"}
+    with open(path) as f:
+        assert json.load(f) == {"global_default": "stripe"}
+
+
+def test_deleted_file_falls_back_to_the_default(workdir):
+    path = str(workdir / "config.json")
+    write(path, [{"region": "UK"}])
+    store = CachedJsonFile(path, default=[])
+    assert store.get() == [{"region": "UK"}]
+    os.remove(path)
+    assert store.get() == []
+
+
+def test_transform_runs_once_per_reload(workdir):
+    path = str(workdir / "policies.json")
+    write(path, [{"region": "UK"}, {"region": "IN"}])
+    calls = []
+
+    def regions(policies):
+        calls.append(1)
+        return frozenset(p["region"] for p in policies)
+
+    store = CachedJsonFile(path, default=[], transform=regions)
+    calls.clear()  # The default is transformed at construction
+    for _ in range(5):
+        assert store.get() == {"UK", "IN"}
+    assert len(calls) == 1
+
+
+def test_derive_is_cached_per_generation(workdir):
+    path = str(workdir / "config.json")
+    write(path, {"UK": "stripe"})
+    store = CachedJsonFile(path)
+    calls = []
+
+    def upper(data):
+        calls.append(1)
+        return {k: v.upper() for k, v in data.items()}
+
+    assert store.derive(upper) == {"UK": "STRIPE"}
+    assert store.derive(upper) == {"UK": "STRIPE"}
+    write(path, {"UK": "adyen"})
+    assert store.derive(upper) == {"UK": "ADYEN"}
+    assert len(calls) == 2
@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from instrumentation import (LLM_TOKENS, NODE_RUNS, LLMMetricsHandler, Registry, current_node, current_trace,
+                             instrumented_node)
+
+
+def test_counter_and_histogram_text_format():
+    registry = Registry()
+    counter = registry.counter("demo_total", "Demo counter.", ["node"])
+    histogram = registry.histogram("demo_seconds", "Demo histogram.", ["node"], buckets=(0.1, 1.0))
+    counter.inc("observer")
+    counter.inc("observer", amount=2)
+    histogram.observe(0.05, "observer")
+    histogram.observe(0.5, "observer", trace_id="thread_1")
+
+    text = registry.render()
+    assert 'demo_total{node="observer"} 3' in text
+    assert 'demo_seconds_bucket{node="observer",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{node="observer",le="1"} 2' in text
+    assert 'demo_seconds_bucket{node="observer",le="+Inf"} 2' in text
+    assert 'demo_seconds_sum{node="observer"} 0.55' in text
+    assert "trace_id" not in text and not text.rstrip().endswith("# EOF")
+
+
+def test_openmetrics_has_exemplars_and_eof():
+    registry = Registry()
+    registry.counter("demo_total", "Demo counter.").inc()
+    registry.histogram("demo_seconds", "Demo histogram.", buckets=(1.0,)).observe(0.5, trace_id='th"read')
+
+    text = registry.render(openmetrics=True)
+    assert "# TYPE demo counter" in text  # The family drops _total; the sample keeps it
+    assert "demo_total 1" in text
+    assert 'demo_seconds_bucket{le="1"} 1 # {trace_id="th\\"read"} 0.5 ' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_instrumented_node_records_outcomes_and_context():
+    seen = {}
+
+    def node(state):
+        seen["node"], seen["trace"] = current_node.get(), current_trace.get()
+        if state.get("fail"):
+            raise ValueError("boom")
+        return {"ok": True}
+
+    name = f"test_node_{uuid.uuid4().hex[:6]}"
+    runnable = instrumented_node(name, node)
+    assert runnable.invoke({}, config={"configurable": {"thread_id": "t1"}}) == {"ok": True}
+    assert seen == {"node": name, "trace": "t1"}
+    assert current_node.get() == "unknown"  # Reset afterwards
+
+    with pytest.raises(ValueError):
+        runnable.invoke({"fail": True})
+    assert NODE_RUNS.values[(name, "ok")] == 1
+    assert NODE_RUNS.values[(name, "error")] == 1
+
+
+def test_instrumented_async_node():
+    async def anode(state, config):
+        return {"thread": config["configurable"]["thread_id"], "node": current_node.get()}
+
+    name = f"test_anode_{uuid.uuid4().hex[:6]}"
+    runnable = instrumented_node(name, lambda state: {}, anode)
+    result = asyncio.run(runnable.ainvoke({}, config={"configurable": {"thread_id": "t2"}}))
+    assert result == {"thread": "t2", "node": name}
+    assert NODE_RUNS.values[(name, "ok")] == 1
+
+
+def test_llm_handler_attributes_tokens_to_the_running_node():
+    handler = LLMMetricsHandler()
+    name = f"test_llm_{uuid.uuid4().hex[:6]}"
+    token = current_node.set(name)
+    try:
+        run_id = uuid.uuid4()
+        handler.on_chat_model_start({}, [[]], run_id=run_id)
+        message = AIMessage(content="hi", usage_metadata={"input_tokens": 120, "output_tokens": 7, "total_tokens": 127})
+        handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+    finally:
+        current_node.reset(token)
+    assert LLM_TOKENS.values[(name, "prompt")] == 120
+    assert LLM_TOKENS.values[(name, "completion")] == 7
+
+
+def test_metrics_endpoint_after_a_cycle(agent, write_log):
+    from fastapi.testclient import TestClient
+    import server
+
+    write_log(200, "none")
+    client = TestClient(server.api)
+    client.post("/run_cycle", json={"thread_id": f"test_{uuid.uuid4().hex}"})
+
+    text = client.get("/metrics").text
+    assert 'agent_node_runs_total{node="observer",outcome="ok"}' in text
+    assert 'agent_node_wall_seconds_bucket{node="reasoner",le="+Inf"}' in text
+    openmetrics = client.get("/metrics", headers={"accept": "application/openmetrics-text"})
+    assert openmetrics.headers["content-type"].startswith("application/openmetrics-text")
+    assert openmetrics.text.endswith("# EOF\n")
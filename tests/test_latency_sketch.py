@@ -0,0 +1,70 @@
+import random
+
+from latency_sketch import RELATIVE_ACCURACY, LatencySketch, bin_index
+
+
+def sketch_of(values, **kwargs):
+    sketch = LatencySketch(**kwargs)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def state(sketch):
+    return sketch.bins, sketch.zero_count, sketch.count
+
+
+def test_quantiles_are_within_the_relative_accuracy():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(5, 1) for _ in range(5_000)]
+    sketch = sketch_of(values)
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.95, 0.99):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= RELATIVE_ACCURACY * exact
+
+
+def test_non_positive_values_count_as_zero():
+    sketch = sketch_of([0, -5, 0, 100])
+    assert sketch.zero_count == 3
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.percentiles()["count"] == 4
+
+
+def test_remove_undoes_add():
+    rng = random.Random(2)
+    kept = [rng.uniform(1, 5_000) for _ in range(300)]
+    dropped = [rng.uniform(1, 5_000) for _ in range(300)] + [0, 0]
+    sketch = sketch_of(kept + dropped)
+    for value in dropped:
+        sketch.remove_bin(bin_index(value))
+    assert state(sketch) == state(sketch_of(kept))
+
+
+def test_merge_equals_one_sketch_over_both_inputs():
+    rng = random.Random(3)
+    a = [rng.uniform(1, 2_000) for _ in range(400)] + [0]
+    b = [rng.uniform(100, 9_000) for _ in range(400)] + [-1, 0]
+    merged = sketch_of(a)
+    merged.merge(sketch_of(b))
+    assert state(merged) == state(sketch_of(a + b))
+
+    merged.subtract(sketch_of(b))
+    assert state(merged) == state(sketch_of(a))
+
+
+def test_bins_are_capped_and_removal_still_balances():
+    values = [1.05 ** i for i in range(200)]  # Roughly 2.5 bins apart, far more bins than allowed
+    sketch = sketch_of(values, max_bins=32)
+    assert len(sketch.bins) <= 32
+    assert sum(sketch.bins.values()) == sketch.count == 200
+    # The high end keeps its accuracy; only the low end was collapsed
+    assert abs(sketch.quantile(1.0) - values[-1]) <= RELATIVE_ACCURACY * values[-1]
+
+    for value in values:
+        sketch.remove_bin(bin_index(value))
+    assert sketch.count == 0 and not sketch.bins
+
+
+def test_empty_sketch():
+    assert LatencySketch().percentiles() == {"p50": 0.0, "p95": 0.0, "p99": 0.0, "count": 0}
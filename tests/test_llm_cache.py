@@ -0,0 +1,69 @@
+import llm_cache
+from llm_cache import ResultCache, decision_fingerprint, metrics_fingerprint
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "monotonic", clock)
+    cache = ResultCache(ttl=60)
+    cache.put("k", {"current_hypothesis": "outage"})
+    clock.now += 59
+    assert cache.get("k") == {"current_hypothesis": "outage"}
+    clock.now += 2
+    assert cache.get("k") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_negative_ttl_disables_the_cache():
+    cache = ResultCache(ttl=-1)
+    cache.put("k", 1)
+    assert cache.get("k") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def metrics(rate=0.9, clusters=None, p95=200.0):
+    return {
+        "global_success_rate": rate,
+        "failure_clusters": clusters if clusters is not None else {"UK_stripe_91": 12},
+        "security_alerts": {},
+        "latency_percentiles": {"UK_stripe": {"p50": 100.0, "p95": p95, "p99": p95, "count": 50}},
+        "total_count": 100
+    }
+
+
+def test_metrics_fingerprint_ignores_jitter_within_a_band():
+    base = metrics_fingerprint(metrics())
+    assert metrics_fingerprint(metrics(rate=0.905, clusters={"UK_stripe_91": 13}, p95=240.0)) == base
+    assert metrics_fingerprint({**metrics(), "total_count": 5_000}) == base
+
+
+def test_metrics_fingerprint_changes_with_the_picture():
+    base = metrics_fingerprint(metrics())
+    assert metrics_fingerprint(metrics(rate=0.5)) != base
+    assert metrics_fingerprint(metrics(clusters={"UK_stripe_91": 40})) != base
+    assert metrics_fingerprint(metrics(clusters={"US_adyen_91": 12})) != base
+    assert metrics_fingerprint(metrics(p95=3_000.0)) != base
+
+
+def test_decision_fingerprint():
+    base = decision_fingerprint("Hypothesis: outage ", "none", [])
+    assert decision_fingerprint("Hypothesis: outage", "none", []) == base
+    assert decision_fingerprint("Hypothesis: outage", "UK blocked", []) != base
+    assert decision_fingerprint("Hypothesis: outage", "none", ["rerouted UK"]) != base
@@ -0,0 +1,260 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+import llm_client
+from instrumentation import LLM_HEDGES, LLM_PROVIDER_CALLS
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailableError, Provider
+from llm_stub import StubHandler, StubServer
+from tools import update_routing_tool, fraud_mitigation_tool
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "http://127.0.0.1:9/v1/chat/completions")
+    response = httpx.Response(429, request=request, json={"error": {"message": "slow down"}})
+    return openai.RateLimitError("slow down", response=response, body=None)
+
+
+class Always429:
+    def invoke(self, input, config=None, **kwargs):
+        raise rate_limit_error()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        raise rate_limit_error()
+
+
+def single_provider_client(name):
+    provider = Provider(name, "http://127.0.0.1:9/v1", "stub")
+    return provider, LLMClient([provider], key="always_429", bind=lambda model: Always429())
+
+
+def test_repeated_429s_leave_the_breaker_closed():
+    provider, client = single_provider_client("only_429_sync")
+    for _ in range(provider.breaker.threshold * 3):
+        with pytest.raises(openai.RateLimitError):
+            client.invoke("hello")
+    assert provider.breaker.state == "closed"
+    assert LLM_PROVIDER_CALLS.values[("only_429_sync", "rate_limited")] == provider.breaker.threshold * 3
+    assert ("only_429_sync", "error") not in LLM_PROVIDER_CALLS.values
+
+
+def test_repeated_429s_leave_the_breaker_closed_async():
+    provider, client = single_provider_client("only_429_async")
+
+    async def run():
+        for _ in range(provider.breaker.threshold * 3):
+            with pytest.raises(openai.RateLimitError):
+                await client.ainvoke("hello")
+
+    asyncio.run(run())
+    assert provider.breaker.state == "closed"
+    assert ("only_429_async", "error") not in LLM_PROVIDER_CALLS.values
+
+
+class Scripted:
+    """Answers after `delay` seconds, or raises `error`."""
+
+    def __init__(self, answer, delay=0.0, error=None):
+        self.answer, self.delay, self.error = answer, delay, error
+
+    def invoke(self, input, config=None, **kwargs):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.answer
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.answer
+
+
+def client_for(*runnables, hedge=False, prefix):
+    # Provider i serves model "m<i>"; the bind picks the matching fake runnable
+    providers = [Provider(f"{prefix}_{i}", "http://127.0.0.1:9/v1", f"m{i}") for i in range(len(runnables))]
+    fakes = {f"m{i}": runnable for i, runnable in enumerate(runnables)}
+    return providers, LLMClient(providers, hedge=hedge, key="scripted", bind=lambda model: fakes[model.model_name])
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    now = [0.0]
+    breaker = CircuitBreaker(threshold=3, cooldown=10, clock=lambda: now[0])
+    for _ in range(2):
+        breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    now[0] = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()  # A single trial
+    breaker.failure()
+    assert breaker.state == "open" and breaker.opened_at == 10  # Another full cooldown
+
+    now[0] = 20
+    assert breaker.allow()
+    breaker.release()  # The trial was cancelled: the next caller may try
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_success_resets_the_failure_streak():
+    breaker = CircuitBreaker(threshold=2)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == "closed"
+
+
+def test_falls_back_to_the_next_provider():
+    providers, client = client_for(Scripted(None, error=RuntimeError("500")), Scripted("ok"), prefix="fallback")
+    assert client.invoke("hello") == "ok"
+    assert asyncio.run(client.ainvoke("hello")) == "ok"
+    assert providers[0].breaker.failures == 2 and providers[1].breaker.failures == 0
+    assert LLM_PROVIDER_CALLS.values[("fallback_0", "error")] == 2
+    assert LLM_PROVIDER_CALLS.values[("fallback_1", "ok")] == 2
+
+
+def test_last_error_surfaces_when_every_provider_fails():
+    _, client = client_for(Scripted(None, error=RuntimeError("first")), Scripted(None, error=ValueError("second")),
+                           prefix="all_fail")
+    with pytest.raises(ValueError, match="second"):
+        client.invoke("hello")
+
+
+def test_open_breakers_are_skipped():
+    providers, client = client_for(Scripted("never"), Scripted("never"), prefix="all_open")
+    for provider in providers:
+        provider.breaker = CircuitBreaker(threshold=1)
+        provider.breaker.failure()
+    with pytest.raises(LLMUnavailableError):
+        client.invoke("hello")
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(client.ainvoke("hello"))
+    client.hedge = True
+    with pytest.raises(LLMUnavailableError):
+        client.invoke("hello")
+    assert LLM_PROVIDER_CALLS.values[("all_open_0", "skipped")] == 3
+
+
+@pytest.fixture
+def fast_hedge(monkeypatch):
+    monkeypatch.setattr(LLMClient, "_hedge_delay", lambda self, provider: 0.05)
+
+
+def test_slow_primary_is_hedged(fast_hedge):
+    _, client = client_for(Scripted("slow", delay=1.0), Scripted("fast"), hedge=True, prefix="hedge_sync")
+    started = time.perf_counter()
+    assert client.invoke("hello") == "fast"
+    assert time.perf_counter() - started < 0.5
+    assert LLM_HEDGES.values[("hedge_sync_1",)] == 1
+    assert ("hedge_sync_0",) not in LLM_HEDGES.values
+
+
+def test_slow_primary_is_hedged_and_cancelled_async(fast_hedge):
+    providers, client = client_for(Scripted("slow", delay=1.0), Scripted("fast"), hedge=True, prefix="hedge_async")
+    started = time.perf_counter()
+    assert asyncio.run(client.ainvoke("hello")) == "fast"
+    assert time.perf_counter() - started < 0.5
+    assert LLM_HEDGES.values[("hedge_async_1",)] == 1
+    assert LLM_PROVIDER_CALLS.values[("hedge_async_0", "cancelled")] == 1
+    assert providers[0].breaker.state == "closed"  # Losing a hedge is not a failure
+
+
+def test_fast_primary_is_not_hedged(fast_hedge):
+    _, client = client_for(Scripted("fast"), Scripted("spare"), hedge=True, prefix="no_hedge")
+    assert client.invoke("hello") == "fast"
+    assert asyncio.run(client.ainvoke("hello")) == "fast"
+    assert ("no_hedge_1",) not in LLM_HEDGES.values
+
+
+def test_failed_primary_starts_the_next_provider_at_once(monkeypatch):
+    monkeypatch.setattr(LLMClient, "_hedge_delay", lambda self, provider: 10.0)
+    _, client = client_for(Scripted(None, error=RuntimeError("500")), Scripted("ok"), hedge=True, prefix="hedge_err")
+    started = time.perf_counter()
+    assert client.invoke("hello") == "ok"
+    assert asyncio.run(client.ainvoke("hello")) == "ok"
+    assert time.perf_counter() - started < 1.0
+    assert ("hedge_err_1",) not in LLM_HEDGES.values  # A fallback, not a hedge
+
+
+# The same paths through real HTTP: ChatOpenAI -> pooled httpx client -> llm_stub.py
+
+OUTAGE_DIAGNOSIS = "Hypothesis: Technical Infrastructure Issue on stripe in UK\nConfidence: 85%"
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(name, latency=0.0, fail_rate=0.0):
+        # A handler subclass per server: the stub keeps its settings on the class
+        handler = type("Handler", (StubHandler,), {"latency": latency, "jitter": 0.0, "fail_rate": fail_rate})
+        server = StubServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return Provider(name, f"http://127.0.0.1:{server.server_address[1]}/v1", "stub", timeout=5)
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_stub_failures_fall_back_to_the_next_provider(stub):
+    failing, healthy = stub("http_fail", fail_rate=1.0), stub("http_ok")
+    client = LLMClient([failing, healthy], hedge=False)
+    assert client.invoke("hello").content.startswith("Hypothesis:")
+    assert asyncio.run(client.ainvoke("hello")).content.startswith("Hypothesis:")
+    assert LLM_PROVIDER_CALLS.values[("http_fail", "error")] == 2
+    assert LLM_PROVIDER_CALLS.values[("http_ok", "ok")] == 2
+    assert failing.breaker.failures == 2 and healthy.breaker.failures == 0
+
+
+def test_stub_tool_calls_come_back_through_the_fallback(stub):
+    client = LLMClient([stub("http_tools_fail", fail_rate=1.0), stub("http_tools_ok")], hedge=False)
+    decider = client.bind_tools([update_routing_tool, fraud_mitigation_tool])
+    for response in (decider.invoke(OUTAGE_DIAGNOSIS), asyncio.run(decider.ainvoke(OUTAGE_DIAGNOSIS))):
+        assert [(call["name"], call["args"]) for call in response.tool_calls] == [
+            ("update_routing_tool", {"region": "UK", "gateway": "adyen"})]
+
+
+def test_slow_stub_is_hedged(stub, fast_hedge):
+    slow, fast = stub("http_slow_sync", latency=1.0), stub("http_fast_sync")
+    client = LLMClient([slow, fast], hedge=True)
+    started = time.perf_counter()
+    assert client.invoke("hello").content.startswith("Hypothesis:")
+    assert time.perf_counter() - started < 0.8
+    assert LLM_HEDGES.values[("http_fast_sync",)] == 1
+    assert LLM_PROVIDER_CALLS.values[("http_fast_sync", "ok")] == 1
+
+
+def test_slow_stub_is_hedged_and_cancelled_async(stub, fast_hedge):
+    slow, fast = stub("http_slow_async", latency=1.0), stub("http_fast_async")
+    client = LLMClient([slow, fast], hedge=True)
+    started = time.perf_counter()
+    assert asyncio.run(client.ainvoke("hello")).content.startswith("Hypothesis:")
+    assert time.perf_counter() - started < 0.8
+    assert LLM_HEDGES.values[("http_fast_async",)] == 1
+    assert LLM_PROVIDER_CALLS.values[("http_slow_async", "cancelled")] == 1
+    assert slow.breaker.state == "closed"
+
+
+def test_async_client_is_closed_with_its_loop(stub):
+    client = LLMClient([stub("http_loops")], hedge=False)
+    used = []
+
+    async def call():
+        await client.ainvoke("hello")
+        used.append(llm_client.async_http_client(asyncio.get_running_loop()))
+
+    asyncio.run(call())
+    asyncio.run(call())  # A new loop gets a new client; the old one was already closed
+    assert used[0] is not used[1]
+    assert used[0].is_closed and used[1].is_closed
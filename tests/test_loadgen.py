@@ -0,0 +1,88 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from loadgen import SCENARIOS, BatchGenerator, ColumnarBatchGenerator, ColumnarWriterThread, LogWriter, run_load
+from metrics_window import parse_timestamp
+from transaction import decode_line
+
+ROUTING = {"US": "stripe", "UK": "stripe", "IN": "stripe", "EU": "adyen", "global_default": "stripe"}
+
+
+def only(scenario):
+    return [1 if name == scenario else 0 for name in SCENARIOS]
+
+
+def generate(scenario, n=2_000, routing=ROUTING, blocked=frozenset()):
+    generator = BatchGenerator(lambda: routing, lambda: blocked, only(scenario), seed=1)
+    chunk, count = generator.generate(n, 1_700_000_000.0, 1_000.0)
+    lines = chunk.decode().splitlines()
+    assert len(lines) == count
+    return [decode_line(line) for line in lines]
+
+
+def test_lines_decode_like_the_simulator_output():
+    transactions = generate("normal")
+    assert all(tx is not None and tx.ts is not None for tx in transactions)
+    assert {tx.status for tx in transactions} == {"SUCCESS"}
+    assert all(tx.gateway == ROUTING[tx.region] for tx in transactions)
+    assert transactions[1].ts - transactions[0].ts == pytest.approx(0.001, abs=2e-6)
+    assert transactions[0].timestamp == "2023-11-14T22:13:20.000000+00:00Z"
+    assert parse_timestamp(transactions[0].timestamp) == 1_700_000_000.0
+
+
+def test_routing_is_applied_per_batch():
+    transactions = generate("normal", routing={**ROUTING, "UK": "adyen"})
+    assert {tx.gateway for tx in transactions if tx.region == "UK"} == {"adyen"}
+
+
+def test_outage_fails_uk_stripe_only():
+    failed = [tx for tx in generate("uk_bank_outage") if tx.status == "FAILED"]
+    assert failed and {(tx.region, tx.gateway, tx.error_code) for tx in failed} == {("UK", "stripe", "91")}
+
+
+def test_blocked_regions_drop_the_retry_storm():
+    storm = generate("retry_storm")
+    assert {tx.error_code for tx in storm} == {"429"}
+    survivors = generate("retry_storm", blocked=frozenset({"UK", "US"}))
+    assert {tx.region for tx in survivors} == {"IN", "EU"}
+    assert generate("retry_storm", blocked=frozenset({"global_default"})) == []
+
+
+def test_log_writer_rotates_like_rotating_file_handler(workdir):
+    path = str(workdir / "transactions.log")
+    writer = LogWriter(path, max_bytes=1_000)
+    writer.start()
+    for i in range(30):
+        writer.write(b"x" * 99 + b"\n")
+    writer.close()
+    assert os.path.getsize(path) <= 1_000
+    assert os.path.getsize(path + ".1") <= 1_000
+
+
+def test_run_load_paces_to_the_rate(workdir):
+    path = str(workdir / "transactions.log")
+    generator = BatchGenerator(lambda: ROUTING, lambda: frozenset(), only("normal"), seed=2)
+    written, elapsed = run_load(generator, LogWriter(path, 0), rate=2_000, duration=0.5)
+    assert 900 <= written <= 1_200
+    assert 0.45 <= elapsed < 1.5
+    with open(path) as f:
+        assert sum(1 for _ in f) == written
+
+
+def test_columnar_blocks_read_back(workdir):
+    from txlog import ColumnarLogReader
+
+    path = str(workdir / "transactions.bin")
+    generator = ColumnarBatchGenerator(lambda: ROUTING, lambda: frozenset(), only("uk_bank_outage"), seed=3)
+    writer = ColumnarWriterThread(path, 0)
+    writer.start()
+    block, count = generator.generate(500, time.time(), 1_000.0)
+    writer.write(block)
+    writer.close()
+
+    records = np.concatenate([b.records for b in ColumnarLogReader(path).read_new_blocks()])
+    assert len(records) == count == 500
+    assert np.array_equal(records["latency_ms"], block["latency_ms"])
@@ -0,0 +1,81 @@
+import os
+
+from log_tail import LogTailer
+
+
+def append(path, *lines, end="\n"):
+    with open(path, "a") as f:
+        f.write("\n".join(lines) + end)
+
+
+def test_missing_file_reads_nothing(tmp_path):
+    assert LogTailer(str(tmp_path / "transactions.log")).read_new_lines() == []
+
+
+def test_cold_start_backfills_only_the_tail(tmp_path):
+    path = str(tmp_path / "transactions.log")
+    append(path, *(f"line {i}" for i in range(500)))
+    tailer = LogTailer(path, backfill_lines=100, block_size=256)  # Forces several backward blocks
+    assert tailer.read_new_lines() == [f"line {i}" for i in range(400, 500)]
+    assert tailer.bytes_read < os.path.getsize(path)
+
+
+def test_reads_only_appended_lines_and_holds_partial_ones(tmp_path):
+    path = str(tmp_path / "transactions.log")
+    append(path, "a", "b")
+    tailer = LogTailer(path)
+    assert tailer.read_new_lines() == ["a", "b"]
+    assert tailer.read_new_lines() == []
+
+    append(path, "c", "d-start", end="")
+    assert tailer.read_new_lines() == ["c"]
+    append(path, "-end")
+    assert tailer.read_new_lines() == ["d-start-end"]
+
+
+def test_rotation_drains_the_old_file_first(tmp_path):
+    path = str(tmp_path / "transactions.log")
+    append(path, "old 1")
+    tailer = LogTailer(path)
+    assert tailer.read_new_lines() == ["old 1"]
+
+    # Written after our last read, then rotated away like RotatingFileHandler does
+    append(path, "old 2", "old 3")
+    os.rename(path, path + ".1")
+    append(path, "new 1")
+    assert tailer.read_new_lines() == ["old 2", "old 3", "new 1"]
+    append(path, "new 2")
+    assert tailer.read_new_lines() == ["new 2"]
+
+
+def test_double_rotation_reads_the_whole_rotated_file(tmp_path):
+    path = str(tmp_path / "transactions.log")
+    append(path, "gone 1")
+    tailer = LogTailer(path)
+    tailer.read_new_lines()
+
+    os.rename(path, path + ".2")
+    append(path, "middle 1", "middle 2")
+    os.rename(path, path + ".1")
+    append(path, "new 1")
+    assert tailer.read_new_lines() == ["middle 1", "middle 2", "new 1"]
+
+
+def test_copytruncate_restarts_from_the_top(tmp_path):
+    path = str(tmp_path / "transactions.log")
+    append(path, "before 1", "before 2", "before 3")
+    tailer = LogTailer(path)
+    tailer.read_new_lines()
+
+    with open(path, "w") as f:  # Same inode, shorter file
+        f.write("after 1\n")
+    assert tailer.read_new_lines() == ["after 1"]
+
+
+def test_reset_starts_cold_again(tmp_path):
+    path = str(tmp_path / "transactions.log")
+    append(path, "a", "b")
+    tailer = LogTailer(path, backfill_lines=1)
+    assert tailer.read_new_lines() == ["b"]
+    tailer.reset()
+    assert tailer.read_new_lines() == ["b"]
@@ -0,0 +1,124 @@
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from metrics_window import (DEFAULT_TIME_WINDOWS, CountWindow, SlidingWindowMetrics, WindowCounters, classify,
+                            parse_time_windows, parse_timestamp)
+from snapshot import STATE_METRICS, ObserverSnapshot
+from transaction import Transaction
+
+START = 1_700_000_000.0
+
+
+def tx(offset, status="SUCCESS", error_code="00", region="UK", gateway="stripe", latency_ms=120):
+    stamp = datetime.fromtimestamp(START + offset, timezone.utc).isoformat() + "Z"
+    return Transaction(stamp, f"tx_{int(offset * 1000)}", gateway, region, status, error_code, latency_ms, 10.0)
+
+
+def random_stream(n, seed=5):
+    rng = random.Random(seed)
+    outcomes = [("SUCCESS", "00"), ("FAILED", "91"), ("FAILED", "401"), ("REJECTED", "429"), ("SUCCESS", "429")]
+    return [tx(i * 0.1, *rng.choice(outcomes), rng.choice(["US", "UK", "IN"]), rng.choice(["stripe", "adyen"]),
+               rng.choice([rng.randint(20, 3000), None]))
+            for i in range(n)]
+
+
+def recomputed(transactions):
+    """What the observer used to rebuild from scratch every cycle."""
+    counters = WindowCounters()
+    for t in transactions:
+        counters.add(classify(t))
+    return counters.to_metrics()
+
+
+def test_count_window_matches_a_full_recomputation():
+    stream = random_stream(1_000)
+    window = SlidingWindowMetrics(count_window=100)
+    for i, t in enumerate(stream, 1):
+        window.add(t)
+        if i % 97 == 0:
+            metrics = window.snapshot(now=t.ts)
+            assert metrics == recomputed(stream[max(0, i - 100):i])
+
+
+def test_classify_keys():
+    assert classify(tx(0, "FAILED", "91"))[1] == "UK_stripe_91"
+    assert classify(tx(0, "REJECTED", "05"))[2] == "SPAM_ATTACK_UK"
+    assert classify(tx(0, "SUCCESS", "429"))[2] == "SPAM_ATTACK_UK"  # Rate-limited counts as spam, not success
+    assert classify(tx(0, latency_ms=None))[3:] == (None, None)
+
+
+def test_time_windows_expire_old_buckets():
+    window = SlidingWindowMetrics(count_window=1_000, time_windows={"10s": 10, "1m": 60})
+    for i in range(120):
+        window.add(tx(i, "FAILED", "91"))
+    metrics = window.snapshot(now=START + 120)
+    assert metrics["total_count"] == 120
+    assert metrics["windows"]["10s"]["total_count"] == 10
+    assert metrics["windows"]["1m"]["total_count"] == 60
+    assert metrics["windows"]["1m"]["failure_clusters"] == {"UK_stripe_91": 60}
+
+    later = window.snapshot(now=START + 1_000)
+    assert later["windows"]["1m"]["total_count"] == 0
+    assert later["windows"]["1m"]["failure_clusters"] == {}
+    assert later["total_count"] == 120  # The count window doesn't age out
+
+
+def test_late_transactions_land_in_the_newest_bucket():
+    window = SlidingWindowMetrics(count_window=10, time_windows={"10s": 10})
+    window.add(tx(100))
+    window.add(tx(50))  # Out of order: would already be expired on its own
+    assert window.snapshot(now=START + 101)["windows"]["10s"]["total_count"] == 2
+
+
+def test_parse_timestamp_formats():
+    assert parse_timestamp("2023-11-14T22:13:20.250000+00:00Z") == START + 0.25
+    assert parse_timestamp("2023-11-14T22:13:20Z") == START
+    assert parse_timestamp("2023-11-14T22:13:20+00:00") == START
+    assert parse_timestamp("not a time") is None
+    assert parse_timestamp(None) is None
+
+
+def test_time_windows_are_opt_in():
+    window = SlidingWindowMetrics(count_window=10)
+    window.add(tx(0))
+    assert "windows" not in window.snapshot(now=START + 1)
+    assert not window.expire(now=START + 1_000)  # Nothing to age out
+
+    assert parse_time_windows("10s, 1m,5m") == DEFAULT_TIME_WINDOWS
+    assert parse_time_windows("") == {}
+    with pytest.raises(ValueError):
+        parse_time_windows("5 minutes")
+
+
+def test_time_windows_stay_out_of_graph_state():
+    window = SlidingWindowMetrics(count_window=10, time_windows=DEFAULT_TIME_WINDOWS)
+    for i in range(20):
+        window.add(tx(i, "FAILED", "91"))
+    metrics = window.snapshot(now=START + 20)
+    assert set(metrics["windows"]) == {"10s", "1m", "5m"}
+
+    snapshot = ObserverSnapshot(1, metrics, [], START + 20)
+    assert snapshot.metrics is metrics  # Still there for in-process readers
+    assert "windows" not in snapshot.update["metrics"]
+    assert set(snapshot.update["metrics"]) == set(STATE_METRICS)
+    assert snapshot.update["metrics"]["failure_clusters"] == {"UK_stripe_91": 10}
+
+
+def fields(t):
+    return t.region, t.gateway, t.status, t.error_code, t.latency_ms
+
+
+@pytest.mark.parametrize("size, batch", [(100, 7), (100, 100), (100, 250), (1, 3), (0, 5), (3_000, 500)])
+def test_batched_count_window_matches_one_at_a_time(size, batch):
+    stream = random_stream(2_500, seed=size + batch)
+    one, batched = CountWindow(size), CountWindow(size)
+    for i in range(0, len(stream), batch):
+        chunk = stream[i:i + batch]
+        for t in chunk:
+            one.add(classify(t))
+        batched.add_fields([fields(t) for t in chunk])
+        assert batched.counters.to_metrics() == one.counters.to_metrics()
+        assert len(batched) == len(one) == min(size, i + len(chunk))
+    assert batched.counters.to_metrics() == recomputed(stream[max(0, len(stream) - size):] if size else [])
@@ -0,0 +1,92 @@
+import prompt_builder
+from prompt_builder import (build_within_budget, clip, cluster_severity, estimate_tokens, terse_counts,
+                            terse_history, terse_latency, terse_policies)
+
+ERROR_CLASSES = {"91": "issuer_unavailable", "05": "do_not_honor", "51": "insufficient_funds"}
+
+
+def test_estimate_falls_back_to_four_chars_per_token(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "tiktoken", None)
+    monkeypatch.setattr(prompt_builder, "_encoding", None)
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1 and estimate_tokens("abcde") == 2
+
+
+def test_terse_counts_keeps_top_k_and_an_other_bucket():
+    counts = {"UK_stripe_91": 45, "US_stripe_05": 3, "IN_adyen_51": 2, "EU_adyen_91": 2, "US_adyen_05": 1}
+    assert terse_counts(counts, 2) == "UK_stripe_91=45, US_stripe_05=3, other(3)=5"
+    assert terse_counts(counts, 10).count("=") == 5
+    assert terse_counts({}, 3) == "none"
+    assert terse_counts({"a": 0.5}, 3) == "a=0.5"
+
+
+def test_cluster_severity_ranks_declines_below_outages():
+    counts = {"US_stripe_05": 30, "UK_stripe_91": 10, "IN_adyen_51": 20, "EU_adyen_xx": 8}
+    ranked = terse_counts(counts, 2, cluster_severity(ERROR_CLASSES))
+    assert ranked == "UK_stripe_91=10, EU_adyen_xx=8, other(2)=50"  # 30 and 20 declines weigh 7.5 and 5
+
+
+def test_terse_latency_orders_by_p99():
+    percentiles = {
+        "US_stripe": {"p50": 100, "p95": 200, "p99": 300, "count": 10},
+        "EU_adyen": {"p50": 320, "p95": 7800, "p99": 8900, "count": 40},
+        "UK_stripe": {"p50": 90, "p95": 150, "p99": 250, "count": 5},
+    }
+    assert terse_latency(percentiles, 1) == "EU_adyen p50/p95/p99=320/7800/8900 n=40; other(2 groups) n=15"
+    assert terse_latency({}, 3) == "none"
+
+
+def test_terse_policies_and_history():
+    policies = [{"action": "BLOCK_IP_RANGE", "region": "US"}, {"action": "BLOCK_IP_RANGE", "region": "IN"},
+                {"action": "BLOCK_IP_RANGE", "region": "US"}]
+    assert terse_policies(policies) == "BLOCK_IP_RANGE: IN, US"
+    assert terse_policies([]) == "none"
+
+    history = ["ROLLUP: 40 earlier actions"] + [f"action {i}" for i in range(10)]
+    assert terse_history(history, last=2) == "ROLLUP: 40 earlier actions / action 8 / action 9"
+    assert terse_history([]) == "none"
+    assert clip("x" * 50, 10) == "xxxxxxx..." and clip("short", None) == "short"
+
+
+def test_budget_halves_k_before_clipping(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "estimate_tokens", len)
+    calls = []
+
+    def render(k, section_chars):
+        calls.append((k, section_chars))
+        return "x" * (k * 10)
+
+    prompt, tokens = build_within_budget(render, budget=25, k=8)
+    assert calls == [(8, None), (4, None), (2, None)]
+    assert tokens == 20 == len(prompt)
+
+
+def test_budget_clips_sections_then_gives_up(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "estimate_tokens", len)
+    calls = []
+
+    def render(k, section_chars):
+        calls.append((k, section_chars))
+        return "fixed" * 20 + clip("y" * 1000, section_chars)
+
+    prompt, tokens = build_within_budget(render, budget=10, k=2)
+    assert calls == [(2, None), (1, None), (1, 400), (1, 200), (1, 100), (1, 50), (1, 25)]
+    assert tokens == len(prompt) > 10  # The fixed text alone is over budget: best effort
+
+
+def test_reasoner_prompt_fits_its_budget_on_a_large_incident(agent):
+    clusters = {f"{region}_{gw}_{code}": 5 for region in ("US", "UK", "IN", "EU") for gw in ("stripe", "adyen")
+                for code in ("05", "51", "14", "54", "61", "65", "96", "N7")}
+    clusters["UK_stripe_91"] = 45
+    latency = {f"{r}_{g}": {"p50": 100, "p95": 200, "p99": 300 + i, "count": 10}
+               for i, (r, g) in enumerate((r, g) for r in ("US", "UK", "IN", "EU") for g in ("stripe", "adyen"))}
+    metrics = {"failure_clusters": clusters, "security_alerts": {}, "latency_percentiles": latency,
+               "global_success_rate": 0.8, "total_count": 1000}
+
+    _, messages = agent.prepare_reasoner({"metrics": metrics})
+    prompt = messages[-1].content
+    assert estimate_tokens(prompt) <= prompt_builder.REASONER_TOKEN_BUDGET
+    lines = prompt.split("\n")
+    clusters_line = lines[next(i for i, line in enumerate(lines) if line.startswith("DATA SNAPSHOT")) + 1]
+    assert clusters_line.startswith("UK_stripe_91=45")
+    assert "other(" in prompt
@@ -0,0 +1,61 @@
+from reducers import ROLLUP_PREFIX, action_name, bounded_add, bounded_history, format_rollup, parse_rollup
+
+
+def action(tool, i):
+    return f"ACTION: {tool} | ARGS: {{'n': {i}}}"
+
+
+def test_bounded_add_keeps_the_newest_entries():
+    reducer = bounded_add(3)
+    assert reducer(None, ["a"]) == ["a"]
+    assert reducer(["a", "b"], ["c", "d", "e"]) == ["c", "d", "e"]
+    assert reducer(["a"], None) == ["a"]
+
+
+def test_history_under_the_cap_is_untouched():
+    reducer = bounded_history(5)
+    history = [action("update_routing_tool", i) for i in range(5)]
+    assert reducer(history[:3], history[3:]) == history
+
+
+def test_evicted_actions_are_rolled_up_at_the_head():
+    reducer = bounded_history(4)
+    history = []
+    for i in range(10):
+        history = reducer(history, [action("update_routing_tool" if i % 3 else "fraud_mitigation_tool", i)])
+
+    assert len(history) == 4
+    assert history[0] == f"{ROLLUP_PREFIX} 7 earlier actions | fraud_mitigation_tool=3, update_routing_tool=4"
+    assert history[1:] == [action("update_routing_tool", 7), action("update_routing_tool", 8),
+                           action("fraud_mitigation_tool", 9)]
+
+
+def test_rollup_counts_accumulate_across_merges():
+    reducer = bounded_history(3)
+    history = []
+    for i in range(100):
+        history = reducer(history, [action("update_routing_tool", i)])
+    assert len(history) == 3
+    assert sum(parse_rollup(history[0]).values()) + 2 == 100
+    assert sum(entry.startswith(ROLLUP_PREFIX) for entry in history) == 1
+
+
+def test_without_rollup_history_is_a_ring_buffer():
+    reducer = bounded_history(2, rollup=False)
+    assert reducer([action("a", 1)], [action("b", 2), action("c", 3)]) == [action("b", 2), action("c", 3)]
+
+
+def test_rollup_round_trip():
+    counts = parse_rollup(format_rollup(parse_rollup("ROLLUP: 5 earlier actions | a=2, b=3")))
+    assert counts == {"a": 2, "b": 3}
+    assert action_name("ACTION: update_routing_tool | ARGS: {}") == "update_routing_tool"
+    assert action_name("| ARGS: {}") == "unknown"
+
+
+def test_agent_state_channels_are_bounded(agent):
+    reducer = agent.PaymentAgentState.__annotations__["reasoning_log"].__metadata__[0]
+    log = []
+    for i in range(agent.REASONING_LOG_CAP + 50):
+        log = reducer(log, [f"entry {i}"])
+    assert len(log) == agent.REASONING_LOG_CAP
+    assert log[-1] == f"entry {agent.REASONING_LOG_CAP + 49}"
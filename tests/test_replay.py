@@ -0,0 +1,100 @@
+import random
+
+import pytest
+
+from bench import synthetic_line
+from replay import IncidentTracker, ReplayClock, ReplaySource, capture_files, iter_capture, replay
+from rules import RuleEngine
+
+START = 1_700_000_000.0
+
+
+@pytest.fixture
+def tracker():
+    return IncidentTracker(RuleEngine.from_file().error_code_classes, gap=30, min_events=5)
+
+
+def write_capture(path, phases, rate=50):
+    """phases: [(seconds, incident)] written back to back from START."""
+    rng = random.Random(1)
+    ts = START
+    with open(path, "w") as f:
+        f.write("INFO: simulator started\n")  # Non-JSON lines are skipped
+        for seconds, incident in phases:
+            for _ in range(int(seconds * rate)):
+                f.write("INFO: " + synthetic_line(rng, ts, incident))
+                ts += 1 / rate
+
+
+def test_rotated_segment_is_read_first(workdir):
+    path = str(workdir / "transactions.log")
+    write_capture(path + ".1", [(1, "none")])
+    write_capture(path, [(1, "none")])
+    assert capture_files(path) == [path + ".1", path]
+    stamps = [ts for ts, _, _ in iter_capture(capture_files(path))]
+    assert len(stamps) == 100 and stamps[0] == START
+
+
+def test_incident_keys(tracker):
+    assert tracker.incident_key({"status": "FAILED", "error_code": "91", "region": "UK", "gateway": "stripe"}) \
+        == "UK_stripe_91"
+    assert tracker.incident_key({"status": "FAILED", "error_code": "51", "region": "UK", "gateway": "stripe"}) is None
+    assert tracker.incident_key({"status": "REJECTED", "error_code": "429", "region": "IN"}) == "SPAM_ATTACK_IN"
+    assert tracker.incident_key({"status": "SUCCESS", "latency_ms": 5_000, "region": "EU", "gateway": "adyen"}) \
+        == "LATENCY_EU_adyen"
+
+
+def test_only_the_incident_the_agent_named_is_marked(tracker):
+    for i in range(10):
+        tracker.observe(START + i, {"status": "FAILED", "error_code": "91", "region": "UK", "gateway": "stripe"})
+        tracker.observe(START + i, {"status": "REJECTED", "error_code": "429", "region": "US"})
+
+    tracker.mark(START + 10, "detected_ts", hypothesis="Technical Infrastructure Issue on stripe in UK")
+    tracker.mark(START + 11, "proposed_ts", action="fraud_mitigation_tool",
+                 args={"action_type": "BLOCK_IP_RANGE", "target_region": "US"})
+    tracker.mark(START + 12, "proposed_ts", action="update_routing_tool", args={"region": "UK", "gateway": "stripe"})
+
+    rows = {row["key"]: row for row in tracker.report()}
+    assert rows["UK_stripe_91"]["time_to_detection_s"] == 10
+    assert rows["UK_stripe_91"]["time_to_proposal_s"] is None  # Rerouting to the failing gateway isn't a fix
+    assert rows["SPAM_ATTACK_US"]["time_to_detection_s"] is None
+    assert rows["SPAM_ATTACK_US"]["time_to_proposal_s"] == 11
+
+
+def test_gaps_split_incidents_and_blips_are_ignored(tracker):
+    outage = {"status": "FAILED", "error_code": "91", "region": "UK", "gateway": "stripe"}
+    for i in range(6):
+        tracker.observe(START + i, outage)
+    for i in range(6):
+        tracker.observe(START + 100 + i, outage)
+    tracker.observe(START + 300, outage)
+    assert [row["start"] for row in tracker.report()] == [START, START + 100]
+
+
+def test_source_releases_lines_as_the_clock_advances(workdir, tracker):
+    path = str(workdir / "transactions.log")
+    write_capture(path, [(2, "none")])
+    clock = ReplayClock(START, speed=0)
+    source = ReplaySource(iter_capture([path]), clock, tracker)
+    assert len(source.read_new_lines()) == 1
+    clock.wait_until(START + 1)
+    assert len(source.read_new_lines()) == 50
+    clock.wait_until(START + 10)
+    assert len(source.read_new_lines()) == 49
+    assert source.exhausted
+
+
+def test_replay_detects_and_acts_on_an_outage(agent, workdir):
+    path = str(workdir / "capture.log")
+    write_capture(path, [(30, "none"), (60, "outage")])
+    result = replay(path, speed=0, cycle_seconds=5)
+
+    assert result["transactions"] == 90 * 50
+    assert result["cycles"] >= 18
+    outage = next(row for row in result["incidents"] if row["key"] == "UK_stripe_91")
+    assert outage["time_to_detection_s"] is not None and outage["time_to_detection_s"] <= 10
+    assert outage["time_to_action_s"] is not None
+    assert outage["action"] == "update_routing_tool"
+    # The executed reroute landed in replay's scratch dir, not here
+    from config_cache import routing_store
+    assert routing_store.get()["UK"] == "stripe"
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import security_policies
+from config_cache import routing_store
+from rules import NOISE_CLASSES, RuleEngine
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine.from_file()
+
+
+def metrics(clusters=None, alerts=None, total=100):
+    return {"failure_clusters": clusters or {}, "security_alerts": alerts or {}, "total_count": total,
+            "global_success_rate": 0.5, "latency_percentiles": {}}
+
+
+def test_issuer_outage_fails_over_to_the_other_gateway(engine):
+    match = engine.evaluate(metrics({"UK_stripe_91": 30, "US_stripe_05": 40}))
+    assert match.rule == "issuer_outage_failover"
+    assert match.tool == "update_routing_tool"
+    assert match.args == {"region": "UK", "gateway": "adyen"}
+    assert "issuer_unavailable" in match.hypothesis
+
+
+def test_spam_burst_blocks_the_region(engine):
+    match = engine.evaluate(metrics(alerts={"SPAM_ATTACK_IN": 25}))
+    assert (match.tool, match.args) == ("fraud_mitigation_tool", {"action_type": "BLOCK_IP_RANGE", "target_region": "IN"})
+
+
+def test_customer_declines_and_small_clusters_do_not_fire(engine):
+    assert engine.evaluate(metrics({"UK_stripe_05": 60, "UK_stripe_51": 30})) is None
+    assert engine.evaluate(metrics({"UK_stripe_91": 9})) is None  # Below min_count
+    assert engine.evaluate(metrics({"UK_stripe_91": 12}, total=1_000)) is None  # Below min_share
+    assert engine.evaluate(metrics()) is None
+    assert engine.evaluate({"total_count": 0}) is None
+
+
+def test_exactly_one_action_or_nothing(engine):
+    # Two different actions: ambiguous, left to the LLM
+    assert engine.evaluate(metrics({"UK_stripe_91": 30}, {"SPAM_ATTACK_US": 30})) is None
+    assert engine.evaluate(metrics({"UK_stripe_91": 30, "US_stripe_503": 30})) is None
+    # Several clusters backing the same action still count as one
+    match = engine.evaluate(metrics({"UK_stripe_91": 30, "UK_stripe_503": 20}))
+    assert match.args == {"region": "UK", "gateway": "adyen"}
+
+
+def test_actions_already_in_effect_are_skipped(engine):
+    routing_store.update(lambda config: {**config, "UK": "adyen"})
+    assert engine.evaluate(metrics({"UK_stripe_91": 30})) is None
+
+    security_policies.add_policy("BLOCK_IP_RANGE", "IN")
+    assert engine.evaluate(metrics(alerts={"SPAM_ATTACK_IN": 25})) is None
+    # With the block in place the remaining action is unambiguous again
+    match = engine.evaluate(metrics({"US_stripe_91": 30}, {"SPAM_ATTACK_IN": 25}))
+    assert match.args == {"region": "US", "gateway": "adyen"}
+
+
+def test_noise_classes_match_rules_json(workdir):
+    with open(workdir / "rules.json") as f:
+        classes = set(json.load(f)["error_code_classes"].values())
+    assert NOISE_CLASSES <= classes
@@ -0,0 +1,142 @@
+import asyncio
+import time
+import uuid
+
+import httpx
+import openai
+import pytest
+
+from rate_limit import LLMLimiter, is_rate_limited
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "http://127.0.0.1:9/v1/chat/completions")
+    return openai.RateLimitError("slow down", response=httpx.Response(429, request=request), body=None)
+
+
+def unlimited(**kwargs):
+    return LLMLimiter(**{"max_concurrency": 100, "requests_per_minute": 1e9, "burst": 100, **kwargs})
+
+
+def test_is_rate_limited():
+    assert is_rate_limited(rate_limit_error())
+    assert not is_rate_limited(ValueError("nope"))
+
+    class StatusError(Exception):
+        status_code = 429
+    assert is_rate_limited(StatusError())
+
+
+def test_concurrency_is_capped():
+    limiter = unlimited(max_concurrency=3)
+    in_flight, peak = 0, 0
+
+    async def call():
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return "ok"
+
+    async def run():
+        return await asyncio.gather(*(limiter.call(call) for _ in range(12)))
+
+    assert asyncio.run(run()) == ["ok"] * 12
+    assert peak == 3
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    limiter = LLMLimiter(max_concurrency=100, requests_per_minute=600, burst=3)  # 10/s after the burst
+
+    async def call():
+        return time.monotonic()
+
+    async def run():
+        started = time.monotonic()
+        stamps = await asyncio.gather(*(limiter.call(call) for _ in range(6)))
+        return [stamp - started for stamp in stamps]
+
+    offsets = sorted(asyncio.run(run()))
+    assert offsets[2] < 0.05
+    assert 0.25 <= offsets[5] < 0.6
+
+
+def test_429s_are_retried_with_backoff():
+    limiter = unlimited(base_delay=0.001, max_retries=4)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise rate_limit_error()
+        return "ok"
+
+    assert asyncio.run(limiter.call(flaky)) == "ok"
+    assert len(attempts) == 3 and limiter.throttled == 2
+
+
+def test_other_errors_and_exhausted_retries_propagate():
+    limiter = unlimited(base_delay=0.001, max_retries=2)
+    attempts = []
+
+    async def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    async def always_429():
+        attempts.append(1)
+        raise rate_limit_error()
+
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.call(broken))
+    assert len(attempts) == 1
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(limiter.call(always_429))  # A second event loop: primitives are rebuilt for it
+    assert len(attempts) == 1 + 3
+
+
+def test_scheduler_runs_every_thread_on_its_interval(agent, write_log):
+    from scheduler import AgentScheduler
+
+    write_log(200, "none")
+    logs = []
+    scheduler = AgentScheduler(tick=0.01, jitter=0.0, on_log=lambda thread, entry: logs.append((thread, entry)))
+    fast, slow = f"fast_{uuid.uuid4().hex}", f"slow_{uuid.uuid4().hex}"
+    scheduler.add_thread(fast, interval=0.1)
+    scheduler.add_thread(slow, interval=10)
+    scheduler.threads[slow].next_run = time.monotonic()
+
+    async def run():
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.6)
+        scheduler.stop()
+        await task
+
+    asyncio.run(run())
+    assert scheduler.threads[fast].cycles >= 3
+    assert scheduler.threads[slow].cycles == 1
+    assert not any(s.errors for s in scheduler.threads.values())
+    assert any(thread == slow and entry.startswith("[OBSERVER]") for thread, entry in logs)
+
+
+def test_scheduler_leaves_pending_approvals_alone(agent, write_log):
+    from scheduler import AgentScheduler
+
+    write_log(200, "spam")
+    scheduler = AgentScheduler(tick=0.01, jitter=0.0, on_log=lambda thread, entry: None)
+    merchant = f"merchant_{uuid.uuid4().hex}"
+    scheduler.add_thread(merchant, interval=0.05)
+    scheduler.threads[merchant].next_run = time.monotonic()
+
+    async def run():
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.4)
+        scheduler.stop()
+        await task
+        return await agent.app.aget_state({"configurable": {"thread_id": merchant}})
+
+    snapshot = asyncio.run(run())
+    assert scheduler.threads[merchant].cycles == 1  # Later ticks wait for a human
+    assert "sentry" in snapshot.next
@@ -0,0 +1,93 @@
+import json
+import time
+from datetime import datetime
+
+import security_policies
+from security_policies import PolicyIndex, add_policy, expires_at, policy_list
+
+NOW = 1_800_000_000.0
+
+
+def block(region, expiry, action="BLOCK_IP_RANGE"):
+    return {"action": action, "region": region, "active": True, "timestamp": "2027-01-15T08:00:00", "expires_at": expiry}
+
+
+def test_policy_list_handles_a_single_dict_and_junk():
+    assert policy_list(block("US", NOW)) == [block("US", NOW)]
+    assert policy_list([block("US", NOW), "junk", 3, None]) == [block("US", NOW)]
+    assert policy_list("junk") == [] and policy_list(None) == []
+
+
+def test_legacy_policies_expire_ttl_after_their_timestamp():
+    legacy = {"action": "BLOCK_IP_RANGE", "region": "IN", "active": True, "timestamp": "2027-01-15T08:00:00"}
+    started = datetime.fromisoformat(legacy["timestamp"]).timestamp()
+    assert expires_at(legacy, ttl=60) == started + 60
+    assert expires_at({**legacy, "expires_at": NOW}) == NOW
+    assert expires_at({**legacy, "active": False}) == float("-inf")
+    assert expires_at({**legacy, "timestamp": "yesterday"}) == float("inf")  # Unparseable: kept until replaced
+
+
+def test_blocks_lapse_at_expiry():
+    index = PolicyIndex([block("US", NOW + 10), block("IN", NOW + 20), block("UK", NOW + 5, action="RATE_LIMIT")])
+    assert index.is_blocked("US", NOW) and index.is_blocked("IN", NOW)
+    assert not index.is_blocked("UK", NOW)  # Not a block
+    assert index.blocked_regions(NOW) == {"US", "IN"}
+
+    assert not index.is_blocked("US", NOW + 10)
+    assert index.blocked_regions(NOW + 10) == {"IN"}
+    assert index.blocked_regions(NOW + 20) == frozenset()
+
+
+def test_global_block_covers_every_region():
+    index = PolicyIndex([block("global_default", NOW + 10)])
+    assert index.is_blocked("EU", NOW) and not index.is_blocked("EU", NOW + 11)
+
+
+def test_duplicates_keep_the_latest_expiry():
+    index = PolicyIndex([block("US", NOW + 10), block("US", NOW + 50), block("US", NOW + 30)])
+    assert len(index.active(NOW)) == 1
+    assert index.is_blocked("US", NOW + 40)
+
+
+def test_digest_drops_expired_policies():
+    index = PolicyIndex([block("US", NOW + 10), block("IN", NOW + 20)])
+    assert index.digest(NOW) == "BLOCK_IP_RANGE: IN, US"
+
+    assert index.digest(NOW + 15) == "BLOCK_IP_RANGE: IN"
+    assert index.digest(NOW + 25) == "none"
+
+
+def test_add_policy_dedupes_and_extends(workdir):
+    policy, created, count = add_policy("BLOCK_IP_RANGE", "US", ttl=60)
+    assert created and count == 1
+    first_expiry = policy["expires_at"]
+
+    again, created, count = add_policy("BLOCK_IP_RANGE", "US", ttl=600)
+    assert not created and count == 1
+    assert again["id"] == policy["id"] and again["expires_at"] > first_expiry
+
+    # A shorter TTL never shortens a rule that is already active
+    _, created, _ = add_policy("BLOCK_IP_RANGE", "US", ttl=1)
+    assert not created
+    assert security_policies.index().by_key[("US", "BLOCK_IP_RANGE")][0] == again["expires_at"]
+
+    _, created, count = add_policy("BLOCK_IP_RANGE", "IN", ttl=60)
+    assert created and count == 2
+    assert security_policies.blocked_regions() == {"US", "IN"}
+
+
+def test_add_policy_drops_expired_and_junk_entries(workdir):
+    stale = block("EU", time.time() - 1)
+    with open("security_policy.json", "w") as f:
+        json.dump([stale, "junk", block("UK", time.time() + 600)], f)
+    assert security_policies.is_region_blocked("UK") and not security_policies.is_region_blocked("EU")
+
+    _, created, count = add_policy("BLOCK_IP_RANGE", "EU", ttl=60)
+    assert created and count == 2
+    with open("security_policy.json") as f:
+        assert sorted(p["region"] for p in json.load(f)) == ["EU", "UK"]
+
+
+def test_no_file_means_no_policies(workdir):
+    assert security_policies.digest() == "none"
+    assert not security_policies.is_region_blocked("US")
@@ -0,0 +1,94 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config_cache import routing_store
+
+
+@pytest.fixture
+def client(agent):
+    import server
+    return TestClient(server.api)
+
+
+def thread_id():
+    return f"test_{uuid.uuid4().hex}"
+
+
+def test_health_check(client):
+    assert client.get("/").json() == {"status": "Agent is online"}
+
+
+def test_outage_is_rerouted_without_approval(client, write_log):
+    write_log(200, "outage")
+    thread = thread_id()
+
+    logs = client.post("/run_cycle", json={"thread_id": thread}).json()["logs"]
+    assert any(entry.startswith("[OBSERVER]") for entry in logs)
+    assert any("issuer_outage_failover" in entry for entry in logs)
+    assert any(entry.startswith("[EXECUTOR]") for entry in logs)
+    assert routing_store.get()["UK"] == "adyen"
+    assert client.get("/agent_state", params={"thread_id": thread}).json()["status"] == "IDLE"
+
+
+def test_spam_block_waits_for_approval_then_executes(client, write_log):
+    import security_policies
+
+    write_log(200, "spam")
+    thread = thread_id()
+    client.post("/run_cycle", json={"thread_id": thread})
+
+    state = client.get("/agent_state", params={"thread_id": thread}).json()
+    assert state["status"] == "WAITING_FOR_APPROVAL"
+    assert state["tool"] == "fraud_mitigation_tool"
+    assert not security_policies.blocked_regions()
+
+    approved = client.post("/approve_action", json={"thread_id": thread, "approved": True}).json()
+    assert approved["status"] == "EXECUTED"
+    assert security_policies.blocked_regions()
+    assert client.get("/agent_state", params={"thread_id": thread}).json()["status"] == "IDLE"
+
+
+def test_rejecting_a_block_deploys_nothing(client, write_log):
+    import security_policies
+
+    write_log(200, "spam")
+    thread = thread_id()
+    client.post("/run_cycle", json={"thread_id": thread})
+
+    rejected = client.post("/approve_action", json={"thread_id": thread, "approved": False}).json()
+    assert rejected["status"] == "REJECTED"
+    assert not security_policies.blocked_regions()
+
+
+def test_quiet_log_goes_through_the_llm_and_stays_idle(client, agent, write_log):
+    write_log(200, "none")
+    thread = thread_id()
+    logs = client.post("/run_cycle", json={"thread_id": thread}).json()["logs"]
+    assert any("Normal operations" in entry for entry in logs)
+    assert client.get("/agent_state", params={"thread_id": thread}).json()["status"] == "IDLE"
+    assert agent.llm.calls >= 1
+
+
+def test_concurrent_cycles_do_not_block_each_other(agent, write_log):
+    import asyncio
+
+    import httpx
+    import server
+
+    write_log(200, "none")
+    agent.llm.latency = 0.2
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.api)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            started = asyncio.get_running_loop().time()
+            replies = await asyncio.gather(*(http.post("/run_cycle", json={"thread_id": thread_id()})
+                                             for _ in range(5)))
+            return replies, asyncio.get_running_loop().time() - started
+
+    replies, elapsed = asyncio.run(run())
+    assert all(reply.status_code == 200 for reply in replies)
+    # Five cycles of two 0.2s LLM calls each, run serially, would take 2s
+    assert elapsed < 1.5
@@ -0,0 +1,65 @@
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(agent):
+    import server
+    return TestClient(server.api)
+
+
+def read_events(client, **params):
+    events = []
+    with client.stream("GET", "/run_cycle/stream", params=params) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        frame = {}
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                frame["event"] = line[len("event: "):]
+            elif line.startswith("data: "):
+                frame["data"] = json.loads(line[len("data: "):])
+            elif not line and frame:
+                events.append((frame["event"], frame["data"]))
+                frame = {}
+    return events
+
+
+def test_sse_frame():
+    from server import sse
+    assert sse("log", "[OBSERVER] hi") == 'event: log\ndata: "[OBSERVER] hi"\n\n'
+
+
+def test_stream_sends_one_log_per_node_then_done(client, write_log):
+    write_log(200, "none")
+    thread = f"test_{uuid.uuid4().hex}"
+    events = read_events(client, thread_id=thread)
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == "done" and events[-1][1] == {"thread_id": thread}
+    logs = [data for kind, data in events if kind == "log"]
+    assert [entry.split("]")[0] for entry in logs] == ["[OBSERVER", "[RULE_ENGINE", "[REASONER", "[DECIDER"]
+
+
+def test_stream_announces_a_pending_approval(client, write_log):
+    write_log(200, "spam")
+    events = read_events(client, thread_id=f"test_{uuid.uuid4().hex}")
+    kinds = [kind for kind, _ in events]
+    assert kinds[-2:] == ["approval", "done"]
+    approval = events[-2][1]
+    assert approval["tool"] == "fraud_mitigation_tool"
+    assert json.loads(approval["proposal"])["action_type"] == "BLOCK_IP_RANGE"
+
+
+def test_stream_reports_graph_errors(client, monkeypatch):
+    import server
+
+    class Broken:
+        async def astream(self, *args, **kwargs):
+            raise RuntimeError("boom")
+            yield
+
+    monkeypatch.setattr(server, "app", Broken())
+    assert read_events(client, thread_id="broken") == [("error", {"detail": "boom"})]
@@ -0,0 +1,134 @@
+import threading
+from datetime import datetime, timezone
+
+from metrics_window import DEFAULT_TIME_WINDOWS
+from snapshot import LineWindow, ObserverSnapshotService
+from transaction import Transaction, encode_transaction
+
+START = 1_700_000_000.0
+
+
+class CountingSource:
+    def __init__(self):
+        self.lines = []
+        self.reads = 0
+        self.bytes_read = 0
+
+    def append(self, n, offset=0.0, status="SUCCESS", error_code="00"):
+        for i in range(n):
+            stamp = datetime.fromtimestamp(START + offset + i * 0.01, timezone.utc).isoformat() + "Z"
+            self.lines.append(encode_transaction(Transaction(stamp, f"tx_{i}", "stripe", "UK", status, error_code, 100, 5.0)))
+
+    def read_new_lines(self):
+        self.reads += 1
+        lines, self.lines = self.lines, []
+        self.bytes_read += sum(len(line) + 1 for line in lines)
+        return lines
+
+
+class Clock:
+    def __init__(self, now=START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def service(source, clock, min_interval=0.0, time_windows=None):
+    return ObserverSnapshotService(LineWindow(source, 50, time_windows=time_windows), clock=clock,
+                                   min_interval=min_interval)
+
+
+def test_version_bumps_only_on_new_transactions():
+    source, clock = CountingSource(), Clock(START + 1)
+    observer = service(source, clock)
+    assert observer.get().version == 0
+
+    source.append(10)
+    first = observer.get()
+    assert first.version == 1 and first.total == 10
+    assert observer.get() is first  # Nothing new
+
+    clock.now = START + 400
+    assert observer.get() is first  # No time windows: an idle log publishes nothing
+
+
+def test_idle_time_window_expiry_keeps_the_version():
+    source, clock = CountingSource(), Clock(START + 1)
+    observer = service(source, clock, time_windows=DEFAULT_TIME_WINDOWS)
+    source.append(10)
+    first = observer.get()
+    assert first.metrics["windows"]["5m"]["total_count"] == 10
+
+    for step in range(1, 6):
+        clock.now = START + 60 * step + 1  # Every minute some bucket ages out
+        expired = observer.get()
+        assert expired.version == first.version
+        assert expired.update["metrics"] == first.update["metrics"]
+    assert expired.metrics["windows"]["5m"]["total_count"] == 0  # Still fresh for direct readers
+
+    source.append(1, offset=400, status="FAILED", error_code="91")
+    assert observer.get().version == first.version + 1
+
+
+def test_new_lines_with_unchanged_metrics_keep_the_version():
+    source, clock = CountingSource(), Clock(START + 1)
+    observer = service(source, clock)
+    source.append(50)
+    first = observer.get()
+    source.append(5, offset=1)  # A full window of successes stays a full window of successes
+    assert observer.get().version == first.version
+
+
+def test_min_interval_serves_the_cached_snapshot():
+    source, clock = CountingSource(), Clock(START + 1)
+    observer = service(source, clock, min_interval=60)
+    source.append(5)
+    observer.refresh()
+    reads = source.reads
+    source.append(5)
+    assert observer.get().total == 5
+    assert source.reads == reads
+    assert not observer.stale()
+
+
+def test_concurrent_readers_share_one_parse():
+    source, clock = CountingSource(), Clock(START + 1)
+    observer = service(source, clock, min_interval=0.5)
+    source.append(100)
+    barrier = threading.Barrier(16)
+    seen = []
+
+    def read():
+        barrier.wait()
+        seen.append(observer.get())
+
+    threads = [threading.Thread(target=read) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(snapshot) for snapshot in seen}) == 1
+    assert source.reads == 1
+
+
+def test_threads_that_saw_a_version_get_a_no_op_update(agent, write_log):
+    write_log(50, "none")
+    snapshot = agent.observer_service.refresh()
+    assert agent.snapshot_update({}, snapshot) is snapshot.update
+    update = agent.snapshot_update({"observer_version": snapshot.version}, snapshot)
+    assert set(update) == {"reasoning_log"}
+    assert "No new transactions" in update["reasoning_log"][0]
+
+
+def test_attach_starts_from_an_empty_window():
+    source, clock = CountingSource(), Clock(START + 1)
+    observer = service(source, clock)
+    source.append(10)
+    assert observer.get().total == 10
+
+    other = CountingSource()
+    observer.attach(LineWindow(other, 50), clock=clock)
+    assert observer.current().version == 0 and observer.current().total == 0
+    other.append(3)
+    assert observer.get().total == 3
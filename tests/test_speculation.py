@@ -0,0 +1,77 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench import ScriptedLLM
+from instrumentation import SPECULATION
+from rate_limit import LLMLimiter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OUTAGE = {"failure_clusters": {"UK_stripe_91": 45}, "security_alerts": {}, "latency_percentiles": {},
+          "global_success_rate": 0.6, "total_count": 120}
+QUIET = {"failure_clusters": {"US_stripe_05": 2}, "security_alerts": {}, "latency_percentiles": {},
+         "global_success_rate": 0.98, "total_count": 120}
+
+
+class CountingLLM(ScriptedLLM):
+    """Slow scripted LLM that counts the requests it was sent."""
+
+    started = 0
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        self.started += 1
+        return await super().ainvoke(prompt, *args, **kwargs)
+
+
+def speculations(winner):
+    return SPECULATION.values.get((winner,), 0.0)
+
+
+def test_fired_rule_never_starts_an_llm_call(agent, monkeypatch):
+    llm = CountingLLM(latency=5.0)
+    limiter = LLMLimiter(max_concurrency=4, requests_per_minute=1, burst=5)
+    monkeypatch.setattr(agent, "llm", llm)
+    monkeypatch.setattr(agent, "llm_limiter", limiter)
+    before = speculations("rule")
+
+    async def cycles():
+        return [await agent.aspeculate_node({"metrics": OUTAGE, "action_history": []}) for _ in range(5)]
+
+    started = time.perf_counter()
+    updates = asyncio.run(cycles())
+    assert time.perf_counter() - started < 1.0
+
+    assert all(update["fast_path"] and update["next_action"] == "update_routing_tool" for update in updates)
+    assert llm.started == 0
+    assert limiter._tokens == 5  # The bucket is still full for the next real call
+    assert speculations("rule") == before + 5
+
+
+def test_no_rule_uses_the_llm_result(agent):
+    before = speculations("llm")
+    update = asyncio.run(agent.aspeculate_node({"metrics": QUIET, "action_history": []}))
+    assert update["fast_path"] is None
+    assert update["reasoning_log"][0].startswith("RuleEngine: No clear-cut signature")
+    assert "Normal operations" in update["current_hypothesis"]
+    assert speculations("llm") == before + 1
+
+
+def test_sync_speculation_never_makes_a_wasted_call(agent):
+    before = speculations("rule")
+    update = agent.speculate_node({"metrics": OUTAGE, "action_history": []})
+    assert json.loads(update["decision_args"]) == {"region": "UK", "gateway": "adyen"}
+    assert agent.llm.calls == 0
+    assert speculations("rule") == before + 1
+
+
+def test_bench_speculative_graph(workdir):
+    out = workdir / "results.json"
+    subprocess.run([sys.executable, os.path.join(ROOT, "bench.py"), "--sizes", "300", "--threads", "1",
+                    "--cycles", "2", "--incident", "none", "--speculative", "--out", str(out)],
+                   check=True, cwd=workdir, capture_output=True, timeout=120)
+    nodes = set(json.loads(out.read_text())["log_sizes"][0]["nodes"])
+    assert nodes == {"observer", "speculate", "decider"}
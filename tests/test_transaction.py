@@ -0,0 +1,90 @@
+import json
+
+import transaction
+from transaction import FIELDS, Transaction, decode_line, decode_object, encode_transaction
+
+LINE = ('{"timestamp": "2023-11-14T22:13:20.250000+00:00Z", "transaction_id": "tx_42", "gateway": "stripe", '
+        '"region": "UK", "status": "FAILED", "error_code": "91", "latency_ms": 180.5, "amount": 12.5}')
+
+
+def test_decode_line():
+    tx = decode_line("2024-01-01 INFO " + LINE + "\n")
+    assert (tx.region, tx.gateway, tx.status, tx.error_code, tx.latency_ms) == ("UK", "stripe", "FAILED", "91", 180.5)
+    assert tx.ts == 1_700_000_000.25
+
+
+def test_decode_rejects_junk():
+    assert decode_line("no json here") is None
+    assert decode_line('{"truncated": ') is None
+    assert decode_object("[1, 2]") is None
+    assert decode_object('prefix {"a": 1}') == {"a": 1}
+
+
+def test_defaults_and_type_normalization():
+    tx = Transaction.from_dict({"error_code": 91, "latency_ms": "slow"})
+    assert tx.error_code == "91"
+    assert tx.latency_ms is None
+    assert (tx.region, tx.gateway, tx.status) == ("UNK", "UNK", "UNK")
+    assert tx.ts is None
+
+
+def test_encode_round_trip():
+    data = json.loads(LINE)
+    tx = Transaction.from_dict(data)
+    assert tx.to_dict() == data
+    assert list(tx.to_dict()) == list(FIELDS)
+    assert json.loads(encode_transaction(tx)) == data
+    assert json.loads(encode_transaction(data)) == data
+
+
+def test_backend_is_reported():
+    assert transaction.JSON_BACKEND in ("msgspec", "orjson", "json")
+
+
+def test_stdlib_fallback_decodes_the_same(monkeypatch):
+    fast = decode_line(LINE).to_dict()
+    monkeypatch.setattr(transaction, "_decode", json.loads)
+    monkeypatch.setattr(transaction, "_encode", None)
+    assert decode_line(LINE).to_dict() == fast
+    assert json.loads(encode_transaction(fast)) == fast
+
+
+ODD_LINES = [
+    LINE,
+    "2024-01-01 INFO " + LINE,  # Prefixed
+    LINE.replace('"91"', "91"),  # Numeric error code
+    LINE.replace('"UK"', "null"),  # Null region
+    LINE.replace("180.5", '"slow"'),  # Non-numeric latency
+    LINE.replace("180.5", "true"),
+    LINE.replace("180.5", "120"),
+    '{"status": "SUCCESS"}',  # Defaults
+    "no json here",
+    '{"truncated": ',
+    "[1, 2]",
+    "",
+]
+
+
+def as_fields(tx):
+    return None if tx is None else (tx.region, tx.gateway, tx.status, tx.error_code, tx.latency_ms)
+
+
+def test_decode_fields_matches_decode_line():
+    for line in ODD_LINES:
+        assert transaction.decode_fields(line) == as_fields(decode_line(line)), line
+    rows, kept = transaction.decode_rows(ODD_LINES)
+    assert rows == [as_fields(decode_line(line)) for line in kept]
+    assert kept == ODD_LINES[:8]
+
+
+def test_decode_rows_without_msgspec(monkeypatch):
+    expected = transaction.decode_rows(ODD_LINES)
+    monkeypatch.setattr(transaction, "_decode_fields", None)
+    monkeypatch.setattr(transaction, "_decode", json.loads)
+    assert transaction.decode_rows(ODD_LINES) == expected
+
+
+def test_timestamp_is_parsed_on_first_use():
+    tx = decode_line(LINE)
+    assert tx._ts is transaction._UNPARSED
+    assert tx.ts == 1_700_000_000.25 and tx._ts == tx.ts
@@ -0,0 +1,221 @@
+import os
+import random
+from datetime import datetime, timezone
+
+import pytest
+
+from metrics_window import DEFAULT_TIME_WINDOWS, parse_timestamp
+from snapshot import LineWindow
+from transaction import encode_transaction
+from txlog import (HEADER_SIZE, ColumnarLogReader, ColumnarLogWriter, ColumnarWindow, LineBlockReader, convert,
+                   records_to_dicts)
+
+START = 1_700_000_000.0
+
+
+class ListSource:
+    """A LogTailer stand-in: hands out queued lines once."""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+
+    def read_new_lines(self):
+        lines, self.lines = self.lines, []
+        return lines
+
+
+def transactions(n, seed=7):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        status, error_code = rng.choice([("SUCCESS", "00"), ("SUCCESS", "00"), ("FAILED", "91"),
+                                         ("REJECTED", "429"), ("FAILED", "51")])
+        # Fractional latencies (int() used to truncate these into a different sketch bin),
+        # plus the zero-bin and missing cases
+        latency = rng.choice([round(rng.uniform(1, 3000), 2), rng.uniform(0.1, 2), 0, -3.5, None])
+        rows.append({
+            "timestamp": datetime.fromtimestamp(START + i * 0.05, timezone.utc).isoformat() + "Z",
+            "transaction_id": f"tx_{i}",
+            "gateway": rng.choice(["stripe", "adyen"]),
+            "region": rng.choice(["US", "UK", "IN", "EU"]),
+            "status": status,
+            "error_code": error_code,
+            "latency_ms": latency,
+            "amount": round(rng.uniform(5, 500), 2)
+        })
+    return rows
+
+
+def line_window(rows, size, time_windows=None):
+    window = LineWindow(ListSource(encode_transaction(row) for row in rows), size, time_windows=time_windows)
+    window.update()
+    return window
+
+
+def test_columnar_file_matches_json_path_with_fractional_latencies(tmp_path):
+    rows = transactions(2_000)
+    path = str(tmp_path / "transactions.bin")
+    writer = ColumnarLogWriter(path)
+    for i in range(0, len(rows), 500):
+        writer.write_transactions(rows[i:i + 500])
+    writer.close()
+
+    columnar = ColumnarWindow(ColumnarLogReader(path), 300)
+    columnar.update()
+    now = START + len(rows) * 0.05
+    assert columnar.snapshot(now) == line_window(rows, 300).snapshot(now)
+
+
+def test_line_block_reader_matches_json_path_with_fractional_latencies():
+    rows = transactions(1_000, seed=11)
+    lines = [encode_transaction(row) for row in rows]
+    columnar = ColumnarWindow(LineBlockReader(ListSource(lines)), 100)
+    columnar.update()
+    now = START + len(rows) * 0.05
+    assert columnar.snapshot(now) == line_window(rows, 100).snapshot(now)
+
+
+def test_time_windows_match_json_path_as_they_expire(tmp_path):
+    rows = transactions(3_000, seed=5)  # 150 s of traffic
+    rows[1_000]["timestamp"] = rows[10]["timestamp"]  # A late row lands in the newest bucket on both paths
+    path = str(tmp_path / "transactions.bin")
+    writer = ColumnarLogWriter(path)
+    for i in range(0, len(rows), 333):  # Blocks end mid-second
+        writer.write_transactions(rows[i:i + 333])
+    writer.close()
+
+    columnar = ColumnarWindow(ColumnarLogReader(path), 100, time_windows=DEFAULT_TIME_WINDOWS)
+    json_path = line_window(rows, 100, DEFAULT_TIME_WINDOWS)
+    columnar.update()
+    for now in (START + 150, START + 200, START + 400, START + 500):
+        assert columnar.snapshot(now) == json_path.snapshot(now)
+    assert columnar.snapshot(START + 500)["windows"]["5m"]["total_count"] == 0
+
+
+def test_keeps_only_the_rows_the_count_window_needs(tmp_path):
+    path = str(tmp_path / "transactions.bin")
+    writer = ColumnarLogWriter(path)
+    rows = transactions(5_000, seed=2)
+    for i in range(0, len(rows), 250):
+        writer.write_transactions(rows[i:i + 250])
+    writer.close()
+
+    columnar = ColumnarWindow(ColumnarLogReader(path), 600, latest_logs_size=100)
+    columnar.update()
+    assert 600 <= columnar.rows < 600 + 250
+    assert not columnar.expire(START + 10_000)
+    assert "windows" not in columnar.snapshot(START + 250)
+
+
+def test_latest_logs_round_trip_latency(tmp_path):
+    rows = transactions(50, seed=3)
+    path = str(tmp_path / "transactions.bin")
+    writer = ColumnarLogWriter(path)
+    writer.write_transactions(rows)
+    writer.close()
+
+    columnar = ColumnarWindow(ColumnarLogReader(path), 50, latest_logs_size=50)
+    columnar.update()
+    for decoded, row in zip(columnar.latest_logs(), rows):
+        if row["latency_ms"] is None:
+            assert decoded["latency_ms"] is None
+        else:
+            assert abs(decoded["latency_ms"] - row["latency_ms"]) <= 1e-3 * max(1, abs(row["latency_ms"]))
+
+
+def write(path, rows, **kwargs):
+    writer = ColumnarLogWriter(path, **kwargs)
+    writer.write_transactions(rows)
+    writer.close()
+
+
+def test_round_trip_through_the_file(tmp_path):
+    rows = transactions(300, seed=5)
+    path = str(tmp_path / "transactions.bin")
+    write(path, rows)
+    assert os.path.getsize(path) < HEADER_SIZE + 300 * 40  # vs ~230 bytes per JSON line
+
+    blocks = ColumnarLogReader(path).read_new_blocks()
+    assert len(blocks) == 1 and blocks[0].min_ts == START
+    decoded = records_to_dicts(blocks[0].records, ColumnarLogReader(path).labels)
+    for got, row in zip(decoded, rows):
+        assert {k: got[k] for k in ("transaction_id", "gateway", "region", "status", "error_code")} == \
+            {k: row[k] for k in ("transaction_id", "gateway", "region", "status", "error_code")}
+        assert parse_timestamp(got["timestamp"]) == pytest.approx(parse_timestamp(row["timestamp"]), abs=1e-6)
+        assert got["amount"] == pytest.approx(row["amount"], abs=0.01)
+
+
+def test_reader_is_incremental_and_learns_new_labels(tmp_path):
+    path = str(tmp_path / "transactions.bin")
+    writer = ColumnarLogWriter(path)
+    reader = ColumnarLogReader(path)
+    assert reader.read_new_blocks() == []
+
+    writer.write_transactions(transactions(10))
+    assert sum(len(b.records) for b in reader.read_new_blocks()) == 10
+    assert reader.read_new_blocks() == []
+
+    brazil = {**transactions(1)[0], "region": "BR", "error_code": "57"}
+    writer.write_transactions([brazil])
+    records = reader.read_new_blocks()[0].records
+    assert reader.labels["region"][records["region"][0]] == "BR"
+    assert reader.labels["error_code"][records["error_code"][0]] == "57"
+    writer.close()
+
+
+def test_files_with_different_label_orders_are_remapped(tmp_path):
+    path = str(tmp_path / "transactions.bin")
+    reader = ColumnarLogReader(path)
+    reader.labels["region"].append("BR")  # Seen in an earlier file
+    write(path, [{**transactions(1)[0], "region": "JP"}, {**transactions(1)[0], "region": "BR"}])
+    records = reader.read_new_blocks()[0].records
+    assert [reader.labels["region"][code] for code in records["region"]] == ["JP", "BR"]
+
+
+def test_rotation_is_followed(tmp_path):
+    path = str(tmp_path / "transactions.bin")
+    writer = ColumnarLogWriter(path, max_bytes=HEADER_SIZE + 3_000)
+    reader = ColumnarLogReader(path)
+    read = 0
+    for i in range(5):  # Two 50-row blocks per file
+        writer.write_transactions(transactions(50, seed=i))
+        if i % 2:
+            read += sum(len(b.records) for b in reader.read_new_blocks())
+    writer.close()
+    assert os.path.exists(path + ".1")
+    # Each rotation is drained from the old file before the new one is read
+    assert read + sum(len(b.records) for b in reader.read_new_blocks()) == 250
+
+
+def test_partial_blocks_are_not_returned(tmp_path):
+    path = str(tmp_path / "transactions.bin")
+    write(path, transactions(20))
+    with open(path, "rb") as f:
+        whole = f.read()
+    with open(path, "wb") as f:
+        f.write(whole[:-10])  # The writer is still mid-block
+    reader = ColumnarLogReader(path)
+    assert reader.read_new_blocks() == []
+    with open(path, "ab") as f:
+        f.write(whole[-10:])
+    assert len(reader.read_new_blocks()[0].records) == 20
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = str(tmp_path / "transactions.bin")
+    with open(path, "wb") as f:
+        f.write(b"TXCOL1\n\0".ljust(HEADER_SIZE, b"\0"))
+    with pytest.raises(ValueError):
+        ColumnarLogReader(path).read_new_blocks()
+
+
+def test_convert_skips_non_transaction_lines(tmp_path):
+    source, target = str(tmp_path / "capture.log"), str(tmp_path / "capture.bin")
+    rows = transactions(25)
+    with open(source, "w") as f:
+        f.write("INFO: starting\n")
+        for row in rows:
+            f.write("INFO: " + encode_transaction(row) + "\n")
+    assert convert(source, target, block_rows=10) == 25
+    blocks = ColumnarLogReader(target).read_new_blocks()
+    assert [len(b.records) for b in blocks] == [10, 10, 5]
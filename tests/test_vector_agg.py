@@ -0,0 +1,55 @@
+import random
+
+import numpy as np
+
+from latency_sketch import ZERO_BIN, bin_index
+from metrics_window import WindowCounters, classify
+from transaction import Transaction
+from vector_agg import _BIN_OFFSET, MISSING_LATENCY, latency_bins, reduce_columns
+
+LABELS = {
+    "region": ["UNK", "US", "UK", "IN", "EU"],
+    "gateway": ["UNK", "stripe", "adyen"],
+    "status": ["UNK", "SUCCESS", "FAILED", "REJECTED"],
+    "error_code": ["UNK", "00", "91", "401", "429", "51", "05"]
+}
+
+
+def test_latency_bins_match_bin_index():
+    rng = random.Random(4)
+    values = [rng.uniform(0.01, 20_000) for _ in range(2_000)] + [12.7, 12.0, 1.0, 0.0, -4.2]
+    bins = latency_bins(np.array(values, dtype=np.float32))
+    expected = [bin_index(float(np.float32(v))) for v in values]
+    assert [None if b == -_BIN_OFFSET else b for b in bins.tolist()] == [ZERO_BIN if e is None else e for e in expected]
+
+
+def test_reduce_columns_matches_window_counters():
+    rng = random.Random(9)
+    n = 5_000
+    columns = {field: rng.choices(range(len(labels)), k=n) for field, labels in LABELS.items()}
+    latency = [rng.choice([rng.uniform(1, 5_000), 0.0, float("nan")]) for _ in range(n)]
+
+    counters = WindowCounters()
+    for i in range(n):
+        label = {field: LABELS[field][columns[field][i]] for field in LABELS}
+        value = float(np.float32(latency[i]))
+        counters.add(classify(Transaction(None, f"tx_{i}", label["gateway"], label["region"], label["status"],
+                                          label["error_code"], None if value != value else value, 1.0)))
+
+    reduced = reduce_columns(*(np.array(columns[field], dtype=np.uint8) for field in LABELS),
+                             np.array(latency, dtype=np.float32), LABELS)
+    assert reduced.to_metrics() == counters.to_metrics()
+
+
+def test_labels_never_seen_match_nothing():
+    labels = {**LABELS, "status": ["UNK", "SUCCESS"]}  # No FAILED/REJECTED codes in this file
+    one = np.array([1], dtype=np.uint8)
+    metrics = reduce_columns(one, one, one, np.array([4], dtype=np.uint8), np.array([MISSING_LATENCY], np.float32),
+                             labels).to_metrics()
+    assert metrics["security_alerts"] == {"SPAM_ATTACK_US": 1}  # 429 alone still means spam
+    assert metrics["failure_clusters"] == {} and metrics["latency_percentiles"] == {}
+
+
+def test_empty_slice():
+    empty = np.empty(0, dtype=np.uint8)
+    assert reduce_columns(empty, empty, empty, empty, np.empty(0, np.float32), LABELS).to_metrics()["total_count"] == 0
@@ -0,0 +1,173 @@
+"""
+Typed transaction record shared by the simulators (encode) and the observer
+(decode). One __slots__ object per line instead of a dict keeps large
+windows small, and the JSON work goes through the fastest library
+installed: msgspec, then orjson, then the stdlib.
+
+The count window only needs five fields per line. decode_fields() (and
+decode_rows() for a batch) returns just those as a tuple; with msgspec they
+are decoded straight into a small typed struct, so the timestamp, id and
+amount are never materialized.
+"""
+import json
+from typing import Optional, Tuple, Union
+
+from metrics_window import parse_timestamp
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if msgspec is not None:
+    _decode = msgspec.json.Decoder().decode
+    _encode = msgspec.json.Encoder().encode
+    JSON_BACKEND = "msgspec"
+elif orjson is not None:
+    _decode = orjson.loads
+    _encode = orjson.dumps
+    JSON_BACKEND = "orjson"
+else:
+    _decode = json.loads
+    _encode = None
+    JSON_BACKEND = "json"
+
+DecodeError = (ValueError, TypeError) + ((msgspec.DecodeError,) if msgspec is not None else ())
+
+if msgspec is not None:
+    class _Fields(msgspec.Struct, gc=False):
+        # Anything else (null region, string latency, ...) fails validation and takes the dict path
+        gateway: str = "UNK"
+        region: str = "UNK"
+        status: str = "UNK"
+        error_code: str = "00"
+        latency_ms: Union[int, float, None] = None
+
+    _decode_fields = msgspec.json.Decoder(_Fields).decode
+else:
+    _decode_fields = None
+
+FIELDS = ("timestamp", "transaction_id", "gateway", "region", "status", "error_code", "latency_ms", "amount")
+
+
+_UNPARSED = object()
+
+
+def _error_code(value) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _latency(value):
+    return value if isinstance(value, (int, float)) else None
+
+
+class Transaction:
+    """One simulator transaction. `ts` is the parsed timestamp (epoch seconds) or None."""
+    __slots__ = FIELDS + ("_ts",)
+
+    def __init__(self, timestamp=None, transaction_id=None, gateway="UNK", region="UNK", status="UNK",
+                 error_code="00", latency_ms=None, amount=None):
+        self.timestamp = timestamp
+        self.transaction_id = transaction_id
+        self.gateway = gateway
+        self.region = region
+        self.status = status
+        self.error_code = _error_code(error_code)
+        self.latency_ms = _latency(latency_ms)
+        self.amount = amount
+        self._ts = _UNPARSED
+
+    @property
+    def ts(self) -> Optional[float]:
+        # Parsed on first use: only the time windows need it
+        if self._ts is _UNPARSED:
+            self._ts = parse_timestamp(self.timestamp)
+        return self._ts
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Transaction":
+        get = data.get
+        return cls(get("timestamp"), get("transaction_id"), get("gateway", "UNK"), get("region", "UNK"),
+                   get("status", "UNK"), get("error_code", "00"), get("latency_ms"), get("amount"))
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in FIELDS}
+
+
+def decode_object(line) -> Optional[dict]:
+    """The JSON object on a log line (any prefix before the first '{' is skipped), or None."""
+    json_start = line.find('{')
+    if json_start == -1:
+        return None
+    try:
+        data = _decode(line[json_start:])
+    except DecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def decode_line(line) -> Optional[Transaction]:
+    """Parses one log line into a Transaction. None if it isn't a transaction."""
+    data = decode_object(line)
+    return Transaction.from_dict(data) if data is not None else None
+
+
+def decode_fields(line) -> Optional[tuple]:
+    """
+    (region, gateway, status, error_code, latency_ms) of a log line, the
+    same values decode_line() would give, or None if it isn't a transaction.
+    """
+    json_start = line.find('{')
+    if json_start == -1:
+        return None
+    if _decode_fields is not None:
+        try:
+            f = _decode_fields(line[json_start:])
+            return f.region, f.gateway, f.status, f.error_code, f.latency_ms
+        except (msgspec.ValidationError, msgspec.DecodeError):
+            pass  # Not the usual shape (numeric error code, null field, not JSON...): decode it generically
+    data = decode_object(line)
+    if data is None:
+        return None
+    get = data.get
+    return (get("region", "UNK"), get("gateway", "UNK"), get("status", "UNK"), _error_code(get("error_code", "00")),
+            _latency(get("latency_ms")))
+
+
+def decode_rows(lines) -> Tuple[list, list]:
+    """decode_fields() over a batch of lines: (rows, the lines they came from)."""
+    rows, kept = [], []
+    if _decode_fields is None:
+        for line in lines:
+            fields = decode_fields(line)
+            if fields is not None:
+                rows.append(fields)
+                kept.append(line)
+        return rows, kept
+
+    decode = _decode_fields
+    for line in lines:
+        try:
+            f = decode(line)  # Bare JSON lines, as the simulators write them
+        except (msgspec.ValidationError, msgspec.DecodeError):
+            fields = decode_fields(line)  # Prefixed, unusual or junk
+            if fields is None:
+                continue
+        else:
+            fields = (f.region, f.gateway, f.status, f.error_code, f.latency_ms)
+        rows.append(fields)
+        kept.append(line)
+    return rows, kept
+
+
+def encode_transaction(tx) -> str:
+    """The JSON line the simulators log. Accepts a Transaction or a plain dict."""
+    data = tx.to_dict() if isinstance(tx, Transaction) else tx
+    if _encode is None:
+        return json.dumps(data)
+    return _encode(data).decode()
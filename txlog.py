@@ -0,0 +1,530 @@
+"""
+Compact columnar transaction log (an optional alternative to the JSON log).
+
+    python txlog.py convert transactions.log transactions.bin
+    python txlog.py stats transactions.bin
+
+Layout:
+    header   magic, label counts, then one 256-slot label table per
+             dictionary-encoded field (region/gateway/status/error_code)
+    blocks   "BLK1", row count, min/max timestamp, then `count` fixed-width
+             RECORD_DTYPE rows (24 bytes vs ~230 for a JSON line)
+
+The block headers double as the index: a reader hops from one to the next
+and can skip whole blocks by timestamp. Rows are read through mmap as
+NumPy views, so window metrics are a vectorized reduction (vector_agg.py).
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from metrics_window import BUCKET_SECONDS, TimeWindow, WindowCounters, parse_timestamp
+from vector_agg import CATEGORICAL_FIELDS, MISSING_LATENCY, reduce_columns
+
+MAGIC = b"TXCOL2\n\0"  # 2: latency_ms became float32
+LABEL_SLOTS = 256  # Codes are uint8
+LABEL_BYTES = 16
+HEADER_PREFIX = struct.Struct("<8s4H")
+TABLES_OFFSET = 64
+HEADER_SIZE = TABLES_OFFSET + len(CATEGORICAL_FIELDS) * LABEL_SLOTS * LABEL_BYTES
+
+BLOCK_MAGIC = b"BLK1"
+BLOCK_HEADER = struct.Struct("<4sIdd")  # magic, rows, min ts, max ts
+
+# Latency is a fixed-width float32 rather than a varint: fixed-width rows are
+# what lets the reader hand out zero-copy NumPy views. It stays a float so
+# fractional latencies land in the same sketch bin as on the JSON path.
+RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("latency_ms", "<f4"),
+    ("amount", "<f4"),
+    ("txid", "<u4"),
+    ("region", "u1"),
+    ("gateway", "u1"),
+    ("status", "u1"),
+    ("error_code", "u1")
+])
+
+# Code 0 is "UNK" (unknown, malformed or out of label slots). The rest are
+# seeded with everything the simulators emit, so codes line up across files.
+SEED_LABELS = {
+    "region": ["UNK", "US", "UK", "IN", "EU"],
+    "gateway": ["UNK", "stripe", "adyen"],
+    "status": ["UNK", "SUCCESS", "FAILED", "REJECTED"],
+    "error_code": ["UNK", "00", "91", "401", "429", "51", "05"]
+}
+
+DEFAULT_BLOCK_ROWS = 4096
+
+
+def _table_offset(field_index: int, code: int) -> int:
+    return TABLES_OFFSET + (field_index * LABEL_SLOTS + code) * LABEL_BYTES
+
+
+def read_labels(buffer) -> Dict[str, List[str]]:
+    magic, *counts = HEADER_PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("not a columnar transaction log")
+    labels = {}
+    for i, field in enumerate(CATEGORICAL_FIELDS):
+        labels[field] = [
+            bytes(buffer[_table_offset(i, code):_table_offset(i, code) + LABEL_BYTES]).rstrip(b"\0").decode()
+            for code in range(counts[i])
+        ]
+    return labels
+
+
+class ColumnarLogWriter:
+    """
+    Appends blocks of rows. Rotates like RotatingFileHandler (path -> path.1)
+    once `max_bytes` would be exceeded; every file carries its own labels.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._open()
+
+    def _open(self):
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER_SIZE:
+            self.file = open(self.path, "r+b", buffering=0)
+            self.labels = read_labels(self.file.read(HEADER_SIZE))
+            self.codes = {field: {label: i for i, label in enumerate(labels)} for field, labels in self.labels.items()}
+        else:
+            self.file = open(self.path, "w+b", buffering=0)
+            self.file.write(HEADER_PREFIX.pack(MAGIC, 0, 0, 0, 0).ljust(HEADER_SIZE, b"\0"))
+            self.labels = {field: ["UNK"] for field in CATEGORICAL_FIELDS}
+            self.codes = {field: {"UNK": 0} for field in CATEGORICAL_FIELDS}
+            for i, field in enumerate(CATEGORICAL_FIELDS):
+                self._write_label(i, 0, "UNK")
+                for label in SEED_LABELS[field][1:]:
+                    self.code(field, label)
+        self.size = self.file.seek(0, os.SEEK_END)
+
+    def _write_label(self, field_index: int, code: int, label: str):
+        # The label lands before the count that publishes it, and both before
+        # any block using it, so readers never see a code without its label
+        self.file.seek(_table_offset(field_index, code))
+        self.file.write(label.encode().ljust(LABEL_BYTES, b"\0"))
+        counts = [len(self.labels[field]) for field in CATEGORICAL_FIELDS]
+        self.file.seek(0)
+        self.file.write(HEADER_PREFIX.pack(MAGIC, *counts))
+        self.file.seek(0, os.SEEK_END)
+
+    def code(self, field: str, label) -> int:
+        """Code for `label`, registering it in the header on first use (0 = UNK)."""
+        label = "UNK" if label is None else str(label)
+        code = self.codes[field].get(label)
+        if code is not None:
+            return code
+        labels = self.labels[field]
+        if len(labels) >= LABEL_SLOTS or len(label.encode()) > LABEL_BYTES:
+            return 0
+        labels.append(label)
+        code = self.codes[field][label] = len(labels) - 1
+        self._write_label(CATEGORICAL_FIELDS.index(field), code, label)
+        return code
+
+    def write_block(self, ts, latency_ms, amount, txid, categorical: Dict[str, tuple]):
+        """
+        Appends one block. `categorical` maps each field to (labels, indexes):
+        the caller's own label list and an index array into it.
+        """
+        records = np.empty(len(ts), dtype=RECORD_DTYPE)
+        records["ts"] = ts
+        records["latency_ms"] = latency_ms
+        records["amount"] = amount
+        records["txid"] = txid
+        for field, (labels, indexes) in categorical.items():
+            lookup = np.array([self.code(field, label) for label in labels], dtype=np.uint8)
+            records[field] = lookup[indexes]
+        self.write_records(records)
+
+    def write_transactions(self, transactions: List[dict]):
+        """Appends plain transaction dicts (the JSON log's shape) as one block."""
+        records = np.zeros(len(transactions), dtype=RECORD_DTYPE)
+        for i, tx in enumerate(transactions):
+            ts = parse_timestamp(tx.get("timestamp"))
+            latency = tx.get("latency_ms")
+            records[i] = (
+                ts if ts is not None else 0.0,
+                _latency(latency),
+                tx.get("amount") or 0.0,
+                _txid(tx.get("transaction_id")),
+                *(self.code(field, tx.get(field)) for field in CATEGORICAL_FIELDS)
+            )
+        self.write_records(records)
+
+    def write_records(self, records: np.ndarray):
+        if not len(records):
+            return
+        block = BLOCK_HEADER.pack(BLOCK_MAGIC, len(records), float(records["ts"].min()),
+                                  float(records["ts"].max())) + records.tobytes()
+        if self.max_bytes and self.size > HEADER_SIZE and self.size + len(block) > self.max_bytes:
+            self.file.close()
+            os.replace(self.path, f"{self.path}.1")
+            self._open()
+        self.file.write(block)  # One write per block: readers see whole blocks or none
+        self.size += len(block)
+
+    def close(self):
+        self.file.close()
+
+
+class Block(NamedTuple):
+    min_ts: float
+    max_ts: float
+    records: np.ndarray  # RECORD_DTYPE view into the mapped file (or a remapped copy)
+
+
+class ColumnarLogReader:
+    """
+    Incremental reader, the binary twin of LogTailer. Maps the file and
+    returns each new block as a NumPy view, without copying. Codes are
+    translated to the reader's own label tables, which is a no-op (still
+    zero-copy) when the file's labels agree with them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.labels = {field: list(seeds) for field, seeds in SEED_LABELS.items()}
+        self.bytes_read = 0
+        self._file = None
+        self._map = None
+        self._inode = None
+        self._offset = 0
+        self._file_labels = None
+        self._lookups = None
+
+    def _open(self) -> bool:
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._map = None
+        self._offset = HEADER_SIZE
+        self._file_labels = None
+        return True
+
+    def _remap(self, size: int) -> bool:
+        if size < HEADER_SIZE:
+            return False  # Header still being written
+        if self._map is None or len(self._map) < size:
+            # Views handed out earlier keep the old mapping alive
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
+
+    def _load_labels(self):
+        self._file_labels = read_labels(self._map)
+        self._lookups = {}
+        for field, file_labels in self._file_labels.items():
+            labels = self.labels[field]
+            for label in file_labels:
+                if label not in labels:
+                    labels.append(label)
+            lookup = np.array([labels.index(label) for label in file_labels], dtype=np.uint8)
+            identity = np.array_equal(lookup, np.arange(len(lookup)))
+            self._lookups[field] = None if identity else lookup
+
+    def _align(self, records: np.ndarray) -> np.ndarray:
+        if any(len(records) and int(records[field].max()) >= len(self._file_labels[field])
+               for field in CATEGORICAL_FIELDS):
+            self._load_labels()  # The writer added labels since we last looked
+        remapped = None
+        for field, lookup in self._lookups.items():
+            if lookup is not None:
+                if remapped is None:
+                    remapped = records.copy()
+                remapped[field] = lookup[records[field]]
+        return records if remapped is None else remapped
+
+    def _scan(self) -> List[Block]:
+        size = os.fstat(self._file.fileno()).st_size
+        if not self._remap(size):
+            return []
+        if self._file_labels is None:
+            self._load_labels()
+
+        blocks = []
+        while self._offset + BLOCK_HEADER.size <= size:
+            magic, rows, min_ts, max_ts = BLOCK_HEADER.unpack_from(self._map, self._offset)
+            if magic != BLOCK_MAGIC:
+                raise ValueError(f"{self.path}: corrupt block at offset {self._offset}")
+            end = self._offset + BLOCK_HEADER.size + rows * RECORD_DTYPE.itemsize
+            if end > size:
+                break  # Block still being written
+            records = np.frombuffer(self._map, dtype=RECORD_DTYPE, count=rows,
+                                    offset=self._offset + BLOCK_HEADER.size)
+            blocks.append(Block(min_ts, max_ts, self._align(records)))
+            self.bytes_read += end - self._offset
+            self._offset = end
+        return blocks
+
+    def read_new_blocks(self) -> List[Block]:
+        if self._file is None and not self._open():
+            return []
+        blocks = self._scan()
+        try:
+            rotated = os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            rotated = False  # Mid-rotation; the new file appears shortly
+        if rotated:
+            blocks.extend(self._scan())  # Drain what was appended before the rename
+            self._file.close()
+            if self._open():
+                blocks.extend(self._scan())
+        return blocks
+
+
+class LineBlockReader:
+    """
+    Adapts a JSON line source (LogTailer, replay.ReplaySource) to the
+    ColumnarLogReader interface: each batch of new lines is decoded and
+    dictionary-encoded into one in-memory block, so ColumnarWindow can
+    aggregate plain JSON logs with the same vectorized reductions.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.labels = {field: list(seeds) for field, seeds in SEED_LABELS.items()}
+        self._codes = {field: {label: i for i, label in enumerate(labels)} for field, labels in self.labels.items()}
+
+    @property
+    def bytes_read(self) -> int:
+        return getattr(self.source, "bytes_read", 0)
+
+    def _encode(self, field: str, values: list) -> np.ndarray:
+        codes = self._codes[field]
+        encoded = np.array([codes.get(value, -1) for value in values], dtype=np.int16)
+        # New labels are rare: only they take the slow path
+        for i in np.flatnonzero(encoded < 0).tolist():
+            encoded[i] = self._register(field, values[i])
+        return encoded.astype(np.uint8)
+
+    def _register(self, field: str, value) -> int:
+        label = str(value)
+        code = self._codes[field].get(label)
+        if code is None:
+            labels = self.labels[field]
+            if len(labels) >= LABEL_SLOTS:
+                return 0
+            labels.append(label)
+            code = self._codes[field][label] = len(labels) - 1
+        self._codes[field][value] = code  # Remember the raw (e.g. non-str) form too
+        return code
+
+    def read_new_blocks(self) -> List[Block]:
+        from transaction import decode_object
+
+        rows = [row for row in map(decode_object, self.source.read_new_lines()) if row is not None]
+        if not rows:
+            return []
+        records = np.empty(len(rows), dtype=RECORD_DTYPE)
+        records["ts"] = parse_timestamps([row.get("timestamp") for row in rows])
+        latency = [row.get("latency_ms") for row in rows]
+        records["latency_ms"] = [_latency(value) for value in latency]
+        amount = [row.get("amount") for row in rows]
+        records["amount"] = [value if isinstance(value, (int, float)) else 0.0 for value in amount]
+        records["txid"] = _txids([row.get("transaction_id") for row in rows])
+        for field in CATEGORICAL_FIELDS:
+            default = "00" if field == "error_code" else "UNK"
+            records[field] = self._encode(field, [row.get(field, default) for row in rows])
+        return [Block(float(records["ts"].min()), float(records["ts"].max()), records)]
+
+
+def parse_timestamps(values: list) -> np.ndarray:
+    """
+    Vectorized parse_timestamp. The simulators' "...+00:00Z" stamps are
+    parsed by NumPy in one call; anything else falls back to parse_timestamp
+    (and to the current time if unparseable, as SlidingWindowMetrics does).
+    """
+    if all(isinstance(v, str) and len(v) == 33 and v.endswith("+00:00Z") for v in values):
+        stamps = np.array([v[:26] for v in values], dtype="datetime64[us]")
+        return stamps.astype(np.int64) / 1e6
+    now = time.time()
+    parsed = [parse_timestamp(v) for v in values]
+    return np.array([now if ts is None else ts for ts in parsed], dtype=np.float64)
+
+
+def _latency(value) -> float:
+    # Kept as given (not truncated): non-positive values land in the sketch's zero bin, like the JSON path
+    if not isinstance(value, (int, float)):
+        return MISSING_LATENCY
+    return value
+
+
+def _txids(values: list) -> list:
+    try:
+        parsed = [int(value[3:]) for value in values]
+        if max(parsed) <= 0xFFFFFFFF and min(parsed) >= 0:
+            return parsed
+    except (TypeError, ValueError):
+        pass
+    return [_txid(value) for value in values]
+
+
+def _txid(transaction_id) -> int:
+    digits = transaction_id[3:] if isinstance(transaction_id, str) and transaction_id.startswith("tx_") else ""
+    return int(digits) if digits.isdigit() and int(digits) <= 0xFFFFFFFF else 0
+
+
+def _decoded_latency(latency: float):
+    if latency != latency:
+        return None
+    # float32 -> the short decimal the log had (120, 12.3), not 12.300000190734863
+    return int(latency) if latency.is_integer() else round(latency, 3)
+
+
+def records_to_dicts(records: np.ndarray, labels: Dict[str, List[str]]) -> List[dict]:
+    """Rows back in the JSON log's shape (for latest_logs)."""
+    rows = []
+    for ts, latency, amount, txid, region, gateway, status, error_code in records.tolist():
+        rows.append({
+            "timestamp": datetime.fromtimestamp(ts, timezone.utc).isoformat() + "Z",
+            "transaction_id": f"tx_{txid}",
+            "gateway": labels["gateway"][gateway],
+            "region": labels["region"][region],
+            "status": labels["status"][status],
+            "error_code": labels["error_code"][error_code],
+            "latency_ms": _decoded_latency(latency),
+            "amount": round(amount, 2)
+        })
+    return rows
+
+
+class ColumnarWindow:
+    """
+    Observer window over a ColumnarLogReader, interchangeable with
+    snapshot.LineWindow. Keeps only the mapped blocks that still overlap
+    the count window (reduced with vector_agg.reduce_columns on each
+    snapshot). Opt-in time windows are fed per-second WindowCounters, each
+    block reduced once on arrival, and expire like SlidingWindowMetrics'.
+    """
+
+    def __init__(self, reader: ColumnarLogReader, window_size: int, latest_logs_size: int = 100,
+                 time_windows: Optional[Dict[str, float]] = None):
+        self.reader = reader
+        self.window_size = window_size
+        self.latest_logs_size = latest_logs_size
+        self.time_windows = {label: TimeWindow(seconds) for label, seconds in (time_windows or {}).items()}
+        self.blocks = deque()
+        self.rows = 0
+        self._last_start = float("-inf")  # Newest time bucket so far
+
+    @property
+    def bytes_read(self) -> int:
+        return self.reader.bytes_read
+
+    def update(self) -> int:
+        added = 0
+        keep = max(self.window_size, self.latest_logs_size)
+        for block in self.reader.read_new_blocks():
+            self.blocks.append(block)
+            self.rows += len(block.records)
+            added += len(block.records)
+            if self.time_windows and len(block.records):
+                self._add_buckets(block.records)
+            while self.rows - len(self.blocks[0].records) >= keep:
+                self.rows -= len(self.blocks.popleft().records)
+        return added
+
+    def _add_buckets(self, records: np.ndarray):
+        # 1. One bucket per second; late rows land in the newest bucket, as in SlidingWindowMetrics
+        starts = records["ts"] - records["ts"] % BUCKET_SECONDS
+        starts = np.maximum.accumulate(np.maximum(starts, self._last_start))
+        self._last_start = float(starts[-1])
+
+        # 2. Reduce each second once; the windows share the (read-only) counters
+        edges = np.flatnonzero(np.diff(starts)) + 1
+        for lo, hi in zip(np.r_[0, edges], np.r_[edges, len(records)]):
+            counters = self._reduce(records[lo:hi])
+            for window in self.time_windows.values():
+                window.add_bucket(float(starts[lo]), counters)
+
+    def expire(self, now: float) -> bool:
+        """Expires the time windows. True if any lost a bucket."""
+        expired = False
+        for window in self.time_windows.values():
+            expired |= window.expire(now)
+        return expired
+
+    def _tail(self, n: int) -> np.ndarray:
+        parts = []
+        for block in reversed(self.blocks):
+            if n <= 0:
+                break
+            parts.append(block.records[-n:])
+            n -= len(parts[-1])
+        return np.concatenate(parts[::-1]) if parts else np.empty(0, dtype=RECORD_DTYPE)
+
+    def _reduce(self, records: np.ndarray) -> WindowCounters:
+        return reduce_columns(records["region"], records["gateway"], records["status"], records["error_code"],
+                              records["latency_ms"], self.reader.labels)
+
+    def snapshot(self, now: float) -> dict:
+        self.expire(now)
+        metrics = self._reduce(self._tail(self.window_size)).to_metrics()
+        if self.time_windows:
+            metrics["windows"] = {label: window.counters.to_metrics() for label, window in self.time_windows.items()}
+        return metrics
+
+    def latest_logs(self) -> List[dict]:
+        return records_to_dicts(self._tail(self.latest_logs_size), self.reader.labels)
+
+
+def convert(source: str, target: str, block_rows: int = DEFAULT_BLOCK_ROWS):
+    """Re-encodes a JSON transaction log (e.g. a capture) as a columnar log."""
+    from transaction import decode_line
+
+    writer = ColumnarLogWriter(target)
+    pending, converted = [], 0
+    with open(source, "r", errors="replace") as f:
+        for line in f:
+            tx = decode_line(line)
+            if tx is None:
+                continue
+            pending.append(tx.to_dict())
+            if len(pending) >= block_rows:
+                writer.write_transactions(pending)
+                converted += len(pending)
+                pending = []
+    writer.write_transactions(pending)
+    writer.close()
+    return converted + len(pending)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar transaction log tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    convert_cmd = commands.add_parser("convert", help="JSON log -> columnar log")
+    convert_cmd.add_argument("source")
+    convert_cmd.add_argument("target")
+    stats_cmd = commands.add_parser("stats", help="Block index and size summary")
+    stats_cmd.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        count = convert(args.source, args.target)
+        print(f"Converted {count:,} transactions: {os.path.getsize(args.source):,} -> "
+              f"{os.path.getsize(args.target):,} bytes")
+        return
+
+    blocks = ColumnarLogReader(args.path).read_new_blocks()
+    if not blocks:
+        sys.exit(f"{args.path}: no blocks")
+    rows = sum(len(block.records) for block in blocks)
+    span = datetime.fromtimestamp(blocks[0].min_ts, timezone.utc), datetime.fromtimestamp(blocks[-1].max_ts, timezone.utc)
+    print(f"{len(blocks):,} blocks, {rows:,} rows, {span[0].isoformat()} .. {span[1].isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,16 @@
-import json, os
-
-def get_active_policies_summary():
-    policy_file = "security_policy.json"
-    if not os.path.exists(policy_file):
-        return "No active security policies."
-    
-    with open(policy_file, "r") as f:
-        try:
-            policies = json.load(f)
-            if not policies: return "No active security policies."
-            summary = [f"- {p['action']} in {p['region']} (Started: {p['timestamp']})" for p in policies]
-            return "\n".join(summary)
-        except:
-            return "Error reading security policies."
\ No newline at end of file
+from config_cache import routing_store
+import security_policies
+
+def get_policy_digest():
+    """Active policies collapsed per action (e.g. 'BLOCK_IP_RANGE: IN, US'), for prompts."""
+    return security_policies.digest()
+
+def is_region_blocked(region):
+    """True if an active BLOCK_IP_RANGE policy already covers the region."""
+    return security_policies.is_region_blocked(region)
+
+
+def get_routed_gateway(region):
+    """The gateway the routing config currently sends the region's traffic to."""
+    config = routing_store.get()
+    return config.get(region, config.get("global_default", "stripe"))